@@ -0,0 +1,80 @@
+# ============================================================
+# annotate.py — Annotated page previews, rendered on demand
+# ============================================================
+# Inference no longer draws and JPEG-encodes a full-resolution annotated copy
+# of every rendered page. Instead, a page is annotated the first time someone opens
+# it: the clean rendered page is decoded at the requested preview size (JPEG
+# draft scaling keeps that cheap), the run's boxes are scaled and drawn on
+# top, and the result is cached in the run folder:
+#
+#   outputs/<job_id>/run/run_<timestamp>_<n>/annotated/page_<n>_<max_side>.jpg
+
+import os
+import uuid
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+# Default longest side of a preview; 0 means full resolution
+ANNOTATE_MAX_SIDE = int(os.getenv("ANNOTATE_MAX_SIDE", "2048"))
+
+# Box outline width at full resolution, and the thinnest it may get when scaled
+BOX_WIDTH = 3
+MIN_BOX_WIDTH = 2
+
+
+def annotated_path(run_dir, page, max_side):
+    return Path(run_dir) / "annotated" / f"page_{page}_{max_side}.jpg"
+
+
+def draw_boxes(image, boxes, scale, offset=(0, 0)):
+    """
+    Draw boxes on an image in place.
+
+    Args:
+        image (PIL.Image): Image to draw on
+        boxes (np.ndarray): [N, 4] xyxy boxes in full-resolution page pixels
+        scale (tuple): (sx, sy) from page pixels to the image's scale
+        offset (tuple): Where the image's top-left sits at that scale (for a crop)
+    """
+    sx, sy = scale
+    ox, oy = offset
+    width = max(MIN_BOX_WIDTH, round(BOX_WIDTH * sx))
+    draw = ImageDraw.Draw(image)
+    for x0, y0, x1, y1 in boxes:
+        draw.rectangle(
+            [float(x0) * sx - ox, float(y0) * sy - oy, float(x1) * sx - ox, float(y1) * sy - oy],
+            outline=(255, 0, 0), width=width,
+        )
+
+
+def render_annotated(page_image, boxes, out_path, max_side=ANNOTATE_MAX_SIDE, size=None):
+    """
+    Draw a page's boxes on a downsized copy of the clean page and save it as JPEG.
+
+    Args:
+        page_image (str | Path): Clean rendered page
+        boxes (np.ndarray): [N, 4] xyxy boxes in the page's full-resolution pixels
+        out_path (str | Path): Where to write the preview
+        max_side (int): Longest side of the preview (0 for full resolution)
+        size (tuple, optional): (width, height) the boxes refer to, if not the image's own
+
+    Returns:
+        Path: out_path
+    """
+    out_path = Path(out_path)
+    with Image.open(page_image) as img:
+        full_w, full_h = size if size and size[0] and size[1] else img.size
+        if max_side and max(img.size) > max_side:
+            img.draft("RGB", (img.size[0] * max_side // max(img.size), img.size[1] * max_side // max(img.size)))
+        image = img.convert("RGB")
+    if max_side:
+        image.thumbnail((max_side, max_side))
+
+    draw_boxes(image, boxes, (image.size[0] / full_w, image.size[1] / full_h))
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(f".{uuid.uuid4().hex}.tmp.jpg")
+    image.save(tmp, quality=90)
+    tmp.replace(out_path)
+    return out_path
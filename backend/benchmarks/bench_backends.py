@@ -0,0 +1,80 @@
+"""
+CPU inference backends against the Ultralytics PyTorch path: per-page latency,
+throughput and detection parity on the same rendered pages.
+
+Each backend's model comes from model_export.exported_weights, so the first
+run also exports (and caches) it. Parity is the share of PyTorch detections
+found again by the backend (IoU >= 0.5, same class).
+
+Usage (from backend/):
+    python benchmarks/bench_backends.py --images outputs/<job_id>/pdf_pages
+    python benchmarks/bench_backends.py --images pages/ --backends torch,onnx,onnx-int8 --imgsz 1280
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from batch_inference import PREDICT_CONF, PREDICT_IOU  # noqa: E402
+from bench_render_plan import parity  # noqa: E402
+from model_export import BACKENDS, exported_weights  # noqa: E402
+
+
+def run_backend(weights, backend, images, imgsz):
+    from ultralytics import YOLO
+
+    model = YOLO(str(exported_weights(weights, backend)), task="detect")
+    kwargs = {"conf": PREDICT_CONF, "iou": PREDICT_IOU, "imgsz": imgsz, "verbose": False}
+    model.predict(source=str(images[0]), **kwargs)  # warm-up
+
+    latencies, detections = [], []
+    for img in images:
+        start = time.perf_counter()
+        result = model.predict(source=str(img), **kwargs)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        detections.append((result.boxes.xyxy.cpu().numpy(), result.boxes.cls.cpu().numpy().astype(int)))
+    return latencies, detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=Path, required=True, help="Folder of rendered pages")
+    parser.add_argument("--weights", type=Path, default=Path("model/best.pt"))
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8", help=f"Comma-separated, from {BACKENDS}")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--limit", type=int, default=20, help="Pages to run")
+    args = parser.parse_args()
+
+    images = sorted(p for p in args.images.iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))[:args.limit]
+    if not images:
+        print("No images found")
+        return
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    if "torch" not in backends:
+        backends.insert(0, "torch")
+
+    reference = None
+    for backend in backends:
+        try:
+            latencies, detections = run_backend(args.weights, backend, images, args.imgsz)
+        except Exception as e:
+            print(f"{backend:>10}: skipped ({e})")
+            continue
+        if backend == "torch":
+            reference = detections
+        match = statistics.mean(parity(r, d, 1.0) for r, d in zip(reference, detections)) if reference else None
+        total = sum(len(d[0]) for d in detections)
+        print(
+            f"{backend:>10}: {len(images) / (sum(latencies) / 1000):.2f} pages/s | per-page ms "
+            f"mean={statistics.mean(latencies):.0f} p50={statistics.median(latencies):.0f} | "
+            f"{total} detections" + (f" | parity {match:.1%}" if match is not None else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
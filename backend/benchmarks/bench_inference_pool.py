@@ -0,0 +1,106 @@
+"""
+Per-page inference latency: old cold path vs the warm inference pool.
+
+The cold path mirrors the previous behaviour of /inference: a fresh
+ProcessPoolExecutor per request and a YOLO weight load for every page. The warm
+path uses the long-lived pool from main.start_inference_pool, where each worker
+loads the weights once.
+
+Usage (from backend/), on the rendered pages of a job that went through /preprocess:
+    python benchmarks/bench_inference_pool.py --images outputs/<job_id>/pdf_pages --workers 4
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402
+
+
+def _cold_page(model_path, img_path_str, run_dir_str, page_num):
+    """Old behaviour: load the weights, then predict a single page."""
+    start = time.perf_counter()
+    main._init_inference_worker(model_path)
+    result = main._inference_worker(model_path, img_path_str, run_dir_str, page_num)
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+def _warm_page(model_path, img_path_str, run_dir_str, page_num):
+    """New behaviour: predict with the weights already held by the worker."""
+    start = time.perf_counter()
+    result = main._inference_worker(model_path, img_path_str, run_dir_str, page_num)
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+def _summarise(name, results, wall):
+    latencies = sorted(r["elapsed"] * 1000 for r in results if r.get("success"))
+    if not latencies:
+        print(f"{name}: no successful pages")
+        return
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{name:>5}: {len(latencies)} pages in {wall:.2f}s "
+        f"({len(latencies) / wall:.2f} pages/s) | per-page ms "
+        f"mean={statistics.mean(latencies):.0f} p50={statistics.median(latencies):.0f} p95={p95:.0f}"
+    )
+
+
+async def run_cold(model_path, images, run_dir, workers):
+    loop = asyncio.get_event_loop()
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = await asyncio.gather(*[
+            loop.run_in_executor(executor, _cold_page, model_path, str(img), str(run_dir), i)
+            for i, img in enumerate(images, start=1)
+        ])
+    return results, time.perf_counter() - start
+
+
+async def run_warm(model_path, images, run_dir, workers):
+    loop = asyncio.get_event_loop()
+    warm_start = time.perf_counter()
+    pool = await main.start_inference_pool(model_path, workers)
+    print(f" pool warm-up (one-off): {time.perf_counter() - warm_start:.2f}s")
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[
+        loop.run_in_executor(pool, _warm_page, model_path, str(img), str(run_dir), i)
+        for i, img in enumerate(images, start=1)
+    ])
+    wall = time.perf_counter() - start
+    main.shutdown_inference_pool()
+    return results, wall
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", required=True, help="Folder of page images, e.g. outputs/<job_id>/pdf_pages")
+    parser.add_argument("--model", default=str(main.MODEL_DIR / "best.pt"))
+    parser.add_argument("--workers", type=int, default=main.INFERENCE_WORKERS)
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N pages")
+    args = parser.parse_args()
+
+    images = sorted(Path(args.images).glob("*.jpg"))[:args.limit]
+    if not images:
+        sys.exit(f"No .jpg pages found in {args.images}")
+
+    print(f"📊 {len(images)} pages, {args.workers} workers, model {args.model}")
+    with tempfile.TemporaryDirectory() as tmp:
+        cold, cold_wall = asyncio.run(run_cold(args.model, images, Path(tmp) / "cold", args.workers))
+        warm, warm_wall = asyncio.run(run_warm(args.model, images, Path(tmp) / "warm", args.workers))
+
+    _summarise("cold", cold, cold_wall)
+    _summarise("warm", warm, warm_wall)
+
+
+if __name__ == "__main__":
+    main_cli()
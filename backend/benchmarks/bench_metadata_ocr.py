@@ -0,0 +1,141 @@
+"""
+Title-block OCR wall time vs page count: serial loop vs the async stage.
+
+Starts a local fake OCR server that answers every request after a fixed
+latency (and optionally fails a share of them), then extracts metadata for
+N distinct synthetic pages two ways:
+
+  serial  the old /results behaviour, one blocking request per page
+  async   meta_data.extract_metadata_for_pages_async under a FairScheduler
+          with METADATA_CONCURRENCY slots
+
+The metadata cache is bypassed so every page really goes to the server.
+
+Usage (from backend/):
+    python benchmarks/bench_metadata_ocr.py --pages 1 4 16 64 --latency 0.5 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+import meta_data  # noqa: E402
+from scheduler import FairScheduler  # noqa: E402
+
+
+class FakeOCRServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops bursts of connections, which then
+    # stall on SYN retransmits and would be charged to the client
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def make_handler(latency, fail_rate):
+    class FakeOCRHandler(BaseHTTPRequestHandler):
+        requests = 0
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            type(self).requests += 1
+            time.sleep(latency)
+            if random.random() < fail_rate:
+                self.send_response(503)
+                self.end_headers()
+                return
+            body = json.dumps({
+                field: None for field in meta_data.DrawingMetadata.model_fields
+            } | {"drawing_title": "FAKE", "drawing_no": "A-101"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return FakeOCRHandler
+
+
+def make_pages(folder, count):
+    """Distinct small page images, so none of them coalesce."""
+    paths = []
+    for i in range(count):
+        img = Image.new("RGB", (400, 300), "white")
+        ImageDraw.Draw(img).text((20, 20), f"DRAWING {i}", fill="black")
+        path = Path(folder) / f"page_{i + 1}.png"
+        img.save(path)
+        paths.append(path)
+    return paths
+
+
+def run_serial(paths):
+    start = time.perf_counter()
+    results = [meta_data.extract_drawing_metadata(str(p), use_cache=False) for p in paths]
+    return time.perf_counter() - start, results
+
+
+async def run_async(paths, concurrency):
+    scheduler = FairScheduler("ocr", concurrency)
+    start = time.perf_counter()
+    results = await meta_data.extract_metadata_for_pages_async(
+        paths, use_cache=False, slot=lambda: scheduler.slot("bench")
+    )
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake server latency per request (s)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--concurrency", type=int, default=meta_data.METADATA_CONCURRENCY)
+    parser.add_argument("--skip-serial-above", type=int, default=16, help="Don't run the serial loop past this")
+    args = parser.parse_args()
+
+    handler = make_handler(args.latency, args.fail_rate)
+    server = FakeOCRServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    meta_data.set_client(meta_data.HttpClient(f"http://127.0.0.1:{server.server_address[1]}"))
+    meta_data.rate_limiter = meta_data.RateLimiter(meta_data.METADATA_RPS)
+
+    print(f"Fake OCR server latency={args.latency}s fail_rate={args.fail_rate} concurrency={args.concurrency}")
+    print(f"{'pages':>6} {'serial s':>10} {'async s':>10} {'speedup':>8} {'ok':>5} {'requests':>9}")
+
+    async def bench():
+        with tempfile.TemporaryDirectory() as tmp:
+            for count in args.pages:
+                folder = Path(tmp) / str(count)
+                folder.mkdir()
+                paths = make_pages(folder, count)
+
+                serial = None
+                if count <= args.skip_serial_above:
+                    serial, _ = await asyncio.to_thread(run_serial, paths)
+
+                handler.requests = 0
+                wall, results = await run_async(paths, args.concurrency)
+                ok = sum(1 for r in results if r)
+                speedup = f"{serial / wall:.1f}x" if serial else "-"
+                serial_s = f"{serial:.2f}" if serial else "-"
+                print(f"{count:>6} {serial_s:>10} {wall:>10.2f} {speedup:>8} {ok:>5} {handler.requests:>9}")
+
+    try:
+        asyncio.run(bench())
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
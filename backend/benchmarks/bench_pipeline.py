@@ -0,0 +1,237 @@
+"""
+End-to-end pipeline benchmark on a synthetic drawing set, with JSON baselines.
+
+Generates a drawing set (benchmarks/synthetic_set.py), then drives the real
+backend code in-process, stage by stage:
+
+  upload      main.save_upload into a new job
+  preprocess  /preprocess -> main.pdf_to_images on the render pool
+  inference   /inference per --modes (pool runs main._inference_worker)
+  results     /results aggregation, with a stubbed metadata extractor
+
+Caches are bypassed and every file goes to a temporary folder. For each stage
+it reports wall time, pages/s, p50/p95 per-unit latency (from the stage
+timings in metrics.py) and peak RSS of the API process and of its worker
+processes. --save writes the report as JSON; --baseline compares against one.
+
+Inference needs the weights at MODEL_PATH (default model/best.pt); without
+them the inference and results stages are skipped.
+
+Usage (from backend/):
+    python benchmarks/bench_pipeline.py --pages 20 --sheet A1 --save benchmarks/baselines/a1_20.json
+    python benchmarks/bench_pipeline.py --pages 20 --sheet A1 --baseline benchmarks/baselines/a1_20.json
+    python benchmarks/bench_pipeline.py --pages 8 --sheet A0 --modes pool,batch,tiled --ocr --ocr-latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from synthetic_set import SHEETS, make_drawing_set  # noqa: E402
+
+# Per-unit timings of the stage each benchmark step is judged on
+UNIT_STAGES = {
+    "upload": "upload",
+    "preprocess": "render_page",
+    "inference": "inference_page",
+    "results": "ocr_request",
+}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else None
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and, summed, of its live worker processes (Linux only)."""
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+    workers = 0.0
+    for child in multiprocessing.active_children():
+        try:
+            for line in Path(f"/proc/{child.pid}/status").read_text().splitlines():
+                if line.startswith("VmHWM:"):
+                    workers += int(line.split()[1]) / 1024
+        except OSError:
+            pass
+    return round(own, 1), round(workers, 1)
+
+
+@contextmanager
+def stage_samples():
+    """Collect every stage timing reported to metrics.py while the block runs."""
+    from metrics import STAGE_SECONDS
+
+    samples = {}
+    observe = STAGE_SECONDS.observe
+
+    def record(value, **labels):
+        samples.setdefault(labels.get("stage"), []).append(value)
+        observe(value, **labels)
+
+    STAGE_SECONDS.observe = record
+    try:
+        yield samples
+    finally:
+        STAGE_SECONDS.observe = observe
+
+
+async def timed_step(name, pages, coro, report):
+    """Run one step and add its wall time, throughput, unit latencies and memory to the report."""
+    with stage_samples() as samples:
+        start = time.perf_counter()
+        result = await coro
+        wall = time.perf_counter() - start
+    units = [s * 1000 for s in samples.get(UNIT_STAGES[name.split(":")[0]], [])]
+    own, workers = peak_rss_mb()
+    report[name] = {
+        "wall_s": round(wall, 3),
+        "pages_per_s": round(pages / wall, 2) if wall else None,
+        "units": len(units),
+        "p50_ms": round(statistics.median(units), 1) if units else None,
+        "p95_ms": round(percentile(units, 0.95), 1) if units else None,
+        "peak_rss_mb": own,
+        "workers_rss_mb": workers,
+    }
+    if isinstance(result, dict) and result.get("status") == "failed":
+        report[name]["error"] = result.get("error")
+    return result
+
+
+async def run_pipeline(args, pdf_path, work_dir):
+    from fastapi import UploadFile
+    from starlette.requests import Request
+
+    import main
+    import meta_data
+    from cache import ContentCache
+    from jobs import JobRegistry
+
+    # Everything the run writes stays in the temporary folder
+    main.jobs = JobRegistry(work_dir / "uploads", work_dir / "outputs")
+    main.content_cache = ContentCache(work_dir / "cache")
+    meta_data.set_client(meta_data.StubClient(response={"drawing_no": "BENCH"}, delay=args.ocr_latency))
+    if args.ocr:
+        main.TEXT_LAYER_METADATA = False
+
+    report = {}
+    try:
+        job = main.jobs.create(pdf_path.name)
+        with open(pdf_path, "rb") as f:
+            upload = UploadFile(file=f, filename=pdf_path.name)
+            await timed_step("upload", args.pages, main.save_upload(upload, job), report)
+
+        result = await timed_step("preprocess", args.pages, main.preprocess_file(job.job_id, use_cache=False), report)
+        if result.get("status") == "failed":
+            return report
+
+        if not Path(main.MODEL_PATH).exists():
+            print(f"⚠️ No weights at {main.MODEL_PATH}: skipping inference and results")
+            return report
+        loaded = await main.load_model(backend=args.backend)
+        if loaded.get("status") == "failed":
+            print(f"⚠️ Model load failed ({loaded.get('error')}): skipping inference and results")
+            return report
+
+        for mode in args.modes:
+            await timed_step(
+                f"inference:{mode}", args.pages,
+                main.run_inference(job_id=job.job_id, mode=mode, use_cache=False),
+                report,
+            )
+
+        request = Request({"type": "http", "method": "GET", "path": "/results", "headers": [], "query_string": b""})
+        await timed_step("results", args.pages, main.get_results(request, job_id=job.job_id), report)
+        return report
+    finally:
+        main.shutdown_inference_pool()
+        main.shutdown_render_pool()
+
+
+def print_report(report, baseline=None):
+    print(f"\n{'stage':>16} {'wall s':>8} {'pages/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'rss MB':>8} {'workers':>8}")
+    for name, s in report.items():
+        fmt = lambda v: "-" if v is None else f"{v:g}"  # noqa: E731
+        line = (
+            f"{name:>16} {s['wall_s']:>8.2f} {fmt(s['pages_per_s']):>8} {fmt(s['p50_ms']):>8} "
+            f"{fmt(s['p95_ms']):>8} {s['peak_rss_mb']:>8.0f} {s['workers_rss_mb']:>8.0f}"
+        )
+        old = (baseline or {}).get(name)
+        if old and old.get("pages_per_s") and s["pages_per_s"]:
+            line += f"   throughput {s['pages_per_s'] / old['pages_per_s'] - 1:+.1%}"
+            if old.get("p95_ms") and s["p95_ms"]:
+                line += f", p95 {s['p95_ms'] / old['p95_ms'] - 1:+.1%}"
+        if "error" in s:
+            line += f"   ❌ {s['error']}"
+        print(line)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--sheet", default="A1", choices=SHEETS)
+    parser.add_argument("--symbols", type=int, default=200, help="Symbols per sheet")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pdf", type=Path, help="Benchmark this PDF instead of a synthetic set")
+    parser.add_argument("--modes", default="pool,batch", help="Inference modes, comma-separated")
+    parser.add_argument("--backend", default=None, help="Inference backend (default: INFERENCE_BACKEND)")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("INFERENCE_WORKERS", "4")))
+    parser.add_argument("--ocr", action="store_true", help="Skip the PDF text layer so every page goes to OCR")
+    parser.add_argument("--ocr-latency", type=float, default=0.2, help="Seconds per stubbed OCR call")
+    parser.add_argument("--save", type=Path, help="Write the report to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="Compare against a saved report")
+    args = parser.parse_args()
+    args.modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+
+    baseline = json.loads(args.baseline.read_text())["stages"] if args.baseline else None
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        # Read at import, so set before main is imported
+        os.environ.setdefault("METADATA_CACHE_DIR", str(tmp / "metadata_cache"))
+        os.environ["INFERENCE_WORKERS"] = str(args.workers)
+
+        pdf_path = args.pdf
+        if pdf_path is None:
+            start = time.perf_counter()
+            pdf_path = make_drawing_set(tmp / "set.pdf", args.pages, args.sheet, args.symbols, args.seed)
+            print(f"📄 Generated {args.pages} {args.sheet} sheets in {time.perf_counter() - start:.1f}s")
+        else:
+            import fitz
+
+            with fitz.open(pdf_path) as doc:
+                args.pages = len(doc)
+
+        report = asyncio.run(run_pipeline(args, Path(pdf_path), tmp))
+
+    print_report(report, baseline)
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps({
+            "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()
+                       if k not in ("save", "baseline")},
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+            },
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "stages": report,
+        }, indent=2))
+        print(f"\n💾 Saved report to {args.save}")
+
+
+if __name__ == "__main__":
+    main_cli()
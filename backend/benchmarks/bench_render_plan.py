@@ -0,0 +1,135 @@
+"""
+Render planner vs the old fixed 6x zoom: pixels, memory and time per page, and
+detection parity.
+
+Without --pdf, a synthetic set is drawn with one sheet per paper size (A4 up
+to an oversized A0 roll). Every sheet has the same fittings at the same
+physical size, so a page rendered at the planned scale should look like the
+training data at any sheet size. With --model, both renders are run through
+YOLO and the planned page's boxes (scaled back to the 6x frame) are matched
+against the fixed-zoom boxes.
+
+Usage (from backend/):
+    python benchmarks/bench_render_plan.py
+    python benchmarks/bench_render_plan.py --pdf drawings.pdf --model model/best.pt
+    RENDER_MAX_PIXELS=80e6 python benchmarks/bench_render_plan.py
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fitz  # noqa: E402
+import numpy as np  # noqa: E402
+
+from page_stream import POINTS_PER_MM, RENDER_MAX_PIXELS, RENDER_ZOOM, pixmap_array, plan_zoom  # noqa: E402
+
+# Sheet sizes in millimetres (landscape)
+SHEETS = {"A4": (297, 210), "A3": (420, 297), "A1": (841, 594), "A0": (1189, 841), "A0 roll": (2400, 841)}
+
+
+def make_pdf(path):
+    """One sheet per size, each with a grid of 10 mm fittings and a frame."""
+    doc = fitz.open()
+    for w_mm, h_mm in SHEETS.values():
+        w, h = w_mm * POINTS_PER_MM, h_mm * POINTS_PER_MM
+        page = doc.new_page(width=w, height=h)
+        page.draw_rect(fitz.Rect(10, 10, w - 10, h - 10), width=1)
+        step, size = 40 * POINTS_PER_MM, 10 * POINTS_PER_MM
+        y = step
+        while y < h - step:
+            x = step
+            while x < w - step:
+                page.draw_circle((x, y), size / 2, width=0.8)
+                page.draw_rect(fitz.Rect(x + size, y - size / 2, x + 2 * size, y + size / 2), width=0.8)
+                x += step
+            y += step
+    doc.save(path)
+    doc.close()
+
+
+def render(page, zoom):
+    start = time.perf_counter()
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    image = np.ascontiguousarray(pixmap_array(pix)[:, :, 2::-1])
+    return image, (time.perf_counter() - start) * 1000
+
+
+def iou_matrix(a, b):
+    x0 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y0 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x1 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y1 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def detect(model, image):
+    result = model.predict(source=image, verbose=False)[0]
+    return result.boxes.xyxy.cpu().numpy(), result.boxes.cls.cpu().numpy().astype(int)
+
+
+def parity(fixed, planned, scale):
+    """Share of fixed-zoom detections found again (IoU >= 0.5, same class) in the planned render."""
+    (boxes_a, cls_a), (boxes_b, cls_b) = fixed, planned
+    if not len(boxes_a):
+        return 1.0 if not len(boxes_b) else 0.0
+    if not len(boxes_b):
+        return 0.0
+    ious = iou_matrix(boxes_a, boxes_b * scale)
+    ious[cls_a[:, None] != cls_b[None, :]] = 0
+    return float((ious.max(axis=1) >= 0.5).mean())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", type=Path, help="PDF to plan (default: synthetic sheet sizes)")
+    parser.add_argument("--model", help="YOLO weights for the detection parity check")
+    args = parser.parse_args()
+
+    model = None
+    if args.model:
+        from ultralytics import YOLO
+        model = YOLO(args.model)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = args.pdf
+        names = None
+        if pdf is None:
+            pdf = Path(tmp) / "sheets.pdf"
+            make_pdf(pdf)
+            names = list(SHEETS)
+
+        print(f"budget: {RENDER_MAX_PIXELS / 1e6:.0f} MP per page\n")
+        print(f"{'page':>8} {'size mm':>12} {'zoom':>9} {'MP':>15} {'MB':>13} {'ms':>13} {'parity':>7}")
+        totals = np.zeros(4)
+        with fitz.open(pdf) as doc:
+            for i, page in enumerate(doc):
+                zoom = plan_zoom(page)
+                fixed, fixed_ms = render(page, RENDER_ZOOM)
+                planned, planned_ms = render(page, zoom)
+                match = ""
+                if model is not None:
+                    match = f"{parity(detect(model, fixed), detect(model, planned), RENDER_ZOOM / zoom):.0%}"
+                w_mm, h_mm = page.rect.width / POINTS_PER_MM, page.rect.height / POINTS_PER_MM
+                print(
+                    f"{names[i] if names else i + 1:>8} {w_mm:>5.0f}x{h_mm:<6.0f} {RENDER_ZOOM:>3.1f}->{zoom:<4.2f} "
+                    f"{fixed.shape[0] * fixed.shape[1] / 1e6:>6.0f}->{planned.shape[0] * planned.shape[1] / 1e6:<7.0f} "
+                    f"{fixed.nbytes / 2 ** 20:>5.0f}->{planned.nbytes / 2 ** 20:<6.0f} "
+                    f"{fixed_ms:>5.0f}->{planned_ms:<6.0f} {match:>7}"
+                )
+                totals += (fixed.nbytes, planned.nbytes, fixed_ms, planned_ms)
+                del fixed, planned
+
+    print(f"\ntotal: {totals[0] / 2 ** 20:.0f} MB -> {totals[1] / 2 ** 20:.0f} MB rendered, "
+          f"{totals[2] / 1000:.1f}s -> {totals[3] / 1000:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
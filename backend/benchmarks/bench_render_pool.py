@@ -0,0 +1,124 @@
+"""
+Page rendering throughput: opening the PDF for every page (the old
+_convert_page_worker) vs render workers that keep the document open and take
+runs of consecutive pages (main._convert_pages_worker).
+
+Without --pdf, a synthetic set is generated whose pages share one large
+embedded image, which makes the per-open cost visible the way CAD exports with
+shared underlays, fonts and blocks do. --zoom keeps the render itself small so
+that cost is not drowned out; use the planned zoom (0) for a production-like
+run.
+
+Usage (from backend/):
+    python benchmarks/bench_render_pool.py --pages 120 --workers 4
+    python benchmarks/bench_render_pool.py --pdf drawings.pdf --zoom 0 --chunk 8
+"""
+
+import argparse
+import io
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fitz  # noqa: E402
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from page_stream import RENDER_CHUNK_PAGES, page_chunks, plan_zoom, worker_document  # noqa: E402
+
+
+def make_pdf(path, pages, shapes=400):
+    """
+    A set of A1 pages that all use one large embedded raster (a scanned
+    underlay, as in many CAD exports) plus some vector content. MuPDF decodes
+    the shared image once per open document, so the per-open cost is real.
+    """
+    rng = np.random.default_rng(0)
+    underlay = Image.fromarray(rng.integers(200, 256, (3000, 4200), dtype=np.uint8))
+    buf = io.BytesIO()
+    underlay.save(buf, format="PNG")
+
+    doc = fitz.open()
+    w, h = 2384, 1684
+    xref = 0
+    for p in range(pages):
+        page = doc.new_page(width=w, height=h)
+        xref = page.insert_image(page.rect, stream=buf.getvalue(), xref=xref)
+        shape = page.new_shape()
+        for i in range(shapes):
+            x, y = 40 + (i * 37 + p * 11) % (w - 80), 40 + (i * 53) % (h - 80)
+            shape.draw_rect(fitz.Rect(x, y, x + 12, y + 8))
+        shape.finish(width=0.3)
+        shape.commit()
+        page.insert_text((60, h - 60), f"SHEET {p + 1}", fontsize=20)
+    doc.save(path, deflate=True)
+    doc.close()
+
+
+def _render(page, zoom, out_dir, page_num):
+    zoom = zoom or plan_zoom(page)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    pix.save(str(Path(out_dir) / f"page_{page_num + 1}.jpg"))
+
+
+def _per_page(pdf_path, page_num, out_dir, zoom):
+    """Old behaviour: open, render one page, close."""
+    doc = fitz.open(pdf_path)
+    try:
+        _render(doc.load_page(page_num), zoom, out_dir, page_num)
+    finally:
+        doc.close()
+    return 1
+
+
+def _chunked(pdf_path, page_nums, out_dir, zoom):
+    """New behaviour: the worker's open document, a run of pages per task."""
+    doc = worker_document(pdf_path)
+    for page_num in page_nums:
+        _render(doc.load_page(page_num), zoom, out_dir, page_num)
+    return len(page_nums)
+
+
+def run(name, fn, tasks, pdf_path, out_dir, zoom, workers):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Spawn the workers before timing
+        list(executor.map(abs, range(workers)))
+        start = time.perf_counter()
+        futures = [executor.submit(fn, pdf_path, task, out_dir, zoom) for task in tasks]
+        pages = sum(f.result() for f in futures)
+        wall = time.perf_counter() - start
+    print(f"{name:>9}: {pages} pages in {wall:.2f}s ({pages / wall:.1f} pages/s)")
+    return wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF to render (default: synthetic)")
+    parser.add_argument("--pages", type=int, default=120, help="Synthetic pages")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk", type=int, default=RENDER_CHUNK_PAGES, help="Pages per task")
+    parser.add_argument("--zoom", type=float, default=0.5, help="Render zoom (0 = planned per page)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf
+        if pdf_path is None:
+            pdf_path = str(Path(tmp) / "set.pdf")
+            start = time.perf_counter()
+            make_pdf(pdf_path, args.pages)
+            print(f"generated {args.pages} pages in {time.perf_counter() - start:.1f}s")
+        with fitz.open(pdf_path) as doc:
+            total = len(doc)
+        print(f"{total} pages, {Path(pdf_path).stat().st_size / 2 ** 20:.1f} MB, {args.workers} workers\n")
+
+        old = run("per-page", _per_page, range(total), pdf_path, tmp, args.zoom, args.workers)
+        new = run("chunked", _chunked, page_chunks(total, args.chunk), pdf_path, tmp, args.zoom, args.workers)
+        print(f"\nspeedup: {old / new:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
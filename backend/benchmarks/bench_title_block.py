@@ -0,0 +1,117 @@
+"""
+Title-block crop stage on its own: time per page and bytes sent to OCR.
+
+Without --images, synthetic sheets are drawn at roughly 6x render size: an
+outer frame, some drawing content, and either a bottom-right title block, a
+right-hand title strip or no title block at all. For those, the crop box is
+also scored against the known title-block position (IoU).
+
+Usage (from backend/):
+    python benchmarks/bench_title_block.py --pages 12 --width 7000
+    python benchmarks/bench_title_block.py --images outputs/<job_id>/pdf_pages
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from page_stream import configure_pil  # noqa: E402
+from title_block import TITLE_BLOCK_MAX_SIDE, crop_title_block  # noqa: E402
+
+LAYOUTS = ("box", "strip", "none")
+
+
+def draw_sheet(path, width, layout, seed):
+    """Draw a synthetic sheet and return its true title-block box as fractions (or None)."""
+    height = int(width / 1.414)
+    img = Image.new("RGB", (width, height), "white")
+    d = ImageDraw.Draw(img)
+    t = max(2, width // 1500)
+    m = width // 40
+    d.rectangle((m, m, width - m, height - m), outline="black", width=t * 2)
+
+    # Drawing content: a grid of "walls" and some fittings
+    for i in range(12 + seed % 5):
+        x = m + 200 + i * width // 22
+        d.line((x, m + 300, x, int(height * 0.6)), fill="black", width=t)
+        d.ellipse((x + 40, m + 400, x + 120, m + 480), outline="black", width=t)
+
+    truth = None
+    if layout == "box":
+        x0, y0 = int(width * (0.62 + 0.02 * (seed % 4))), int(height * 0.75)
+        d.rectangle((x0, y0, width - m, height - m), outline="black", width=t * 2)
+        for k in range(1, 4):
+            y = y0 + k * (height - m - y0) // 4
+            d.line((x0, y, width - m, y), fill="black", width=t)
+            d.text((x0 + 40, y - 60), f"FIELD {k}: VALUE {seed}", fill="black")
+        truth = (x0 / width, y0 / height, (width - m) / width, (height - m) / height)
+    elif layout == "strip":
+        x0 = int(width * 0.84)
+        d.line((x0, m, x0, height - m), fill="black", width=t * 2)
+        truth = (x0 / width, m / height, (width - m) / width, (height - m) / height)
+
+    img.save(path, quality=90)
+    return truth
+
+
+def iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=Path, help="Folder of rendered pages (default: synthetic sheets)")
+    parser.add_argument("--pages", type=int, default=12, help="Synthetic sheets to draw")
+    parser.add_argument("--width", type=int, default=7000, help="Synthetic sheet width in pixels")
+    parser.add_argument("--max-side", type=int, default=TITLE_BLOCK_MAX_SIDE)
+    args = parser.parse_args()
+    configure_pil()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        truths = {}
+        if args.images:
+            images = sorted(p for p in args.images.iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+        else:
+            images = []
+            for i in range(args.pages):
+                path = tmp / f"page_{i + 1}.jpg"
+                truths[path] = draw_sheet(path, args.width, LAYOUTS[i % len(LAYOUTS)], i)
+                images.append(path)
+
+        timings, source_bytes, crop_bytes, scores = [], 0, 0, []
+        methods = {}
+        for img in images:
+            start = time.perf_counter()
+            info = crop_title_block(img, tmp / "crops" / f"{img.stem}.jpg", args.max_side)
+            timings.append((time.perf_counter() - start) * 1000)
+            source_bytes += info["source_bytes"]
+            crop_bytes += info["crop_bytes"]
+            methods[info["method"]] = methods.get(info["method"], 0) + 1
+            if truths.get(img):
+                scores.append(iou(info["box"], truths[img]))
+
+    if not timings:
+        print("No images found")
+        return
+    print(f"pages:        {len(timings)}  methods: {methods}")
+    print(f"crop ms:      mean={statistics.mean(timings):.0f} p50={statistics.median(timings):.0f} max={max(timings):.0f}")
+    print(f"bytes to OCR: {source_bytes / 1024 ** 2:.1f} MB -> {crop_bytes / 1024 ** 2:.2f} MB "
+          f"({source_bytes / max(crop_bytes, 1):.0f}x smaller)")
+    if scores:
+        print(f"box IoU:      mean={statistics.mean(scores):.2f} min={min(scores):.2f} (pages with a known title block)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Synthetic drawing sets for the benchmarks: multi-page PDFs that look enough
+like our CAD exports to exercise every stage.
+
+Each sheet has an outer frame, a bottom-right title block with real text
+(DRAWING NO, DRAWING TITLE, SCALE, REV, DATE, ...), a grid of pipe runs and a
+seeded scatter of symbol glyphs: valves, pumps, instrument bubbles with tags,
+fittings. The same arguments always give the same file, so timings taken on
+different commits are comparable.
+
+Usage (from backend/):
+    python benchmarks/synthetic_set.py set.pdf --pages 40 --sheet A1 --symbols 250
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fitz  # noqa: E402
+import numpy as np  # noqa: E402
+
+from page_stream import POINTS_PER_MM  # noqa: E402
+
+# ISO 216 sheet sizes in mm, landscape
+SHEETS = {"A0": (1189, 841), "A1": (841, 594), "A2": (594, 420), "A3": (420, 297), "A4": (297, 210)}
+
+GLYPHS = ("gate_valve", "check_valve", "pump", "instrument", "reducer", "flange")
+
+
+def _glyph(shape, page, kind, x, y, size, tag):
+    """Draw one symbol centred on (x, y), size points across."""
+    r = size / 2
+    bowtie = [(x - r, y - r / 2), (x + r, y + r / 2), (x + r, y - r / 2), (x - r, y + r / 2), (x - r, y - r / 2)]
+    if kind == "gate_valve":
+        shape.draw_polyline(bowtie)
+    elif kind == "check_valve":
+        shape.draw_polyline(bowtie)
+        shape.draw_line((x, y - r), (x, y + r))
+    elif kind == "pump":
+        shape.draw_circle((x, y), r)
+        shape.draw_polyline([(x - r / 2, y + r / 2), (x, y - r / 2), (x + r / 2, y + r / 2), (x - r / 2, y + r / 2)])
+    elif kind == "instrument":
+        shape.draw_circle((x, y), r)
+        shape.draw_line((x - r, y), (x + r, y))
+        page.insert_text((x - r * 0.7, y - r * 0.15), tag, fontsize=r * 0.45)
+    elif kind == "reducer":
+        shape.draw_polyline([(x - r, y - r / 2), (x + r, y - r / 4), (x + r, y + r / 4), (x - r, y + r / 2), bowtie[0]])
+    else:
+        shape.draw_rect(fitz.Rect(x - r / 6, y - r, x + r / 6, y + r))
+
+
+def _title_block(page, w, h, sheet_no):
+    """A bottom-right title block boxed against the frame, with labelled fields."""
+    mm = POINTS_PER_MM
+    x0, y0, x1, y1 = w - 10 * mm - 180 * mm, h - 10 * mm - 60 * mm, w - 10 * mm, h - 10 * mm
+    page.draw_rect(fitz.Rect(x0, y0, x1, y1), width=1.5)
+    fields = [
+        ("PROJECT", "SYNTHETIC PLANT EXPANSION"),
+        ("DRAWING TITLE", f"PIPING LAYOUT SHEET {sheet_no}"),
+        ("DRAWING NO", f"SYN-P-{sheet_no:04d}"),
+        ("SCALE", "1:50"),
+        ("REV", "A"),
+        ("DATE", "2026-01-01"),
+        ("DRAWN BY", "BENCH"),
+    ]
+    row = (y1 - y0) / len(fields)
+    for i, (label, value) in enumerate(fields):
+        y = y0 + i * row
+        if i:
+            page.draw_line((x0, y), (x1, y), width=0.5)
+        page.insert_text((x0 + 2 * mm, y + row * 0.7), label, fontsize=row * 0.45)
+        page.insert_text((x0 + 50 * mm, y + row * 0.7), value, fontsize=row * 0.45)
+    page.draw_line((x0 + 48 * mm, y0), (x0 + 48 * mm, y1), width=0.5)
+    return fitz.Rect(x0, y0, x1, y1)
+
+
+def make_drawing_set(path, pages=10, sheet="A1", symbols=200, seed=0):
+    """
+    Write a synthetic drawing set.
+
+    Args:
+        path (str | Path): Output PDF
+        pages (int): Number of sheets
+        sheet (str): Sheet size, one of SHEETS
+        symbols (int): Symbol glyphs scattered on each sheet
+        seed (int): Seed for the glyph layout
+
+    Returns:
+        Path: The written PDF
+    """
+    if sheet not in SHEETS:
+        raise ValueError(f"Unknown sheet size '{sheet}', expected one of {', '.join(SHEETS)}")
+    rng = np.random.default_rng(seed)
+    mm = POINTS_PER_MM
+    w, h = (side * mm for side in SHEETS[sheet])
+    size = 8 * mm
+
+    doc = fitz.open()
+    for sheet_no in range(1, pages + 1):
+        page = doc.new_page(width=w, height=h)
+        page.draw_rect(fitz.Rect(10 * mm, 10 * mm, w - 10 * mm, h - 10 * mm), width=2)
+        title = _title_block(page, w, h, sheet_no)
+
+        # Pipe runs on a coarse grid, kept clear of the title block
+        shape = page.new_shape()
+        step = 60 * mm
+        for y in np.arange(30 * mm, title.y0 - 10 * mm, step):
+            shape.draw_line((25 * mm, y), (w - 25 * mm, y))
+        for x in np.arange(30 * mm, title.x0 - 10 * mm, step):
+            shape.draw_line((x, 25 * mm), (x, h - 25 * mm))
+        shape.finish(width=0.6)
+
+        # Symbols anywhere inside the frame but outside the title block
+        placed = 0
+        while placed < symbols:
+            x = rng.uniform(20 * mm + size, w - 20 * mm - size)
+            y = rng.uniform(20 * mm + size, h - 20 * mm - size)
+            if title.intersects(fitz.Rect(x - size, y - size, x + size, y + size)):
+                continue
+            kind = GLYPHS[rng.integers(len(GLYPHS))]
+            _glyph(shape, page, kind, x, y, size, f"FT-{rng.integers(100, 999)}")
+            placed += 1
+        shape.finish(width=0.8, color=(0, 0, 0))
+        shape.commit()
+
+    path = Path(path)
+    doc.save(str(path), deflate=True)
+    doc.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out", type=Path)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--sheet", default="A1", choices=SHEETS)
+    parser.add_argument("--symbols", type=int, default=200, help="Symbols per sheet")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    path = make_drawing_set(args.out, args.pages, args.sheet, args.symbols, args.seed)
+    print(f"Wrote {args.pages} {args.sheet} sheets to {path} ({path.stat().st_size / 2 ** 20:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# ============================================================
+# cache.py — Content-addressed cache for rendered pages and detections
+# ============================================================
+# Users re-upload the same drawing sets all the time. Rendered pages are cached
+# under the upload's SHA-256 and the render plan; detections are cached under the
+# pages key plus the model checksum and inference settings. A repeat submission
+# of an identical file is then served by hard-linking the cached files into the
+# job's folders, skipping pdf_to_images and run_inference entirely.
+#
+#   cache/pages/<key>/page_<n>.jpg, manifest.json
+#   cache/detections/<key>/detections.npz, manifest.json
+#
+# Annotated previews are not cached; they are drawn on demand from the run's
+# detections. Entries are evicted least-recently-used once the cache exceeds its
+# size budget. The cache keeps a running total of entry sizes rather than walking
+# the tree on every store, and restores and evictions hold the same lock, so an
+# entry is never removed while it is being linked into a job.
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+CACHE_MAX_BYTES = int(float(os.getenv("CACHE_MAX_GB", "5")) * 1024 ** 3)
+
+_CHUNK = 1024 * 1024
+_model_checksums = {}
+
+
+def file_sha256(path):
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_checksum(path):
+    """SHA-256 of a weights file, memoised on path, size and mtime."""
+    stat = Path(path).stat()
+    memo_key = (str(path), stat.st_size, stat.st_mtime)
+    if memo_key not in _model_checksums:
+        _model_checksums[memo_key] = file_sha256(path)
+    return _model_checksums[memo_key]
+
+
+def make_key(*parts):
+    """Stable cache key from any number of string-able parts."""
+    return hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()
+
+
+def _link_tree(src, dst, skip=()):
+    """Mirror a directory with hard links, falling back to copies across devices."""
+    for item in Path(src).rglob("*"):
+        if item.name in skip:
+            continue
+        target = Path(dst) / item.relative_to(src)
+        if item.is_dir():
+            target.mkdir(parents=True, exist_ok=True)
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.exists():
+            target.unlink()
+        try:
+            os.link(item, target)
+        except OSError:
+            shutil.copy2(item, target)
+
+
+def _dir_size(path):
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+class ContentCache:
+    """On-disk LRU cache of rendered pages and detection runs."""
+
+    def __init__(self, root, max_bytes=CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        for kind in ("pages", "detections"):
+            (self.root / kind).mkdir(parents=True, exist_ok=True)
+        self._sizes = self._scan()  # entry folder -> bytes
+
+    def _entries(self):
+        return [
+            e for kind in ("pages", "detections")
+            for e in (self.root / kind).iterdir()
+            if e.is_dir() and not e.name.startswith(".tmp-")
+        ]
+
+    def _scan(self):
+        return {e: _dir_size(e) for e in self._entries()}
+
+    def _entry(self, kind, key):
+        return self.root / kind / key
+
+    def lookup(self, kind, key):
+        """Return the entry folder for a key (marking it recently used), or None."""
+        entry = self._entry(kind, key)
+        if not (entry / "manifest.json").exists():
+            return None
+        os.utime(entry)
+        return entry
+
+    def manifest(self, kind, key):
+        entry = self.lookup(kind, key)
+        if entry is None:
+            return None
+        with open(entry / "manifest.json") as f:
+            return json.load(f)
+
+    def restore(self, kind, key, dest):
+        """Link a cached entry's files into dest; returns the manifest or None on a miss."""
+        # Held while linking, so eviction cannot remove the entry halfway through
+        with self._lock:
+            manifest = self.manifest(kind, key)
+            if manifest is None:
+                return None
+            Path(dest).mkdir(parents=True, exist_ok=True)
+            _link_tree(self._entry(kind, key), dest, skip={"manifest.json"})
+            return manifest
+
+    def store(self, kind, key, src, manifest=None):
+        """Link the files under src into a new entry, then evict down to the size budget."""
+        entry = self._entry(kind, key)
+        tmp = self.root / kind / f".tmp-{uuid.uuid4().hex}"
+        try:
+            _link_tree(src, tmp)
+            with open(tmp / "manifest.json", "w") as f:
+                json.dump({**(manifest or {}), "stored_at": time.time()}, f)
+            size = _dir_size(tmp)
+            with self._lock:
+                if entry.exists():
+                    shutil.rmtree(entry)
+                tmp.rename(entry)
+                self._sizes[entry] = size
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits in max_bytes."""
+        with self._lock:
+            if sum(self._sizes.values()) <= self.max_bytes:
+                return
+            # Over budget by the running total: recount from disk before deleting
+            # anything, in case another process shares the folder
+            self._sizes = self._scan()
+            total = sum(self._sizes.values())
+            for entry in sorted(self._sizes, key=lambda e: e.stat().st_mtime):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= self._sizes.pop(entry)
+                print(f"🗑️ Evicted cache entry {entry.parent.name}/{entry.name}")
+
+    def clear(self):
+        with self._lock:
+            for kind in ("pages", "detections"):
+                shutil.rmtree(self.root / kind, ignore_errors=True)
+                (self.root / kind).mkdir(parents=True, exist_ok=True)
+            self._sizes = {}
+
+    def stats(self):
+        with self._lock:
+            sizes = dict(self._sizes)
+        stats = {kind: sum(1 for e in sizes if e.parent.name == kind) for kind in ("pages", "detections")}
+        stats["bytes"] = sum(sizes.values())
+        stats["max_bytes"] = self.max_bytes
+        return stats
@@ -0,0 +1,145 @@
+# ============================================================
+# cad_render.py — Local DXF rendering, without the ConvertAPI round-trip
+# ============================================================
+# DXF uploads are drawn with ezdxf's drawing add-on into a PDF with one page
+# per layout, sized in real millimetres. Each paperspace layout with content
+# becomes a page at its paper size; modelspace is fitted onto a
+# CAD_MODEL_SHEET_MM sheet. That PDF then goes through the normal render pool,
+# so its pages come out at the render planner's resolution (RENDER_PX_PER_MM,
+# RENDER_MAX_PIXELS), exactly like an uploaded PDF, and nothing leaves the
+# machine.
+#
+# Rendering can be limited to some layers, or to a region given in drawing
+# coordinates. ezdxf reads DXF only; DWF, DWFX and DWG still go to ConvertAPI.
+
+import importlib.util
+import os
+from pathlib import Path
+
+import fitz
+
+# Set CAD_LOCAL_RENDER=0 to send DXF to ConvertAPI as before
+CAD_LOCAL_RENDER = os.getenv("CAD_LOCAL_RENDER", "1") != "0" and importlib.util.find_spec("ezdxf") is not None
+
+# Sheet modelspace is fitted onto (mm, long side x short side), turned to match the drawing
+CAD_MODEL_SHEET_MM = tuple(float(v) for v in os.getenv("CAD_MODEL_SHEET_MM", "841x594").lower().split("x"))
+
+# Blank margin around modelspace content, mm
+CAD_MARGIN_MM = 10
+
+# Which layouts become pages: "auto" (paperspace layouts with content, else
+# modelspace), "model", "paper", or a comma-separated list of layout names
+CAD_LAYOUTS = os.getenv("CAD_LAYOUTS", "auto")
+
+_INCH_MM = 25.4
+
+
+def parse_region(region):
+    """'x0,y0,x1,y1' in drawing units -> tuple of floats, or None."""
+    if not region:
+        return None
+    values = [float(v) for v in region.split(",")]
+    if len(values) != 4 or values[0] >= values[2] or values[1] >= values[3]:
+        raise ValueError("region must be x0,y0,x1,y1 with x0 < x1 and y0 < y1")
+    return tuple(values)
+
+
+def parse_layers(layers):
+    """Comma-separated layer names -> lower-case set, or None for every layer."""
+    names = {name.strip().lower() for name in (layers or "").split(",") if name.strip()}
+    return names or None
+
+
+def _has_content(layout):
+    """A paperspace layout always holds its main viewport; anything beyond that is content."""
+    return sum(1 for e in layout if e.dxftype() != "VIEWPORT") > 0 or len(layout.viewports()) > 1
+
+
+def select_layouts(doc, which=CAD_LAYOUTS):
+    """The layouts to render, in tab order."""
+    paper = [doc.layouts.get(name) for name in doc.layouts.names_in_taborder() if name != "Model"]
+    paper = [layout for layout in paper if _has_content(layout)]
+    if which == "model":
+        return [doc.modelspace()]
+    if which == "paper":
+        return paper
+    if which == "auto":
+        return paper or [doc.modelspace()]
+    names = [name.strip() for name in which.split(",") if name.strip()]
+    missing = [name for name in names if name not in doc.layouts]
+    if missing:
+        raise ValueError(f"No layout named {', '.join(missing)}")
+    return [doc.layouts.get(name) for name in names]
+
+
+def _page_for(layout, extents):
+    """Page size in mm: the layout's paper, or the model sheet turned to the drawing."""
+    from ezdxf.addons.drawing import layout as page_layout
+
+    if not layout.is_modelspace:
+        width, height = layout.dxf.paper_width, layout.dxf.paper_height
+        if width > 0 and height > 0:
+            scale = 1 if layout.dxf.plot_paper_units == 1 else _INCH_MM
+            return page_layout.Page(width * scale, height * scale, page_layout.Units.mm)
+    long_side, short_side = max(CAD_MODEL_SHEET_MM), min(CAD_MODEL_SHEET_MM)
+    portrait = extents is not None and extents.size.y > extents.size.x
+    width, height = (short_side, long_side) if portrait else (long_side, short_side)
+    return page_layout.Page(width, height, page_layout.Units.mm, margins=page_layout.Margins.all(CAD_MARGIN_MM))
+
+
+def dxf_to_pdf(dxf_path, pdf_path=None, layouts=CAD_LAYOUTS, layers=None, region=None):
+    """
+    Draw a DXF file to a PDF locally.
+
+    Args:
+        dxf_path (str | Path): The DXF upload
+        pdf_path (str | Path): Output PDF (default: next to the DXF)
+        layouts (str): Which layouts become pages (see CAD_LAYOUTS)
+        layers (str): Comma-separated layer names to draw (default: all)
+        region (str): 'x0,y0,x1,y1' in drawing units to draw (default: everything)
+
+    Returns:
+        str: Path of the written PDF
+    """
+    import ezdxf
+    from ezdxf import bbox
+    from ezdxf.addons.drawing import Frontend, RenderContext, config, layout as page_layout, pymupdf
+    from ezdxf.math import BoundingBox2d
+
+    dxf_path = Path(dxf_path)
+    pdf_path = Path(pdf_path) if pdf_path else dxf_path.with_suffix(".pdf")
+    layer_names = parse_layers(layers)
+    box = parse_region(region)
+
+    doc = ezdxf.readfile(str(dxf_path))
+    # Plotted look: black linework on white, like the PDFs the detector was trained on
+    cfg = config.Configuration(
+        background_policy=config.BackgroundPolicy.WHITE,
+        color_policy=config.ColorPolicy.BLACK,
+    )
+    render_box = BoundingBox2d([(box[0], box[1]), (box[2], box[3])]) if box else None
+    keep = (lambda e: e.dxf.get("layer", "0").lower() in layer_names) if layer_names else None
+
+    out = fitz.open()
+    for layout in select_layouts(doc, layouts):
+        backend = pymupdf.PyMuPdfBackend()
+        Frontend(RenderContext(doc), backend, config=cfg).draw_layout(layout, filter_func=keep)
+        extents = render_box or (bbox.extents(layout, fast=True) if layout.is_modelspace else None)
+        page = _page_for(layout, extents)
+        settings = page_layout.Settings(fit_page=True)
+        with fitz.open("pdf", backend.get_pdf_bytes(page, settings=settings, render_box=render_box)) as part:
+            out.insert_pdf(part)
+    if len(out) == 0:
+        raise ValueError(f"Nothing to draw in {dxf_path.name}")
+
+    tmp = pdf_path.with_suffix(".tmp.pdf")
+    out.save(str(tmp), deflate=True)
+    out.close()
+    tmp.replace(pdf_path)
+    print(f"📐 DXF drawn locally: {dxf_path.name} -> {pdf_path.name}")
+    return str(pdf_path)
+
+
+def cad_plan_key(layouts=CAD_LAYOUTS, layers=None, region=None):
+    """Settings that change the pages of a DXF, for the rendered-pages cache key."""
+    return (CAD_MODEL_SHEET_MM, CAD_MARGIN_MM, layouts, sorted(parse_layers(layers) or ()), parse_region(region))
@@ -0,0 +1,244 @@
+# ============================================================
+# detection_store.py — Columnar detections per inference run
+# ============================================================
+# Inference engines hand back boxes, classes and confidences as numpy arrays.
+# They are collected per run in a DetectionStore and written once as a single
+# columnar NPZ file in the run folder:
+#
+#   outputs/<job_id>/run/run_<timestamp>_<n>/detections.npz
+#     page, class_id, confidence, x0, y0, x1, y1   one entry per detection
+#     pages, widths, heights                         one entry per page
+#     triage                                         page triage decisions (JSON)
+#
+# /results and the summaries read these columns directly (recently used runs
+# stay in memory) instead of walking labels/*.txt and parsing text. Per-class
+# and per-page counts are kept up to date as pages are added, and `version`
+# changes with every add, so callers can tell cheaply whether anything moved.
+
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from metrics import timed
+
+STORE_FILE = "detections.npz"
+
+# Recently used runs kept in memory
+STORE_CACHE_RUNS = 16
+
+_EMPTY_BOXES = np.zeros((0, 4), dtype=np.float32)
+
+
+class DetectionStore:
+    """Detections of one inference run, keyed by page number."""
+
+    def __init__(self, run_dir):
+        self.run_dir = Path(run_dir)
+        self._pages = {}  # page -> (boxes [N, 4], classes [N], confidences [N], (width, height))
+        self._class_counts = {}  # class_id -> detections over all pages
+        self._total = 0
+        self._triage = {}  # page -> triage decision and scores
+        self.version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return self.run_dir / STORE_FILE
+
+    def add(self, page, boxes, classes, confidences, size=(0, 0)):
+        """Record one page's detections (boxes as pixel xyxy)."""
+        entry = (
+            np.asarray(boxes, dtype=np.float32).reshape(-1, 4),
+            np.asarray(classes, dtype=np.int32).reshape(-1),
+            np.asarray(confidences, dtype=np.float32).reshape(-1),
+            (int(size[0]), int(size[1])),
+        )
+        with self._lock:
+            previous = self._pages.get(int(page))
+            if previous is not None:
+                self._count(previous[1], -1)
+            self._pages[int(page)] = entry
+            self._count(entry[1], 1)
+            self.version += 1
+
+    def _count(self, classes, sign):
+        ids, counts = np.unique(classes, return_counts=True)
+        for cls_id, n in zip(ids.tolist(), counts.tolist()):
+            self._class_counts[cls_id] = self._class_counts.get(cls_id, 0) + sign * n
+            if not self._class_counts[cls_id]:
+                del self._class_counts[cls_id]
+        self._total += sign * len(classes)
+
+    def add_result(self, result):
+        """Move the arrays out of an engine's per-page result dict into the store."""
+        boxes = result.pop("boxes", None)
+        classes = result.pop("classes", None)
+        confidences = result.pop("confidences", None)
+        size = result.pop("size", (0, 0))
+        if result.get("success") and boxes is not None:
+            self.add(result["page"], boxes, classes, confidences, size)
+
+    def set_triage(self, page, decision):
+        """Record why a page was (or was not) sent to detection."""
+        with self._lock:
+            self._triage[int(page)] = decision
+            self.version += 1
+
+    def triage(self, page=None):
+        """One page's triage decision, or all of them by page; None/{} without triage."""
+        with self._lock:
+            if page is not None:
+                return self._triage.get(int(page))
+            return dict(sorted(self._triage.items()))
+
+    def skipped_pages(self):
+        """Pages triage kept away from the detector."""
+        with self._lock:
+            return sorted(p for p, t in self._triage.items() if t.get("skipped"))
+
+    def pages(self):
+        with self._lock:
+            return sorted(self._pages)
+
+    def page(self, page):
+        """(boxes, classes, confidences) for a page; empty arrays if it has none."""
+        with self._lock:
+            entry = self._pages.get(int(page))
+        if entry is None:
+            return _EMPTY_BOXES, np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        return entry[:3]
+
+    def page_size(self, page):
+        with self._lock:
+            entry = self._pages.get(int(page))
+        return entry[3] if entry else (0, 0)
+
+    def total(self):
+        return self._total
+
+    def class_counts(self):
+        """Detections per class id over the whole run."""
+        with self._lock:
+            return dict(sorted(self._class_counts.items()))
+
+    def page_counts(self):
+        """Detections per page number."""
+        with self._lock:
+            return {page: len(entry[1]) for page, entry in sorted(self._pages.items())}
+
+    def columns(self):
+        """All detections as flat columns, sorted by page."""
+        with self._lock:
+            items = sorted(self._pages.items())
+        if not items:
+            return {
+                "page": np.zeros(0, dtype=np.int32), "class_id": np.zeros(0, dtype=np.int32),
+                "confidence": np.zeros(0, dtype=np.float32), "boxes": _EMPTY_BOXES,
+            }
+        return {
+            "page": np.concatenate([np.full(len(c), p, dtype=np.int32) for p, (_, c, _, _) in items]),
+            "class_id": np.concatenate([c for _, (_, c, _, _) in items]),
+            "confidence": np.concatenate([f for _, (_, _, f, _) in items]),
+            "boxes": np.concatenate([b for _, (b, _, _, _) in items]),
+        }
+
+    def save(self):
+        """Write the run's columns to detections.npz (atomically)."""
+        cols = self.columns()
+        with self._lock:
+            pages = sorted(self._pages)
+            sizes = [self._pages[p][3] for p in pages]
+            triage = json.dumps({str(p): t for p, t in self._triage.items()})
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp.npz")
+        np.savez(
+            tmp,
+            page=cols["page"],
+            class_id=cols["class_id"],
+            confidence=cols["confidence"],
+            x0=cols["boxes"][:, 0], y0=cols["boxes"][:, 1], x1=cols["boxes"][:, 2], y1=cols["boxes"][:, 3],
+            pages=np.asarray(pages, dtype=np.int32),
+            widths=np.asarray([s[0] for s in sizes], dtype=np.int32),
+            heights=np.asarray([s[1] for s in sizes], dtype=np.int32),
+            triage=np.asarray(triage),
+        )
+        tmp.replace(self.path)
+
+    @classmethod
+    def load(cls, run_dir):
+        """Read a run's detections.npz, or its label files for runs made before the store existed."""
+        store = cls(run_dir)
+        if not store.path.exists():
+            store._load_labels()
+            return store
+
+        with np.load(store.path) as data:
+            page_col = data["page"]
+            boxes = np.stack([data["x0"], data["y0"], data["x1"], data["y1"]], axis=1)
+            order = np.argsort(page_col, kind="stable")
+            page_col, boxes = page_col[order], boxes[order]
+            classes, confidences = data["class_id"][order], data["confidence"][order]
+            for page, width, height in zip(data["pages"], data["widths"], data["heights"]):
+                lo, hi = np.searchsorted(page_col, [page, page + 1])
+                store.add(page, boxes[lo:hi], classes[lo:hi], confidences[lo:hi], (width, height))
+            if "triage" in data.files:
+                store._triage = {int(p): t for p, t in json.loads(str(data["triage"])).items()}
+        return store
+
+    def _load_labels(self):
+        """Fallback for older runs: YOLO labels (cls xc yc w h conf) scaled by the page image size."""
+        for label_file in sorted((self.run_dir / "labels").glob("page_*.txt")):
+            try:
+                page = int(label_file.stem.split("_")[-1])
+            except ValueError:
+                continue
+            image = self.run_dir / f"{label_file.stem}.jpg"
+            width, height = (0, 0)
+            if image.exists():
+                with Image.open(image) as img:
+                    width, height = img.size
+            lines = [line.split() for line in label_file.read_text().splitlines() if line.strip()]
+            if not lines:
+                self.add(page, _EMPTY_BOXES, [], [], (width, height))
+                continue
+            rows = np.array(lines, dtype=np.float32)
+            xc, yc, bw, bh = rows[:, 1] * width, rows[:, 2] * height, rows[:, 3] * width, rows[:, 4] * height
+            boxes = np.stack([xc - bw / 2, yc - bh / 2, xc + bw / 2, yc + bh / 2], axis=1)
+            confidences = rows[:, 5] if rows.shape[1] > 5 else np.ones(len(rows), dtype=np.float32)
+            self.add(page, boxes, rows[:, 0].astype(np.int32), confidences, (width, height))
+
+
+# ---------------------------
+# Open stores
+# ---------------------------
+_stores = OrderedDict()
+_stores_lock = threading.Lock()
+
+
+def remember_store(store):
+    """Keep a store in memory so /results can read it without touching disk."""
+    key = str(store.run_dir)
+    with _stores_lock:
+        _stores[key] = store
+        _stores.move_to_end(key)
+        while len(_stores) > STORE_CACHE_RUNS:
+            _stores.popitem(last=False)
+    return store
+
+
+def open_store(run_dir):
+    """The store for a run, from memory if it was used recently, otherwise from disk."""
+    key = str(Path(run_dir))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is not None:
+            _stores.move_to_end(key)
+            return store
+    # Reading detections back (or parsing label files of older runs)
+    with timed("store_load"):
+        store = DetectionStore.load(run_dir)
+    return remember_store(store)
@@ -0,0 +1,274 @@
+# ============================================================
+# ingest.py — Streaming and resumable upload ingestion
+# ============================================================
+# Uploads are written to the job folder in chunks off the event loop and hashed
+# as they are written, so a 500 MB drawing set neither stalls other requests nor
+# has to be read a second time for its content-cache key.
+#
+# /upload, /process and POST /jobs take the file as a multipart form, which
+# Starlette spools in full before the endpoint runs. UploadSizeLimit sits in
+# front of those routes and refuses a body over the limit from its
+# Content-Length, or as it arrives when there is none, so nothing that large is
+# spooled; the 413 points at the chunked route below.
+#
+# Very large sets can also be sent in pieces: POST /uploads declares the file,
+# then each PATCH appends a chunk at its offset, streamed straight from the
+# request body. An interrupted upload resumes from the last byte received. The
+# session (filename, declared size) is kept in a sidecar next to the part file,
+# so it survives a restart or moves to another replica on a shared volume:
+#
+#   uploads/<job_id>/file.<ext>.part   bytes received so far
+#   uploads/<job_id>/upload.json       filename and declared size
+
+import asyncio
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from starlette.responses import JSONResponse
+
+# Largest accepted upload
+UPLOAD_MAX_BYTES = int(float(os.getenv("UPLOAD_MAX_MB", "2048")) * 1024 ** 2)
+
+# Bytes read from an uploaded file per write
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# Room for multipart boundaries, part headers and small form fields
+FORM_OVERHEAD_BYTES = 1024 * 1024
+
+SESSION_FILE = "upload.json"
+
+
+class UploadTooLarge(ValueError):
+    """The upload (or a chunk of it) goes past the size limit."""
+
+
+class OffsetMismatch(ValueError):
+    """A chunk was sent for a different offset than the bytes received so far."""
+
+    def __init__(self, expected):
+        super().__init__(f"Upload is at offset {expected}")
+        self.expected = expected
+
+
+def _append(f, digest, chunk):
+    f.write(chunk)
+    digest.update(chunk)
+
+
+async def stream_to_file(chunks, path, max_bytes, digest, append=False):
+    """
+    Write an async iterable of byte chunks to a file, hashing them on the way.
+
+    Args:
+        chunks: Async iterable of bytes
+        path (Path): File to write (or append to)
+        max_bytes (int): Most bytes this call may write
+        digest: hashlib object updated with every byte written
+        append (bool): Append instead of truncating
+
+    Returns:
+        int: Bytes written
+    """
+    written = 0
+    with open(path, "ab" if append else "wb") as f:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            written += len(chunk)
+            if written > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds the limit of {max_bytes / 1024 ** 2:.0f} MB")
+            await asyncio.to_thread(_append, f, digest, chunk)
+    return written
+
+
+async def iter_upload_file(file):
+    """Chunks of a FastAPI UploadFile."""
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def save_upload_file(file, dest, max_bytes=UPLOAD_MAX_BYTES):
+    """
+    Stream an UploadFile to dest through a temporary part file.
+
+    Returns:
+        tuple: (size in bytes, SHA-256 hex digest)
+    """
+    dest = Path(dest)
+    part = dest.with_name(dest.name + ".part")
+    digest = hashlib.sha256()
+    try:
+        size = await stream_to_file(iter_upload_file(file), part, max_bytes, digest)
+        part.replace(dest)
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+    return size, digest.hexdigest()
+
+
+class UploadSizeLimit:
+    """
+    ASGI middleware refusing multipart upload bodies over the size limit
+    before they are spooled.
+
+    A Content-Length over the limit is answered with a 413 straight away. A
+    body without one is counted as it arrives; once it goes over, the rest is
+    not read and the endpoint's answer (a body-parsing error) is replaced by
+    the 413.
+    """
+
+    def __init__(self, app, paths, max_bytes=UPLOAD_MAX_BYTES):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    def _response(self):
+        return JSONResponse({
+            "status": "failed",
+            "error": f"Upload exceeds the limit of {self.max_bytes / 1024 ** 2:.0f} MB; "
+                     "send large files in chunks through POST /uploads",
+        }, status_code=413)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        limit = self.max_bytes + FORM_OVERHEAD_BYTES
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            return await self._response()(scope, receive, send)
+
+        received = 0
+        over = False
+
+        async def counted_receive():
+            nonlocal received, over
+            if over:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    over = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        replaced = False
+
+        async def checked_send(message):
+            nonlocal replaced
+            if over and message["type"] == "http.response.start":
+                replaced = True
+                return await self._response()(scope, receive, send)
+            if not replaced:
+                await send(message)
+
+        await self.app(scope, counted_receive, checked_send)
+
+
+# ---------------------------
+# Chunked (resumable) uploads
+# ---------------------------
+@dataclass
+class UploadSession:
+    job_id: str
+    filename: str
+    size: int
+    path: Path  # final location, uploads/<job_id>/file.<ext>
+    offset: int = 0
+    digest: Any = field(default_factory=hashlib.sha256, repr=False)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+    @property
+    def part_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".part")
+
+    @property
+    def complete(self) -> bool:
+        return self.offset == self.size
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "size": self.size,
+            "offset": self.offset,
+            "complete": self.complete,
+        }
+
+
+def _hash_file(path, digest):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_BYTES), b""):
+            digest.update(chunk)
+
+
+class UploadSessions:
+    """Open chunked uploads, by job ID."""
+
+    def __init__(self, max_bytes=UPLOAD_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._sessions = {}
+
+    def create(self, job, filename, size) -> UploadSession:
+        if size < 0:
+            raise ValueError("Upload size must not be negative")
+        if size > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds the limit of {self.max_bytes / 1024 ** 2:.0f} MB")
+        path = job.upload_dir / f"file{Path(filename).suffix.lower()}"
+        session = UploadSession(job.job_id, filename, size, path)
+        session.part_path.write_bytes(b"")
+        (job.upload_dir / SESSION_FILE).write_text(json.dumps({"filename": filename, "size": size}))
+        self._sessions[job.job_id] = session
+        return session
+
+    async def get(self, job) -> Optional[UploadSession]:
+        """The job's open upload, from memory or picked up again from its sidecar."""
+        session = self._sessions.get(job.job_id)
+        if session is not None:
+            return session
+        sidecar = job.upload_dir / SESSION_FILE
+        if not sidecar.exists():
+            return None
+        info = json.loads(sidecar.read_text())
+        path = job.upload_dir / f"file{Path(info['filename']).suffix.lower()}"
+        session = UploadSession(job.job_id, info["filename"], info["size"], path)
+        if session.part_path.exists():
+            # The hash so far has to be rebuilt from the bytes already received
+            await asyncio.to_thread(_hash_file, session.part_path, session.digest)
+            session.offset = session.part_path.stat().st_size
+        else:
+            session.part_path.write_bytes(b"")
+        return self._sessions.setdefault(job.job_id, session)
+
+    async def append(self, session, offset, chunks) -> UploadSession:
+        """Append one chunk at offset; a chunk for any other offset is refused."""
+        async with session.lock:
+            if offset != session.offset:
+                raise OffsetMismatch(session.offset)
+            try:
+                await stream_to_file(chunks, session.part_path, session.size - offset, session.digest, append=True)
+            finally:
+                # Whatever did arrive counts, so a dropped chunk resumes where it stopped
+                session.offset = session.part_path.stat().st_size
+            return session
+
+    def finish(self, job, session):
+        """Move a complete upload into place; returns its SHA-256."""
+        session.part_path.replace(session.path)
+        (job.upload_dir / SESSION_FILE).unlink(missing_ok=True)
+        self._sessions.pop(job.job_id, None)
+        return session.digest.hexdigest()
+
+    def discard(self, job_id):
+        self._sessions.pop(job_id, None)
+
+    def clear(self):
+        self._sessions.clear()
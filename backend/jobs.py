@@ -0,0 +1,182 @@
+# ============================================================
+# jobs.py — Per-upload jobs with their own working directories
+# ============================================================
+# Every upload gets a job ID and its own upload/output folders, so several
+# drawings can be processed at once without overwriting each other:
+#
+#   uploads/<job_id>/file.<ext>
+#   outputs/<job_id>/pdf_pages/page_<n>.jpg
+#   outputs/<job_id>/run/run_<timestamp>_<n>/...
+#
+# The registry is in memory, but a job whose folders exist on disk (e.g. created
+# by another replica on a shared volume) is picked up again on first lookup.
+
+import itertools
+import re
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_RUN_RE = re.compile(r"^run_(\d{8}_\d{6})(?:_(\d+))?$")
+
+
+def run_sort_key(run_dir):
+    """(timestamp, counter) of a run folder, so runs sort by when they started."""
+    match = _RUN_RE.match(Path(run_dir).name)
+    if match is None:
+        return Path(run_dir).name, -1
+    return match.group(1), int(match.group(2) or -1)
+
+
+@dataclass
+class Job:
+    job_id: str
+    upload_dir: Path
+    output_dir: Path
+    created_at: float = field(default_factory=time.time)
+    filename: Optional[str] = None
+    status: str = "created"
+    run_dir: Optional[Path] = None
+    error: Optional[str] = None
+
+    # Model version the job runs on (None: the registry's default)
+    model_name: Optional[str] = None
+
+    # Content-cache keys: upload SHA-256 and the rendered-pages entry
+    content_hash: Optional[str] = None
+    pages_key: Optional[str] = None
+
+    # Progress of the current stage, updated as pages finish
+    pages_total: int = 0
+    pages_done: int = 0
+
+    @property
+    def pages_dir(self) -> Path:
+        return self.output_dir / "pdf_pages"
+
+    @property
+    def runs_dir(self) -> Path:
+        return self.output_dir / "run"
+
+    @property
+    def upload_path(self) -> Optional[Path]:
+        """The uploaded file for this job, if any (an upload still arriving is not)."""
+        files = sorted(
+            p for p in self.upload_dir.glob("file.*") if p.suffix != ".part"
+        ) if self.upload_dir.exists() else []
+        return files[0] if files else None
+
+    @property
+    def pdf_path(self) -> Optional[Path]:
+        """The uploaded PDF, or the PDF converted from a CAD upload, if any."""
+        upload = self.upload_path
+        if upload is not None and upload.suffix.lower() == ".pdf":
+            return upload
+        pdfs = sorted(self.upload_dir.glob("*.pdf")) if self.upload_dir.exists() else []
+        return pdfs[0] if pdfs else None
+
+    def new_run_dir(self) -> Path:
+        """Create and remember a fresh run folder for an inference pass."""
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        self.runs_dir.mkdir(parents=True, exist_ok=True)
+        # Every run gets a counter, so runs started within the same second never
+        # share (and overwrite) a folder; run_sort_key orders them
+        for n in itertools.count():
+            run_dir = self.runs_dir / f"run_{timestamp}_{n:02d}"
+            try:
+                run_dir.mkdir()
+                break
+            except FileExistsError:
+                continue
+        self.run_dir = run_dir
+        return run_dir
+
+    def latest_run_dir(self) -> Optional[Path]:
+        """The run folder of the last inference pass on this job."""
+        if self.run_dir is not None and self.run_dir.exists():
+            return self.run_dir
+        runs = sorted(self.runs_dir.glob("run_*"), key=run_sort_key) if self.runs_dir.exists() else []
+        return runs[-1] if runs else None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "status": self.status,
+            "error": self.error,
+            "pages_total": self.pages_total,
+            "pages_done": self.pages_done,
+            "created_at": self.created_at,
+            "run_dir": str(self.run_dir) if self.run_dir else None,
+            "model": self.model_name,
+        }
+
+
+class JobRegistry:
+    """Thread-safe registry of jobs rooted under the upload and output folders."""
+
+    def __init__(self, upload_root: Path, output_root: Path):
+        self.upload_root = Path(upload_root)
+        self.output_root = Path(output_root)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _make_job(self, job_id, created_at=None) -> Job:
+        job = Job(
+            job_id=job_id,
+            upload_dir=self.upload_root / job_id,
+            output_dir=self.output_root / job_id,
+        )
+        if created_at is not None:
+            job.created_at = created_at
+        return job
+
+    def create(self, filename: Optional[str] = None) -> Job:
+        job = self._make_job(uuid.uuid4().hex)
+        job.filename = filename
+        job.upload_dir.mkdir(parents=True, exist_ok=True)
+        job.output_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        if not job_id or not _JOB_ID_RE.match(job_id):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None and (self.upload_root / job_id).is_dir():
+                # Known on disk but not in this process (restart / other replica)
+                job = self._make_job(job_id, (self.upload_root / job_id).stat().st_mtime)
+                upload = job.upload_path
+                job.filename = upload.name if upload else None
+                job.status = "uploaded" if upload else "created"
+                self._jobs[job_id] = job
+            return job
+
+    def latest(self) -> Optional[Job]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return max(jobs, key=lambda j: j.created_at) if jobs else None
+
+    def all(self) -> list:
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.created_at)
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is None:
+            return False
+        shutil.rmtree(job.upload_dir, ignore_errors=True)
+        shutil.rmtree(job.output_dir, ignore_errors=True)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._jobs.clear()
@@ -1,19 +1,47 @@
 
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, File, Request, UploadFile
+from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pathlib import Path
-from ultralytics import YOLO
-import shutil, os, time, traceback
+import shutil, os, re, time, traceback
 import convertapi
 from PIL import Image
 import fitz, io
+import numpy as np
 from dotenv import load_dotenv
 import asyncio
+import json
+from contextlib import aclosing
 from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 
-from meta_data import extract_drawing_metadata
+from meta_data import METADATA_CONCURRENCY, extract_metadata_for_pages_async
+from batch_inference import INFERENCE_BATCH_SIZE, PREDICT_CONF, PREDICT_IOU, infer_batch, iter_batches, page_result
+from tiling import TILE_OVERLAP, TILE_SIZE, detect_array, infer_tiled_page
+from jobs import JobRegistry
+from page_stream import (
+    RENDER_WORKERS, RenderedPage, configure_pil, count_pages, get_render_pool, load_image_page, page_chunks,
+    plan_zoom, record_render, render_plan_key, shutdown_render_pool, stream_pdf_pages, worker_document,
+)
+from scheduler import FairScheduler
+from cache import ContentCache, file_sha256, make_key
+from model_export import INFERENCE_BACKEND
+from model_registry import DEFAULT_MODEL, ModelRegistry
+from detection_store import DetectionStore, open_store, remember_store
+from annotate import ANNOTATE_MAX_SIDE, annotated_path, render_annotated
+from pyramid import block_marker, build_block, dzi_descriptor, max_level, tile_path
+from title_block import TITLE_BLOCK_CROP, crop_title_block
+from text_layer import TEXT_LAYER_METADATA, extract_text_metadata
+from cad_render import CAD_LAYOUTS, CAD_LOCAL_RENDER, cad_plan_key, dxf_to_pdf
+from triage import TRIAGE, TRIAGE_MODES, triage_key, triage_page
+from ingest import OffsetMismatch, UploadSessions, UploadSizeLimit, UploadTooLarge, save_upload_file
+from metrics import (
+    DETECTIONS, INFERENCE_PAGE_SECONDS, METADATA_PAGES, PAGES, UPLOAD_BYTES, current_job, forget_job, job_trace,
+    observe_stage, render_metrics, timed,
+)
 
 
 # ============================================================
@@ -28,6 +56,9 @@ OUTPUT_DIR = BASE_DIR / "outputs"
 UPLOAD_DIR.mkdir(exist_ok=True)
 OUTPUT_DIR.mkdir(exist_ok=True)
 
+# Page images can be far larger than PIL's default limit
+configure_pil()
+
 # Model path handling: prefer a project-relative model at ./model/best.pt.
 # If an environment variable MODEL_PATH is set, use that. If neither exists but
 # the original absolute Windows path exists (development machine), fall back to it.
@@ -37,16 +68,9 @@ candidate = Path(env_model) if env_model else (BASE_DIR / "model" / "best.pt")
 if not candidate.exists() and Path(DEFAULT_WIN_MODEL).exists():
     candidate = Path(DEFAULT_WIN_MODEL)
 
+# Weights of the default model version; loaded by /load_model (and at startup)
 MODEL_PATH = str(candidate)
 
-# Try to load model but don't let a failure crash the app at import time. The
-# `load_model` route can be used to (re)load later if needed.
-try:
-    MODEL = YOLO(MODEL_PATH)
-except Exception as e:
-    MODEL = None
-    print(f"Warning: could not load MODEL at {MODEL_PATH}: {e}")
-
 app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
 app.mount("/outputs", StaticFiles(directory=str(OUTPUT_DIR)), name="outputs")
 
@@ -68,6 +92,13 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 OUTPUT_DIR.mkdir(exist_ok=True)
 MODEL_DIR.mkdir(exist_ok=True)
 
+# ---------------------------
+# Upload size limit
+# ---------------------------
+# Multipart uploads over UPLOAD_MAX_MB are refused before Starlette spools
+# them (added before CORS so the 413 still carries CORS headers)
+app.add_middleware(UploadSizeLimit, paths=("/upload", "/process", "/jobs"))
+
 # ---------------------------
 # CORS Setup
 # ---------------------------
@@ -84,15 +115,80 @@ app.add_middleware(
 app.mount("/outputs", StaticFiles(directory=str(OUTPUT_DIR)), name="outputs")
 
 # ---------------------------
-# Global Model
+# Model Registry
+# ---------------------------
+# Named model versions (see model_registry.py). Each run acquires the version
+# it uses, so /load_model can swap weights while jobs are still running.
+def _retire_model(version):
+    # Stop the version's warm pool unless another loaded version runs the same file
+    if version.path not in models.paths():
+        shutdown_inference_pool(version.path, wait=False)
+
+
+models = ModelRegistry(on_retire=_retire_model)
+
+# ---------------------------
+# Jobs
+# ---------------------------
+jobs = JobRegistry(UPLOAD_DIR, OUTPUT_DIR)
+
+# Last full /results response per job, reused while its ETag still matches
+_results_responses = {}
+
 # ---------------------------
-model = None
+# Content Cache
+# ---------------------------
+# Rendered pages and detections keyed by upload hash, render plan and model checksum.
+# Lives outside uploads/outputs so /reset does not wipe it.
+CACHE_DIR = BASE_DIR / "cache"
+content_cache = ContentCache(CACHE_DIR)
+
+# Chunked uploads still arriving, by job ID
+upload_sessions = UploadSessions()
+
+
+def resolve_job(job_id=None):
+    """Look up a job by ID; without an ID fall back to the most recent job."""
+    return jobs.get(job_id) if job_id else jobs.latest()
+
+
+def upload_failed(job, e):
+    """Drop the job of a failed upload; an upload over the size limit gets a 413."""
+    jobs.delete(job.job_id)
+    if isinstance(e, UploadTooLarge):
+        return JSONResponse({"status": "failed", "error": str(e)}, status_code=413)
+    return {"error": str(e), "status": "failed"}
+
+
+def unknown_job(job_id):
+    if job_id:
+        return {"status": "failed", "error": f"Unknown job: {job_id}"}
+    return {"status": "failed", "error": "No uploaded file found"}
+
+
+# ---------------------------
+# Detection Classes
+# ---------------------------
+CLASS_NAMES = [
+    "Cove Light", "Door", "Downlight", "Emergency Light Fitting",
+    "Fluorescent Light", "Socket Outlet", "Exit Sign"
+]
+
+
+def class_name(cls_id):
+    return CLASS_NAMES[cls_id] if 0 <= cls_id < len(CLASS_NAMES) else "Unknown"
 
 
 # ---------------------------
 # Utility Functions
 # ---------------------------
 
+def page_sort_key(path):
+    """Sort page_<n> files by page number rather than name or mtime."""
+    match = re.search(r"(\d+)$", Path(path).stem)
+    return (int(match.group(1)) if match else 0, Path(path).name)
+
+
 def clear_directory(path: Path):
     """Delete all contents of a directory"""
     if path.exists():
@@ -104,8 +200,12 @@ def clear_directory(path: Path):
 
 
 
+# CAD formats: DXF is drawn locally (cad_render.py), the rest go through ConvertAPI
+CAD_EXTENSIONS = (".dwf", ".dwfx", ".dwg", ".dxf")
+
+
 def convert_dwf_to_pdf(dwf_file_path: str) -> str:
-    """Convert DWF to PDF using ConvertAPI."""
+    """Convert DWF/DWFX/DWG (or DXF, when not drawn locally) to PDF using ConvertAPI."""
     try:
         import convertapi
         convertapi.api_credentials = os.getenv("Convert_API_KEY")
@@ -114,7 +214,8 @@ def convert_dwf_to_pdf(dwf_file_path: str) -> str:
         dwf_file_path = os.path.abspath(dwf_file_path)
         output_dir = os.path.dirname(dwf_file_path) or os.getcwd()
 
-        result = convertapi.convert("pdf", {"File": dwf_file_path,'SpaceToConvert': "all"}, from_format="dwf")
+        from_format = Path(dwf_file_path).suffix.lower().lstrip(".")
+        result = convertapi.convert("pdf", {"File": dwf_file_path,'SpaceToConvert': "all"}, from_format=from_format)
         saved_files = result.save_files(output_dir)
 
         if saved_files:
@@ -128,52 +229,97 @@ def convert_dwf_to_pdf(dwf_file_path: str) -> str:
         raise
 
 
+async def save_upload(file: UploadFile, job) -> Path:
+    """Stream an uploaded file into the job's upload folder, hashing it on the way, and return its path."""
+    ext = Path(file.filename).suffix.lower()
+    filename = f"file{ext}"
+    file_path = job.upload_dir / filename
+    with timed("upload", job.job_id):
+        size, job.content_hash = await save_upload_file(file, file_path)
+    UPLOAD_BYTES.observe(size)
+    job.filename = file.filename
+    job.status = "uploaded"
+    print(f"✅ Uploaded: {file.filename} -> job {job.job_id}")
+    return file_path
+
+
 # Worker function for parallel page conversion (must be at module level for pickling)
-def _convert_page_worker(pdf_path_str, page_num, output_dir_str):
-    """Convert a single PDF page to image."""
-    try:
-        doc = fitz.open(pdf_path_str)
-        page = doc.load_page(page_num)
-        pix = page.get_pixmap(matrix=fitz.Matrix(6, 6))
-        img_path = Path(output_dir_str) / f"page_{page_num + 1}.jpg"
-        pix.save(str(img_path))
-        doc.close()
-        return {"page": page_num + 1, "path": str(img_path), "success": True}
-    except Exception as e:
-        return {"page": page_num + 1, "error": str(e), "success": False}
+def _convert_pages_worker(pdf_path_str, page_nums, output_dir_str):
+    """Convert a run of PDF pages to images, from the worker's already open document."""
+    results = []
+    for page_num in page_nums:
+        start = time.perf_counter()
+        try:
+            page = worker_document(pdf_path_str).load_page(page_num)
+            zoom = plan_zoom(page)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            img_path = Path(output_dir_str) / f"page_{page_num + 1}.jpg"
+            pix.save(str(img_path))
+            results.append({
+                "page": page_num + 1, "path": str(img_path), "success": True, "zoom": zoom,
+                "seconds": time.perf_counter() - start,
+            })
+        except Exception as e:
+            results.append({"page": page_num + 1, "error": str(e), "success": False})
+    return results
+
+
+# ---------------------------
+# Inference Worker Pool
+# ---------------------------
+# A long-lived pool of inference processes. Each worker loads the YOLO weights
+# once (in the pool initializer) and keeps them for every page it is sent, so a
+# drawing set no longer pays a model load and a process spawn per page.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "4"))
+
+inference_pools = {}  # model path -> warm pool
+_inference_pool_lock = asyncio.Lock()
+
+# Per-process model cache, populated inside each worker process
+_worker_model = None
+_worker_model_path = None
+
 
+def _init_inference_worker(model_path):
+    """Pool initializer: load the model once for this worker process."""
+    global _worker_model, _worker_model_path
+    from ultralytics import YOLO
 
+    configure_pil()
 
+    _worker_model = YOLO(model_path, task="detect")
+    _worker_model_path = model_path
+
+
+def _get_worker_model(model_path):
+    """Return the model cached in this process, loading it on first use."""
+    if _worker_model is None or _worker_model_path != model_path:
+        _init_inference_worker(model_path)
+    return _worker_model
+
+
+def _warmup_worker():
+    """No-op task used to force the pool to spawn (and warm) its workers."""
+    return os.getpid()
 
 
 # Worker function for parallel inference (must be at module level)
 def _inference_worker(model_path, img_path_str, run_dir_str, page_num):
     """Run YOLO inference on a single page."""
     try:
-        from ultralytics import YOLO
-        
-        # Load model in worker process
-        model = YOLO(model_path)
+        # Reuse the weights already loaded in this worker process
+        model = _get_worker_model(model_path)
         
+        # Detection only: annotated previews are drawn later, for pages that are opened
         results = model.predict(
             source=img_path_str,
-            project=str(Path(run_dir_str).parent),
-            name=Path(run_dir_str).name,
-            exist_ok=True,
-            save=True,
-            conf=0.10,
-            iou=0.20,
-            save_txt=True,
-            save_conf=True,
-            hide_labels=True
+            conf=PREDICT_CONF,
+            iou=PREDICT_IOU,
+            verbose=False
         )
-        
-        return {
-            "page": page_num,
-            "image": img_path_str,
-            "success": True,
-            "detections": len(results[0].boxes) if results else 0
-        }
+
+        # Boxes, classes and confidences go back as arrays for the run's DetectionStore
+        return page_result(page_num, img_path_str, results[0])
     except Exception as e:
         return {
             "page": page_num,
@@ -183,47 +329,107 @@ def _inference_worker(model_path, img_path_str, run_dir_str, page_num):
         }
 
 
+async def start_inference_pool(model_path, max_workers=INFERENCE_WORKERS):
+    """Start (or reuse) the warm inference pool for the given weights; one pool per loaded model file."""
+    async with _inference_pool_lock:
+        if model_path in inference_pools:
+            return inference_pools[model_path]
 
+        print(f"🔥 Starting {max_workers} warm inference workers for {model_path}")
+        start = time.perf_counter()
+        pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_inference_worker,
+            initargs=(model_path,),
+        )
+
+        # Submit one no-op per worker so every process is spawned and has its
+        # weights loaded before the first real page arrives.
+        loop = asyncio.get_event_loop()
+        try:
+            await asyncio.gather(*[
+                loop.run_in_executor(pool, _warmup_worker) for _ in range(max_workers)
+            ])
+        except Exception:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        print(f"✅ Inference pool ready in {time.perf_counter() - start:.1f}s")
 
-async def pdf_to_images(pdf_path, output_dir, max_workers=4):
-    """Asynchronously convert PDF to images using parallel workers."""
+        inference_pools[model_path] = pool
+        return pool
+
+
+def shutdown_inference_pool(model_path=None, wait=True):
+    """Stop the warm pool of one model file, or all of them; wait=False lets queued pages finish."""
+    for path in [model_path] if model_path else list(inference_pools):
+        pool = inference_pools.pop(path, None)
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=wait)
+
+
+
+
+# ---------------------------
+# Stage Schedulers
+# ---------------------------
+# Global caps on CPU-heavy work across all requests, with fair round-robin
+# queuing between jobs. The in-process model runs one batch at a time, so its
+# scheduler has a single slot. Title-block OCR is network-bound, but shares the
+# same queuing so one large set cannot use up the API quota for everyone.
+render_scheduler = FairScheduler("render", RENDER_WORKERS)
+inference_scheduler = FairScheduler("inference", INFERENCE_WORKERS)
+model_scheduler = FairScheduler("model", 1)
+ocr_scheduler = FairScheduler("ocr", METADATA_CONCURRENCY)
+stage_schedulers = (render_scheduler, inference_scheduler, model_scheduler, ocr_scheduler)
+
+
+async def pdf_to_images(pdf_path, output_dir, job=None):
+    """Asynchronously convert PDF to images on the shared, scheduled render pool."""
     pdf_path = Path(pdf_path)
     output_dir = Path(output_dir)
     output_dir.mkdir(exist_ok=True)
 
     try:
-        # Get page count first
-        doc = fitz.open(pdf_path)
-        total_pages = len(doc)
-        doc.close()
-        
-        print(f"📄 Processing PDF with {total_pages} pages using {max_workers} workers...")
+        # Get page count first (render workers keep their own open copy)
+        total_pages = await asyncio.to_thread(count_pages, pdf_path)
+
+        print(f"📄 Processing PDF with {total_pages} pages on the shared render pool...")
+        if job is not None:
+            job.pages_total, job.pages_done = total_pages, 0
 
-        # Create parallel tasks for all pages
+        # Pages go out in runs of consecutive pages, each holding one render
+        # slot, so concurrent jobs still share the pool fairly while a worker
+        # renders several pages from the document it already has open.
         loop = asyncio.get_event_loop()
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
-            tasks = [
-                loop.run_in_executor(
-                    executor,
-                    _convert_page_worker,
-                    str(pdf_path),
-                    i,
-                    str(output_dir)
+        executor = get_render_pool()
+        job_id = job.job_id if job is not None else "default"
+
+        async def render(chunk):
+            async with render_scheduler.slot(job_id):
+                chunk_results = await loop.run_in_executor(
+                    executor, _convert_pages_worker, str(pdf_path), chunk, str(output_dir)
                 )
-                for i in range(total_pages)
-            ]
-            
-            # Execute all pages in parallel
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            if job is not None:
+                job.pages_done += len(chunk)
+            return chunk_results
+
+        # Execute all chunks in parallel (bounded by the render scheduler)
+        chunks = page_chunks(total_pages)
+        chunk_results = await asyncio.gather(*[render(c) for c in chunks], return_exceptions=True)
+        results = []
+        for chunk, result in zip(chunks, chunk_results):
+            if isinstance(result, Exception):
+                results.extend({"page": i + 1, "error": str(result), "success": False} for i in chunk)
+            else:
+                results.extend(result)
 
         # Collect results
         image_paths = []
         failed = []
         
         for result in results:
-            if isinstance(result, Exception):
-                failed.append({"error": str(result)})
-            elif result.get("success"):
+            record_render(result, job.job_id if job is not None else None)
+            if result.get("success"):
                 image_paths.append(result["path"])
                 print(f"🖼️ Saved page {result['page']}: {result['path']}")
             else:
@@ -243,6 +449,19 @@ async def pdf_to_images(pdf_path, output_dir, max_workers=4):
         return {"status": "failed", "error": str(e)}
 
 
+async def cad_to_pdf(input_path, job_id="default", layouts=CAD_LAYOUTS, layers=None, region=None):
+    """PDF for a CAD upload: DXF drawn locally on the render pool, other formats through ConvertAPI."""
+    if Path(input_path).suffix.lower() == ".dxf" and CAD_LOCAL_RENDER:
+        loop = asyncio.get_event_loop()
+        async with render_scheduler.slot(job_id):
+            with timed("cad_render"):
+                return await loop.run_in_executor(
+                    get_render_pool(), dxf_to_pdf, str(input_path), None, layouts, layers, region
+                )
+    # Offload the blocking remote conversion to a thread
+    return await asyncio.to_thread(convert_dwf_to_pdf, input_path)
+
+
 
 
 
@@ -250,6 +469,109 @@ async def pdf_to_images(pdf_path, output_dir, max_workers=4):
 # Routes
 # ---------------------------
 
+@app.get("/jobs")
+def list_jobs():
+    """List known jobs, oldest first."""
+    return {"jobs": [job.to_dict() for job in jobs.all()]}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Job status and progress, plus how many of its work units are still queued."""
+    job = jobs.get(job_id)
+    if job is None:
+        return unknown_job(job_id)
+    return {
+        **job.to_dict(),
+        "queued_units": {s.name: s.queued(job_id) for s in stage_schedulers},
+    }
+
+
+# Keep references to background jobs so they are not garbage collected mid-run
+_background_tasks = set()
+
+
+async def _run_job_in_background(job, mode):
+    """Preprocess and run inference for a submitted job, recording failures on the job."""
+    try:
+        result = await preprocess_file(job.job_id)
+        if result.get("status") != "failed":
+            if models.get(job.model_name) is None and job.model_name in (None, DEFAULT_MODEL):
+                await load_model()
+            result = await run_inference(job_id=job.job_id, mode=mode)
+        if result.get("status") == "failed":
+            job.status = "failed"
+            job.error = result.get("error")
+    except Exception as e:
+        traceback.print_exc()
+        job.status = "failed"
+        job.error = str(e)
+
+
+@app.post("/jobs")
+async def submit_job(file: UploadFile = File(...), mode: str = "pool", model_name: Optional[str] = None):
+    """Upload a file and process it in the background (on the named model version); poll /jobs/{job_id} for status."""
+    job = jobs.create(file.filename)
+    job.model_name = model_name
+    try:
+        await save_upload(file, job)
+    except Exception as e:
+        return upload_failed(job, e)
+
+    job.status = "queued"
+    task = asyncio.create_task(_run_job_in_background(job, mode))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return {"job_id": job.job_id, "status": job.status, "status_url": f"/jobs/{job.job_id}"}
+
+
+@app.get("/scheduler")
+def scheduler_stats():
+    """Queue depth, running units and wait times for each scheduled stage."""
+    return {
+        "stages": [s.stats() for s in stage_schedulers],
+        "background_jobs": len(_background_tasks),
+    }
+
+
+@app.get("/jobs/{job_id}/trace")
+def get_job_trace(job_id: str):
+    """Where a job spent its time: units, total, mean and max milliseconds per stage."""
+    job = jobs.get(job_id)
+    if job is None:
+        return unknown_job(job_id)
+    return {"job_id": job_id, "status": job.status, "stages": job_trace(job_id) or {}}
+
+
+@app.get("/metrics")
+def metrics():
+    """Stage latency histograms and throughput counters in the Prometheus text format."""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.delete("/jobs/{job_id}")
+def delete_job(job_id: str):
+    """Delete a job and its upload/output folders."""
+    if not jobs.delete(job_id):
+        return unknown_job(job_id)
+    _results_responses.pop(job_id, None)
+    upload_sessions.discard(job_id)
+    forget_job(job_id)
+    return {"status": "ok", "job_id": job_id}
+
+
+@app.get("/cache")
+def cache_stats():
+    """Number of cached page sets and detection runs, and the bytes they use."""
+    return content_cache.stats()
+
+
+@app.delete("/cache")
+def clear_cache():
+    content_cache.clear()
+    return {"status": "ok", "message": "cache cleared"}
+
+
 @app.get("/reset")
 def reset_storage():
     """Clear all uploaded and output files."""
@@ -261,8 +583,11 @@ def reset_storage():
                 else:
                     item.unlink()
 
-        global last_uploaded_file
-        last_uploaded_file = None
+        for job in jobs.all():
+            forget_job(job.job_id)
+        jobs.clear()
+        upload_sessions.clear()
+        _results_responses.clear()
         print("🧹 All files cleared successfully.")
         return {"status": "ok", "message": "uploads and outputs cleared"}
     except Exception as e:
@@ -271,117 +596,358 @@ def reset_storage():
 
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
-    """Save uploaded file."""
+    """Save uploaded file into a new job."""
+    job = jobs.create(file.filename)
     try:
-        ext = Path(file.filename).suffix.lower()
-        filename = f"file{ext}"
-        file_path = UPLOAD_DIR / filename
-        with open(file_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-        print(f"✅ Uploaded: {filename}")
-        return {"filename": filename, "path": str(file_path), "status": "Complete"}
+        file_path = await save_upload(file, job)
+        return {"job_id": job.job_id, "filename": file_path.name, "path": str(file_path), "status": "Complete"}
     except Exception as e:
-        return {"error": str(e), "status": "failed"}
+        return upload_failed(job, e)
+
 
 
+# ---------------------------
+# Chunked uploads
+# ---------------------------
+# For sets too large to send in one request: POST /uploads declares the file,
+# then PATCH /uploads/{job_id}?offset= sends each chunk as the raw request body.
+# Chunks are streamed to disk as they arrive, never spooled. After a dropped
+# connection, GET /uploads/{job_id} gives the offset to resume from.
+@app.post("/uploads")
+def start_upload(filename: str, size: int, model_name: Optional[str] = None):
+    """Open a chunked upload of `size` bytes in a new job."""
+    job = jobs.create(filename)
+    job.model_name = model_name
+    try:
+        session = upload_sessions.create(job, filename, size)
+    except Exception as e:
+        return upload_failed(job, e)
+    job.status = "uploading"
+    return {"status": "ok", **session.to_dict()}
+
+
+@app.get("/uploads/{job_id}")
+async def upload_status(job_id: str):
+    """Bytes received so far for a chunked upload."""
+    job = jobs.get(job_id)
+    session = await upload_sessions.get(job) if job is not None else None
+    if session is None:
+        return JSONResponse({"status": "failed", "error": f"No upload in progress for job: {job_id}"}, status_code=404)
+    return {"status": "ok", **session.to_dict()}
+
+
+@app.patch("/uploads/{job_id}")
+async def upload_chunk(job_id: str, offset: int, request: Request):
+    """Append the request body at `offset`; the last chunk moves the file into place."""
+    job = jobs.get(job_id)
+    session = await upload_sessions.get(job) if job is not None else None
+    if session is None:
+        return JSONResponse({"status": "failed", "error": f"No upload in progress for job: {job_id}"}, status_code=404)
+
+    length = request.headers.get("content-length")
+    if length is not None and offset + int(length) > session.size:
+        return JSONResponse({"status": "failed", "error": "Chunk runs past the declared size"}, status_code=413)
+    try:
+        with timed("upload_chunk", job.job_id):
+            await upload_sessions.append(session, offset, request.stream())
+    except OffsetMismatch as e:
+        return JSONResponse({"status": "failed", "error": str(e), **session.to_dict()}, status_code=409)
+    except UploadTooLarge:
+        return JSONResponse(
+            {"status": "failed", "error": "Chunk runs past the declared size", **session.to_dict()}, status_code=413
+        )
+
+    if not session.complete:
+        return {"status": "ok", **session.to_dict()}
+    job.content_hash = await asyncio.to_thread(upload_sessions.finish, job, session)
+    UPLOAD_BYTES.observe(session.size)
+    job.filename = session.filename
+    job.status = "uploaded"
+    print(f"✅ Uploaded in chunks: {session.filename} -> job {job.job_id}")
+    return {"status": "ok", **session.to_dict(), "path": str(session.path)}
+
 
 @app.get("/preprocess")
-async def preprocess_file():
-    """Convert uploaded file (PDF/DWF/Image) to images in pdf_pages folder."""
+async def preprocess_file(job_id: Optional[str] = None, use_cache: bool = True, layouts: str = CAD_LAYOUTS,
+                          layers: Optional[str] = None, region: Optional[str] = None):
+    """
+    Convert the job's uploaded file (PDF/CAD/Image) to images in its pdf_pages folder.
+
+    For a DXF, layouts picks the pages ("auto", "model", "paper" or layout
+    names), layers limits drawing to comma-separated layer names and region to
+    x0,y0,x1,y1 in drawing units.
+    """
     try:
-        uploaded_files = list(UPLOAD_DIR.glob("file.*"))
-        if not uploaded_files:
-            return {"status": "failed", "error": "No uploaded file found"}
+        job = resolve_job(job_id)
+        if job is None or job.upload_path is None:
+            return unknown_job(job_id)
+        current_job.set(job.job_id)
 
-        input_path = uploaded_files[0]
+        input_path = job.upload_path
         ext = input_path.suffix.lower()
-        pdf_output_dir = OUTPUT_DIR / "pdf_pages"
-        pdf_output_dir.mkdir(exist_ok=True)
+        pdf_output_dir = job.pages_dir
+        pdf_output_dir.mkdir(parents=True, exist_ok=True)
+        job.status = "preprocessing"
 
-        # Clear old pages first
+        # Clear old pages (and tiles cut from them) first
         clear_directory(pdf_output_dir)
+        clear_directory(job.output_dir / "tiles")
         pdf_output_dir.mkdir(exist_ok=True)
 
+        # Identical upload rendered before: link the cached pages in and skip rendering
+        if job.content_hash is None:
+            job.content_hash = await asyncio.to_thread(file_sha256, input_path)
+        cad_key = cad_plan_key(layouts, layers, region) if ext == ".dxf" and CAD_LOCAL_RENDER else ()
+        job.pages_key = make_key(job.content_hash, *render_plan_key(), *cad_key)
+        if use_cache:
+            cached = await asyncio.to_thread(content_cache.restore, "pages", job.pages_key, pdf_output_dir)
+            if cached is not None:
+                print(f"⚡ Cache hit: {cached['pages']} rendered pages reused")
+                images = sorted(pdf_output_dir.glob("*.jpg"), key=page_sort_key)
+                job.status = "preprocessed"
+                job.pages_total = job.pages_done = cached["pages"]
+                return {"job_id": job.job_id, "status": "success", "pages": cached["pages"],
+                        "images": [str(p) for p in images], "cached": True}
+
         if ext == ".pdf":
-            return await pdf_to_images(input_path, pdf_output_dir, max_workers=4)
+            result = await pdf_to_images(input_path, pdf_output_dir, job)
             
-        elif ext in [".dwf", ".dwfx", "dwg", ".dxf"]:
-            # Offload blocking DWF conversion to thread
-            pdf_path = await asyncio.to_thread(convert_dwf_to_pdf, input_path)
-            return await pdf_to_images(pdf_path, pdf_output_dir, max_workers=4)
+        elif ext in CAD_EXTENSIONS:
+            pdf_path = await cad_to_pdf(input_path, job.job_id, layouts, layers, region)
+            result = await pdf_to_images(pdf_path, pdf_output_dir, job)
             
         elif ext in [".jpg", ".jpeg", ".png"]:
             dest = pdf_output_dir / "page_1.jpg"
             # Offload file copy to thread
             await asyncio.to_thread(shutil.copy2, input_path, dest)
             print(f"🖼️ Image copied to {dest}")
-            return {"status": "success", "pages": 1, "images": [str(dest)]}
+            result = {"status": "success", "pages": 1, "images": [str(dest)]}
             
         else:
-            return {"status": "failed", "error": f"Unsupported file format: {ext}"}
+            result = {"status": "failed", "error": f"Unsupported file format: {ext}"}
+
+        job.status = "preprocessed" if result["status"] != "failed" else "failed"
+        if result["status"] == "success":
+            await asyncio.to_thread(
+                content_cache.store, "pages", job.pages_key, pdf_output_dir, {"pages": result["pages"]}
+            )
+        return {"job_id": job.job_id, **result}
 
     except Exception as e:
         traceback.print_exc()
         return {"status": "failed", "error": str(e)}
 
 @app.get("/load_model")
-async def load_model():
-    """Load YOLO model once."""
-    global model
+async def load_model(backend: Optional[str] = None, name: str = DEFAULT_MODEL, weights: Optional[str] = None,
+                     make_default: bool = False):
+    """
+    Load (or hot-reload) a named model version and warm up its inference worker pool.
+
+    weights is a file in the model folder (default: MODEL_PATH for the default
+    version, best.pt otherwise). Reloading a name with changed weights or
+    backend swaps the new version in; runs already going finish on the old one.
+    """
     try:
-        if model is None:
-            model_path = MODEL_DIR / "best.pt"
-            print(f"📦 Loading model from {model_path}")
-            model = YOLO(str(model_path))
-            print("✅ Model loaded.")
+        backend = (backend or INFERENCE_BACKEND).lower()
+        if weights is None:
+            weights_path = Path(MODEL_PATH) if name == DEFAULT_MODEL else MODEL_DIR / "best.pt"
         else:
-            print("⚡ Model already loaded.")
-        return {"status": "ok"}
+            weights_path = (MODEL_DIR / weights).resolve()
+            if MODEL_DIR.resolve() not in weights_path.parents or not weights_path.is_file():
+                return {"status": "failed", "error": f"No weights named {weights} in the model folder"}
+
+        # Exports are cached, so only the first load on a backend pays for one
+        version, loaded = await asyncio.to_thread(models.load, name, weights_path, backend, make_default)
+        if loaded:
+            print(f"✅ Model '{name}' loaded from {version.path} ({backend})")
+        else:
+            print(f"⚡ Model '{name}' already loaded.")
+
+        await start_inference_pool(version.path)
+        return {"status": "ok", "backend": version.backend, "model": version.to_dict(), "default": models.default}
     except Exception as e:
         traceback.print_exc()
         return {"error": str(e), "status": "failed"}
 
 
-@app.get("/inference")
-async def run_inference(max_workers=4):
-    """Run YOLO inference on all pages in parallel."""
-    global model
+@app.get("/models")
+def list_models():
+    """Loaded model versions, the default, and versions still finishing runs after a swap."""
+    return models.to_dict()
+
+
+@app.post("/models/{name}/default")
+def set_default_model(name: str):
+    """Make a loaded version the one jobs use when they do not name a model."""
     try:
-        if model is None:
-            return {"status": "failed", "error": "Model not loaded"}
+        models.set_default(name)
+    except LookupError as e:
+        return {"status": "failed", "error": str(e)}
+    return {"status": "ok", "default": name}
+
+
+@app.delete("/models/{name}")
+def unload_model(name: str):
+    """Unload a version; its runs in flight finish first."""
+    try:
+        models.unload(name)
+    except (LookupError, ValueError) as e:
+        return {"status": "failed", "error": str(e)}
+    return {"status": "ok", **models.to_dict()}
+
 
-        images_dir = OUTPUT_DIR / "pdf_pages"
-        image_files = sorted(images_dir.glob("*.jpg"), key=os.path.getmtime)
+@app.on_event("startup")
+async def warm_up_on_startup():
+    """Load the model and start the warm worker pool when the app boots."""
+    if Path(MODEL_PATH).exists():
+        await load_model()
+    else:
+        print("⚠️ No weights found at startup; call /load_model once they are in place.")
+
+
+@app.on_event("shutdown")
+def stop_worker_pools():
+    shutdown_inference_pool()
+    shutdown_render_pool()
+
+
+@app.get("/inference")
+async def run_inference(job_id: Optional[str] = None, max_workers=INFERENCE_WORKERS, mode: str = "pool",
+                        batch_size: int = INFERENCE_BATCH_SIZE, tile_size: int = TILE_SIZE, overlap: int = TILE_OVERLAP,
+                        use_cache: bool = True, model_name: Optional[str] = None, triage: Optional[str] = None):
+    """Run YOLO inference on all pages: on the worker pool, batched, or tiled on the loaded model."""
+    version = None
+    try:
+        if mode not in ("pool", "batch", "tiled"):
+            return {"status": "failed", "error": f"Unsupported inference mode: {mode}"}
+        triage = (triage or TRIAGE).lower()
+        if triage not in TRIAGE_MODES:
+            return {"status": "failed", "error": f"Unsupported triage mode: {triage}"}
+
+        job = resolve_job(job_id)
+        if job is None:
+            return unknown_job(job_id)
+        current_job.set(job.job_id)
+
+        # The run keeps this version even if the name is reloaded meanwhile
+        try:
+            version = models.acquire(model_name or job.model_name)
+        except LookupError as e:
+            return {"status": "failed", "error": str(e)}
+        model = version.model
+        job.model_name = version.name
+
+        image_files = sorted(job.pages_dir.glob("*.jpg"), key=page_sort_key)
         if not image_files:
             return {"status": "failed", "error": "No images found for inference"}
 
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        run_dir = OUTPUT_DIR / "run" / f"run_{timestamp}"
-        run_dir.mkdir(parents=True, exist_ok=True)
+        run_dir = job.new_run_dir()
+        job.status = "inferring"
 
         total_pages = len(image_files)
-        print(f"🚀 Running inference on {total_pages} pages using {max_workers} workers...")
-
-        # Get model path for workers
-        model_path = model.model_name if hasattr(model, 'model_name') else str(model.ckpt_path)
 
-        # Create parallel tasks for all pages
+        # Same pages through the same weights and settings: reuse the cached run
+        detections_key = detections_cache_key(job, version, mode, tile_size, overlap, triage)
+        if use_cache and detections_key:
+            cached = await asyncio.to_thread(content_cache.restore, "detections", detections_key, run_dir)
+            if cached is not None:
+                print(f"⚡ Cache hit: detections for {total_pages} pages reused")
+                job.status = "completed"
+                job.pages_total = job.pages_done = total_pages
+                return {**cached["response"], "job_id": job.job_id, "run_dir": str(run_dir), "cached": True}
+
+        job.pages_total, job.pages_done = total_pages, 0
         loop = asyncio.get_event_loop()
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
-            tasks = [
-                loop.run_in_executor(
-                    executor,
-                    _inference_worker,
-                    model_path,
-                    str(img),
-                    str(run_dir),
-                    i
-                )
-                for i, img in enumerate(image_files, start=1)
-            ]
-            
-            # Execute all inferences in parallel
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        # Detections are collected as arrays while pages finish; /results can
+        # read the store (and see partial results) while the run is going
+        store = remember_store(DetectionStore(run_dir))
+
+        # Cheap triage first: in skip mode, sheets without plan content (covers,
+        # notes, schedules, blanks) never reach the detector
+        pages = list(enumerate(image_files, start=1))
+        skipped = []
+        if triage != "off":
+            for info in await triage_pages(job, pages):
+                # "skipped" marks pages actually kept from the detector; in flag
+                # mode a "skip" decision is only recorded
+                info["skipped"] = triage == "skip" and info["decision"] == "skip"
+                store.set_triage(info["page"], info)
+                if info["skipped"]:
+                    skipped.append(info["page"])
+                    store.add(info["page"], [], [], [], info.get("size", (0, 0)))
+            if skipped:
+                print(f"🗂️ Triage: skipping {len(skipped)}/{total_pages} pages without plan content: {skipped}")
+                pages = [(page_num, img) for page_num, img in pages if page_num not in skipped]
+                job.pages_done += len(skipped)
+
+        # Every unit of work waits for a slot on its stage scheduler, so the
+        # total CPU work is capped across all jobs and shared fairly.
+        if mode == "tiled":
+            # Sliding-window tiles per page, merged back with cross-tile NMS
+            print(f"🚀 Running tiled inference on {len(pages)} pages "
+                  f"(tile {tile_size}px, overlap {overlap}px, batch size {batch_size})...")
+
+            async def unit(page_num, img):
+                async with model_scheduler.slot(job.job_id):
+                    start = time.perf_counter()
+                    result = await asyncio.to_thread(
+                        infer_tiled_page, model, img, page_num, tile_size, overlap, batch_size
+                    )
+                record_inference(version, mode, time.perf_counter() - start, [result])
+                store.add_result(result)
+                job.pages_done += 1
+                return [result]
+
+            units = [unit(page_num, img) for page_num, img in pages]
+        elif mode == "batch":
+            # One forward pass per batch on the globally loaded model
+            print(f"🚀 Running batched inference on {len(pages)} pages (batch size {batch_size})...")
+
+            async def unit(chunk):
+                page_nums, batch = [p for p, _ in chunk], [img for _, img in chunk]
+                async with model_scheduler.slot(job.job_id):
+                    start = time.perf_counter()
+                    batch_results = await asyncio.to_thread(infer_batch, model, batch, page_nums)
+                record_inference(version, mode, time.perf_counter() - start, batch_results)
+                for result in batch_results:
+                    store.add_result(result)
+                job.pages_done += len(batch)
+                return batch_results
+
+            units = [unit(chunk) for chunk in iter_batches(pages, batch_size)]
+        else:
+            print(f"🚀 Running inference on {len(pages)} pages using {max_workers} workers...")
+
+            # Send pages to the warm worker pool (started on /load_model)
+            model_path = version.path
+            executor = await start_inference_pool(model_path, int(max_workers))
+
+            async def unit(page_num, img):
+                async with inference_scheduler.slot(job.job_id):
+                    start = time.perf_counter()
+                    result = await loop.run_in_executor(
+                        executor, _inference_worker, model_path, str(img), str(run_dir), page_num
+                    )
+                record_inference(version, mode, time.perf_counter() - start, [result])
+                store.add_result(result)
+                job.pages_done += 1
+                return [result]
+
+            units = [unit(page_num, img) for page_num, img in pages]
+
+        # Execute all units in parallel (bounded by the scheduler)
+        unit_results = await asyncio.gather(*units, return_exceptions=True)
+        results = []
+        for r in unit_results:
+            results.extend([r] if isinstance(r, Exception) else r)
+
+        # A crashed worker breaks the whole pool; drop it so the next call
+        # starts a fresh one instead of failing forever.
+        if any(isinstance(r, BrokenProcessPool) for r in results):
+            shutdown_inference_pool(version.path)
+
+        await asyncio.to_thread(store.save)
 
         # Collect results
         successful = []
@@ -389,9 +955,7 @@ async def run_inference(max_workers=4):
         total_detections = 0
         
         for result in results:
-            if isinstance(result, Exception):
-                failed.append({"error": str(result)})
-            elif result.get("success"):
+            if result.get("success"):
                 successful.append(result)
                 total_detections += result.get("detections", 0)
                 print(f"✅ Page {result['page']}/{total_pages}: {result['detections']} detections")
@@ -399,138 +963,864 @@ async def run_inference(max_workers=4):
                 failed.append(result)
                 print(f"❌ Page {result['page']}/{total_pages}: {result.get('error')}")
 
-        print(f"✅ Inference completed: {len(successful)}/{total_pages} pages, {total_detections} total detections")
+        print(f"✅ Inference completed: {len(successful)}/{len(pages)} pages, {total_detections} total detections")
+        job.status = "completed"
         
-        return {
-            "status": "success" if len(successful) == total_pages else "partial",
+        response = {
+            "status": "success" if len(successful) == len(pages) else "partial",
+            "job_id": job.job_id,
+            "mode": mode,
+            "model": version.name,
+            "model_checksum": version.checksum[:12],
             "run_dir": str(run_dir),
             "total_pages": total_pages,
             "successful": len(successful),
             "failed": len(failed),
             "total_detections": total_detections,
+            "triage": triage,
+            "skipped_pages": skipped,
             "errors": failed if failed else None
         }
+        if detections_key and not failed:
+            await asyncio.to_thread(content_cache.store, "detections", detections_key, run_dir, {"response": response})
+        return response
 
     except Exception as e:
         traceback.print_exc()
         return {"status": "failed", "error": str(e)}
+    finally:
+        if version is not None:
+            models.release(version)
+
+def record_inference(version, mode, seconds, results):
+    """Metrics for one unit of model work: its time split over the pages it covered, and their detections."""
+    per_page = seconds / max(len(results), 1)
+    for result in results:
+        if not result.get("success"):
+            PAGES.inc(stage="inference", outcome="failed")
+            continue
+        INFERENCE_PAGE_SECONDS.observe(per_page, mode=mode, model=version.name)
+        observe_stage("inference_page", per_page)
+        PAGES.inc(stage="inference", outcome="ok")
+        DETECTIONS.inc(result.get("detections", 0), model=version.name)
+
+
+async def triage_pages(job, pages):
+    """Triage decisions for (page number, image) pairs, scored on the render pool."""
+    loop = asyncio.get_event_loop()
+    executor = get_render_pool()
+    pdf_path = str(job.pdf_path) if job.pdf_path else None
+
+    async def one(page_num, img):
+        async with render_scheduler.slot(job.job_id):
+            with timed("triage", job.job_id):
+                info = await loop.run_in_executor(executor, triage_page, str(img), page_num, pdf_path)
+        PAGES.inc(stage="triage", outcome=info["decision"])
+        return info
+
+    return await asyncio.gather(*(one(page_num, img) for page_num, img in pages))
+
+
+def detections_cache_key(job, version, mode, tile_size, overlap, triage="off"):
+    """Cache key for a job's detections, or None when it cannot be keyed reliably."""
+    if job.pages_key is None:
+        return None
+    tiling = (tile_size, overlap) if mode == "tiled" else ()
+    return make_key(
+        job.pages_key, version.checksum, mode, *tiling, PREDICT_CONF, PREDICT_IOU, *triage_key(triage)
+    )
+
+
+def prepare_artifact_dirs(job):
+    """Fresh pdf_pages and run folders for a streamed pass that keeps artifacts."""
+    job.pages_dir.mkdir(parents=True, exist_ok=True)
+    clear_directory(job.pages_dir)
+    run_dir = job.new_run_dir()
+    return job.pages_dir, run_dir
+
+
+@app.get("/stream_inference")
+async def stream_inference(job_id: Optional[str] = None, mode: str = "batch", save_artifacts: bool = False,
+                           batch_size: int = INFERENCE_BATCH_SIZE,
+                           tile_size: int = TILE_SIZE, overlap: int = TILE_OVERLAP, model_name: Optional[str] = None):
+    """Render the uploaded PDF in memory and run inference on each page as soon as it is rendered."""
+    version = None
+    try:
+        if mode not in ("batch", "tiled"):
+            return {"status": "failed", "error": f"Unsupported inference mode: {mode}"}
+
+        job = resolve_job(job_id)
+        if job is None or job.upload_path is None:
+            return unknown_job(job_id)
+        input_path = job.upload_path
+        if input_path.suffix.lower() != ".pdf":
+            return {"status": "failed", "error": "Streaming inference only supports PDF uploads"}
+        current_job.set(job.job_id)
+
+        try:
+            version = models.acquire(model_name or job.model_name)
+        except LookupError as e:
+            return {"status": "failed", "error": str(e)}
+        model = version.model
+        job.model_name = version.name
+
+        # Pages and detections only touch disk when asked for
+        pages_dir, run_dir = prepare_artifact_dirs(job) if save_artifacts else (None, None)
+        store = remember_store(DetectionStore(run_dir)) if save_artifacts else None
+        job.status = "inferring"
+
+        print(f"🚀 Streaming render + {mode} inference for {input_path.name}...")
+        pages = []
+        render_slot = lambda: render_scheduler.slot(job.job_id)
+        async for page in stream_pdf_pages(input_path, save_dir=pages_dir, slot=render_slot):
+            if page.error:
+                pages.append({"page": page.page, "success": False, "error": page.error})
+                print(f"❌ Page {page.page}: {page.error}")
+                continue
+
+            async with model_scheduler.slot(job.job_id):
+                start = time.perf_counter()
+                boxes, classes, confs = await asyncio.to_thread(
+                    detect_array, model, page.image, mode, tile_size, overlap, batch_size
+                )
+            record_inference(version, mode, time.perf_counter() - start, [{"success": True, "detections": len(boxes)}])
+            if save_artifacts:
+                height, width = page.image.shape[:2]
+                store.add(page.page, boxes, classes, confs, (width, height))
+
+            pages.append({
+                "page": page.page,
+                "success": True,
+                "detections": int(len(boxes)),
+                "objects": [
+                    {"class_id": int(c), "confidence": round(float(p), 2), "box": [round(float(v), 1) for v in b]}
+                    for b, c, p in zip(boxes, classes, confs)
+                ],
+            })
+            print(f"✅ Page {page.page}: {len(boxes)} detections")
+
+        successful = [p for p in pages if p["success"]]
+        if store is not None:
+            await asyncio.to_thread(store.save)
+        job.status = "completed"
+        return {
+            "status": "success" if len(successful) == len(pages) else "partial",
+            "job_id": job.job_id,
+            "mode": mode,
+            "model": version.name,
+            "run_dir": str(run_dir) if run_dir else None,
+            "total_pages": len(pages),
+            "successful": len(successful),
+            "failed": len(pages) - len(successful),
+            "total_detections": sum(p["detections"] for p in successful),
+            "pages": pages,
+        }
+
+    except Exception as e:
+        traceback.print_exc()
+        return {"status": "failed", "error": str(e)}
+    finally:
+        if version is not None:
+            models.release(version)
+
+
+# ---------------------------
+# Single-call pipeline
+# ---------------------------
+# Bound on pages waiting between stages; with the render prefetch this caps how
+# many rendered pages are held in memory per /process call.
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "2"))
+
+
+async def iter_upload_pages(input_path, save_dir=None, job_id="default"):
+    """Yield in-memory pages for an uploaded PDF, CAD file or image."""
+    ext = input_path.suffix.lower()
+    if ext in [".jpg", ".jpeg", ".png"]:
+        page = await asyncio.to_thread(load_image_page, input_path)
+        if save_dir:
+            await asyncio.to_thread(shutil.copy2, input_path, Path(save_dir) / "page_1.jpg")
+        yield page
+        return
+
+    if ext in CAD_EXTENSIONS:
+        input_path = Path(await cad_to_pdf(input_path, job_id))
+    elif ext != ".pdf":
+        raise ValueError(f"Unsupported file format: {ext}")
+
+    render_slot = lambda: render_scheduler.slot(job_id)
+    async with aclosing(stream_pdf_pages(input_path, save_dir=save_dir, slot=render_slot)) as pages:
+        async for page in pages:
+            yield page
+
+
+async def _render_stage(input_path, pages_q, save_dir, job_id):
+    """Producer: push rendered pages onto the queue, then a None sentinel."""
+    try:
+        async with aclosing(iter_upload_pages(input_path, save_dir, job_id)) as pages:
+            async for page in pages:
+                await pages_q.put(page.detach())
+        await pages_q.put(None)
+    except Exception as e:
+        traceback.print_exc()
+        await pages_q.put(e)
+
+
+async def _detect_stage(pages_q, results_q, version, mode, tile_size, overlap, batch_size, run_dir, job_id):
+    """Consumer/producer: run detection on each page as it arrives."""
+    store = remember_store(DetectionStore(run_dir)) if run_dir else None
+    try:
+        while True:
+            page = await pages_q.get()
+            if page is None or isinstance(page, Exception):
+                if store is not None:
+                    await asyncio.to_thread(store.save)
+                await results_q.put(page)
+                return
+
+            try:
+                if page.error:
+                    result = {"page": page.page, "success": False, "error": page.error}
+                else:
+                    async with model_scheduler.slot(job_id):
+                        start = time.perf_counter()
+                        boxes, classes, confs = await asyncio.to_thread(
+                            detect_array, version.model, page.image, mode, tile_size, overlap, batch_size
+                        )
+                    record_inference(
+                        version, mode, time.perf_counter() - start, [{"success": True, "detections": len(boxes)}]
+                    )
+                    if store is not None:
+                        height, width = page.image.shape[:2]
+                        store.add(page.page, boxes, classes, confs, (width, height))
+                    result = {
+                        "page": page.page,
+                        "success": True,
+                        "detections": [
+                            {"class_id": int(c), "class_name": class_name(int(c)), "confidence": round(float(p), 2),
+                             "box": [round(float(v), 1) for v in b]}
+                            for b, c, p in zip(boxes, classes, confs)
+                        ],
+                    }
+            finally:
+                page.release()
+
+            await results_q.put(result)
+    except Exception as e:
+        traceback.print_exc()
+        await results_q.put(e)
+
+
+def _format_event(event, fmt):
+    """Encode one pipeline event as an NDJSON line or a server-sent event."""
+    payload = json.dumps(event)
+    if fmt == "sse":
+        return f"event: {event['type']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+@app.post("/process")
+async def process_file(file: UploadFile = File(...), mode: str = "batch", fmt: str = "ndjson",
+                       save_artifacts: bool = False, batch_size: int = INFERENCE_BATCH_SIZE,
+                       tile_size: int = TILE_SIZE, overlap: int = TILE_OVERLAP, model_name: Optional[str] = None):
+    """
+    Upload, preprocess, run inference and aggregate results in one call.
+
+    Rendering, detection and aggregation run as a bounded producer/consumer
+    pipeline, and per-page results are streamed back as they finish (NDJSON by
+    default, or server-sent events with fmt=sse).
+    """
+    if mode not in ("batch", "tiled"):
+        return {"status": "failed", "error": f"Unsupported inference mode: {mode}"}
+    if fmt not in ("ndjson", "sse"):
+        return {"status": "failed", "error": f"Unsupported stream format: {fmt}"}
+
+    # Acquired before the response starts, so a missing model is an error
+    # rather than a truncated 200 stream; held until the stream ends, so a
+    # model swap mid-stream does not change its weights
+    try:
+        version = models.acquire(model_name)
+    except LookupError as e:
+        return {"status": "failed", "error": str(e)}
+
+    job = jobs.create(file.filename)
+    try:
+        input_path = await save_upload(file, job)
+    except Exception as e:
+        models.release(version)
+        return upload_failed(job, e)
+
+    pages_dir, run_dir = prepare_artifact_dirs(job) if save_artifacts else (None, None)
+    job.model_name = version.name
+    job.status = "inferring"
+
+    async def events():
+        current_job.set(job.job_id)
+        pages_q = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        results_q = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        stages = [
+            asyncio.create_task(_render_stage(input_path, pages_q, pages_dir, job.job_id)),
+            asyncio.create_task(
+                _detect_stage(
+                    pages_q, results_q, version, mode, tile_size, overlap, batch_size, run_dir, job.job_id
+                )
+            ),
+        ]
+
+        start = time.perf_counter()
+        class_counts = {}
+        total_pages = failed_pages = total_detections = 0
+        error = None
+        try:
+            yield _format_event({
+                "type": "started", "job_id": job.job_id, "filename": job.filename, "mode": mode, "model": version.name,
+            }, fmt)
+
+            while True:
+                result = await results_q.get()
+                if result is None:
+                    break
+                if isinstance(result, Exception):
+                    error = str(result)
+                    yield _format_event({"type": "error", "error": error}, fmt)
+                    break
+
+                total_pages += 1
+                if not result["success"]:
+                    failed_pages += 1
+                    yield _format_event({"type": "page", **result}, fmt)
+                    continue
+
+                page_counts = {}
+                for d in result["detections"]:
+                    page_counts[d["class_name"]] = page_counts.get(d["class_name"], 0) + 1
+                for name, count in page_counts.items():
+                    class_counts[name] = class_counts.get(name, 0) + count
+                total_detections += len(result["detections"])
+
+                print(f"✅ Page {result['page']}: {len(result['detections'])} detections")
+                yield _format_event({"type": "page", **result, "counts": page_counts}, fmt)
+
+            # A failed stage (e.g. an unreadable PDF) fails the job, whatever pages made it through
+            if error is not None:
+                job.status, job.error = "failed", error
+                status = "failed"
+            else:
+                job.status = "completed"
+                status = "success" if failed_pages == 0 else "partial"
+            yield _format_event({
+                "type": "summary",
+                "job_id": job.job_id,
+                "status": status,
+                "error": error,
+                "total_pages": total_pages,
+                "failed_pages": failed_pages,
+                "items_found": len(class_counts),
+                "total_detections": total_detections,
+                "class_counts": class_counts,
+                "run_dir": str(run_dir) if run_dir else None,
+                "elapsed_s": round(time.perf_counter() - start, 2),
+            }, fmt)
+        finally:
+            # Client went away or a stage failed: stop the pipeline and free
+            # any rendered pages still sitting in the queue.
+            for task in stages:
+                task.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            while not pages_q.empty():
+                page = pages_q.get_nowait()
+                if isinstance(page, RenderedPage):
+                    page.release()
+            models.release(version)
+
+    media_type = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type)
+
+
+async def crop_title_blocks(job, page_images):
+    """
+    Crop each page's title block into outputs/<job_id>/title_blocks/ for OCR.
+
+    Crops are reused while they are newer than their page. A page whose crop
+    fails is sent whole.
+    """
+    crop_dir = job.output_dir / "title_blocks"
+
+    async def crop(img):
+        out_path = crop_dir / f"{Path(img).stem}.jpg"
+        if out_path.exists() and out_path.stat().st_mtime >= Path(img).stat().st_mtime:
+            return out_path
+        try:
+            # Decoding a full page is CPU-heavy, so crops share the render stage's slots
+            async with render_scheduler.slot(job.job_id):
+                with timed("title_block_crop", job.job_id):
+                    info = await asyncio.to_thread(crop_title_block, img, out_path)
+            print(
+                f"✂️ Title block ({info['method']}) {Path(img).name}: "
+                f"{info['source_bytes'] / 1024:.0f} KB -> {info['crop_bytes'] / 1024:.0f} KB"
+            )
+            return out_path
+        except Exception as e:
+            print(f"⚠️ Title-block crop failed for {img}: {e}")
+            return img
+
+    return await asyncio.gather(*[crop(img) for img in page_images])
+
+
+async def extract_pages_metadata(job, page_images):
+    """
+    Title-block metadata for a job's pages, in the order given.
+
+    Pages of a PDF with a real text layer are read locally first; only the
+    rest go to image OCR. OCR reads title blocks from the clean rendered pages
+    rather than the annotated copies, so the cache key does not depend on the
+    detections. Requests run concurrently under the OCR scheduler, leaving the
+    event loop free for other requests while they wait on the API.
+    """
+    results = [None] * len(page_images)
+
+    pdf_path = job.pdf_path
+    if TEXT_LAYER_METADATA and pdf_path is not None and page_images:
+        page_numbers = [page_sort_key(img)[0] for img in page_images]
+        try:
+            with timed("text_layer", job.job_id):
+                results = await asyncio.to_thread(extract_text_metadata, pdf_path, page_numbers)
+        except Exception as e:
+            print(f"⚠️ Text-layer metadata failed: {e}")
+        from_text = sum(1 for r in results if r is not None)
+        if from_text:
+            METADATA_PAGES.inc(from_text, source="text")
+            print(f"📝 Metadata read from the PDF text layer for {from_text}/{len(page_images)} pages")
+
+    pending = [i for i, r in enumerate(results) if r is None]
+    if not pending:
+        return results
+    print(f"🚀 Running asynchronous OCR extractions for {len(pending)} pages...")
+    ocr_images = [
+        job.pages_dir / Path(page_images[i]).name if (job.pages_dir / Path(page_images[i]).name).exists()
+        else page_images[i]
+        for i in pending
+    ]
+
+    try:
+        if TITLE_BLOCK_CROP:
+            ocr_images = await crop_title_blocks(job, ocr_images)
+        image_results = await extract_metadata_for_pages_async(
+            ocr_images, slot=lambda: ocr_scheduler.slot(job.job_id)
+        )
+    except Exception as e:
+        print(f"❌ OCR failed: {e}")
+        image_results = [{} for _ in pending]
+    for i, result in zip(pending, image_results):
+        results[i] = result
+    return results
+
+
+# ---------------------------
+# Paginated results
+# ---------------------------
+# Per-page results and summary counts read straight from the run's detection
+# store, which is updated as pages finish, so they can be polled while a job is
+# still running. Responses carry an ETag built from the job's progress and the
+# store version; a poll with a matching If-None-Match gets an empty 304.
+RESULTS_PAGE_LIMIT = 100
+
+
+def results_etag(job, run_dir, store, *extra):
+    version = (job.job_id, job.status, job.pages_done, job.pages_total,
+               run_dir.name if run_dir else None, store.version if store else None, *extra)
+    return f'"{make_key(*version)[:32]}"'
+
+
+def etag_matches(request, etag):
+    """Whether the client's If-None-Match lists this ETag."""
+    return etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]
+
+
+def conditional_json(request, etag, build):
+    """304 if the client already has this version, otherwise the JSON from build() with its ETag."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(build(), headers=headers)
+
+
+def incomplete_json(content):
+    """
+    JSON holding metadata of a page whose OCR failed: sent without an ETag and
+    never stored, so the next poll asks the OCR API again instead of getting a
+    304 for the empty metadata.
+    """
+    return JSONResponse(content, headers={"Cache-Control": "no-store"})
+
+
+def job_store(job):
+    """The latest run folder of a job and its detection store, or (None, None)."""
+    run_dir = job.latest_run_dir()
+    return (run_dir, open_store(run_dir)) if run_dir is not None else (None, None)
+
+
+def page_url(job, run_dir, page):
+    """Annotated preview of a page; naming the run keeps the URL stable for caching."""
+    return f"/jobs/{job.job_id}/pages/{page}/annotated?run={run_dir.name}"
+
+
+def page_item(job, run_dir, store, page):
+    """One page's detections (with boxes) and per-class counts."""
+    boxes, classes, confs = store.page(page)
+    width, height = store.page_size(page)
+    detections = [
+        {"class_id": cls_id, "class_name": class_name(cls_id), "confidence": conf, "box": box}
+        for cls_id, conf, box in zip(classes.tolist(), np.round(confs, 2).tolist(), np.round(boxes, 1).tolist())
+    ]
+    counts = {}
+    for d in detections:
+        counts[d["class_name"]] = counts.get(d["class_name"], 0) + 1
+    return {
+        "page": page,
+        "url": page_url(job, run_dir, page),
+        "tiles": tiles_url(job, run_dir, page),
+        "width": width,
+        "height": height,
+        "detections_count": len(detections),
+        "class_counts": counts,
+        "detections": detections,
+        "triage": store.triage(page),
+    }
+
+
+@app.get("/jobs/{job_id}/summary")
+async def job_summary(job_id: str, request: Request):
+    """Precomputed totals, per-class and per-page counts for a job's latest run."""
+    job = jobs.get(job_id)
+    if job is None:
+        return unknown_job(job_id)
+    run_dir, store = await asyncio.to_thread(job_store, job)
+
+    def build():
+        class_counts = store.class_counts() if store else {}
+        return {
+            "job_id": job.job_id,
+            "status": job.status,
+            "pages_total": job.pages_total,
+            "pages_done": job.pages_done,
+            "total_pages": len(store.pages()) if store else 0,
+            "total_detections": store.total() if store else 0,
+            "skipped_pages": store.skipped_pages() if store else [],
+            "items_found": len(class_counts),
+            "class_counts": {class_name(c): n for c, n in class_counts.items()},
+            "page_counts": [{"page": p, "detections": n} for p, n in (store.page_counts() if store else {}).items()],
+        }
+
+    return conditional_json(request, results_etag(job, run_dir, store, "summary"), build)
+
+
+@app.get("/jobs/{job_id}/pages")
+async def job_pages(job_id: str, request: Request, offset: int = 0, limit: int = 20, include_metadata: bool = False):
+    """One page of per-page results (detections with boxes), optionally with title-block metadata."""
+    job = jobs.get(job_id)
+    if job is None:
+        return unknown_job(job_id)
+    offset, limit = max(0, offset), max(1, min(limit, RESULTS_PAGE_LIMIT))
+    run_dir, store = await asyncio.to_thread(job_store, job)
+    all_pages = store.pages() if store else []
+    window = all_pages[offset:offset + limit]
+    etag = results_etag(job, run_dir, store, "pages", offset, limit, include_metadata)
+
+    # OCR only runs for the pages in this window, and only when the client
+    # does not already hold this version
+    metadata = None
+    if include_metadata and window and not etag_matches(request, etag):
+        metadata = await extract_pages_metadata(job, [job.pages_dir / f"page_{p}.jpg" for p in window])
+
+    def build():
+        items = [page_item(job, run_dir, store, p) for p in window]
+        if metadata is not None:
+            for item, meta in zip(items, metadata):
+                item["meta_data"] = meta
+        next_offset = offset + len(window)
+        return {
+            "job_id": job.job_id,
+            "status": job.status,
+            "offset": offset,
+            "limit": limit,
+            "total": len(all_pages),
+            "next_offset": next_offset if next_offset < len(all_pages) else None,
+            "pages": items,
+        }
+
+    if metadata is not None and any(not meta for meta in metadata):
+        return incomplete_json(build())
+    return conditional_json(request, etag, build)
+
+
+@app.get("/jobs/{job_id}/pages/{page}")
+async def job_page(job_id: str, page: int, request: Request, include_metadata: bool = False):
+    """Results for a single page of a job's latest run."""
+    job = jobs.get(job_id)
+    if job is None:
+        return unknown_job(job_id)
+    run_dir, store = await asyncio.to_thread(job_store, job)
+    if store is None or page not in store.pages():
+        return {"status": "failed", "error": f"No results for page {page}"}
+    etag = results_etag(job, run_dir, store, "page", page, include_metadata)
+
+    metadata = None
+    if include_metadata and not etag_matches(request, etag):
+        metadata = (await extract_pages_metadata(job, [job.pages_dir / f"page_{page}.jpg"]))[0]
+
+    def build():
+        item = page_item(job, run_dir, store, page)
+        if metadata is not None:
+            item["meta_data"] = metadata
+        return {"job_id": job.job_id, **item}
+
+    if include_metadata and metadata is not None and not metadata:
+        return incomplete_json(build())
+    return conditional_json(request, etag, build)
+
+
+# ---------------------------
+# Annotated page previews
+# ---------------------------
+# Inference only records boxes; a page is drawn the first time it is opened,
+# at the requested preview size, and cached in the run folder. Requests for a
+# page that is already being drawn wait for that render instead of starting
+# another one.
+ANNOTATE_MAX_SIDE_LIMIT = 8192
+_rendering = {}  # output path -> render task
+
+
+async def render_once(job, out_path, fn, *args):
+    """Make out_path with fn(*args) in a render slot, unless it exists; concurrent callers share one run."""
+    if out_path.exists():
+        return out_path
+
+    task = _rendering.get(out_path)
+    if task is None:
+        async def render():
+            async with render_scheduler.slot(job.job_id):
+                return await asyncio.to_thread(fn, *args)
+
+        task = asyncio.ensure_future(render())
+        _rendering[out_path] = task
+        task.add_done_callback(lambda _: _rendering.pop(out_path, None))
+    await asyncio.shield(task)
+    return out_path
+
+
+async def run_store(job, run=None):
+    """(run_dir, store) for a named run of a job, or its latest run; (None, None) if there is none."""
+    if run is None:
+        return await asyncio.to_thread(job_store, job)
+    run_dir = job.runs_dir / run
+    if not re.fullmatch(r"run_[\w-]+", run) or not run_dir.is_dir():
+        return None, None
+    return run_dir, await asyncio.to_thread(open_store, run_dir)
+
+
+async def annotated_preview(job, run_dir, store, page, max_side):
+    boxes, _, _ = store.page(page)
+    return await render_once(
+        job, annotated_path(run_dir, page, max_side), render_annotated,
+        job.pages_dir / f"page_{page}.jpg", boxes, annotated_path(run_dir, page, max_side),
+        max_side, store.page_size(page),
+    )
+
+
+def image_cache_control(run, variant="annotated"):
+    # A run's annotated images never change once the run is named in the URL.
+    # Clean pages (and their tiles) are rebuilt when the job is preprocessed
+    # again, so they are always revalidated.
+    return "public, max-age=86400, immutable" if run is not None and variant == "annotated" else "no-cache"
+
+
+@app.get("/jobs/{job_id}/pages/{page}/annotated")
+async def job_page_annotated(job_id: str, page: int, run: Optional[str] = None, max_side: int = ANNOTATE_MAX_SIDE):
+    """A page with its detections drawn on, at most max_side pixels on its longest side (0 = full size)."""
+    job = jobs.get(job_id)
+    if job is None:
+        return unknown_job(job_id)
+    run_dir, store = await run_store(job, run)
+    if store is None or page not in store.pages():
+        return {"status": "failed", "error": f"No results for page {page}"}
+    if not (job.pages_dir / f"page_{page}.jpg").exists():
+        return {"status": "failed", "error": f"Rendered page {page} is no longer available"}
+
+    max_side = max(0, min(max_side, ANNOTATE_MAX_SIDE_LIMIT))
+    try:
+        out_path = await annotated_preview(job, run_dir, store, page, max_side)
+    except Exception as e:
+        print(f"❌ Annotating page {page} failed: {e}")
+        return {"status": "failed", "error": str(e)}
+    return FileResponse(out_path, media_type="image/jpeg", headers={"Cache-Control": image_cache_control(run)})
+
+
+# ---------------------------
+# Deep-zoom page tiles
+# ---------------------------
+# Every page can be viewed as a Deep Zoom pyramid, either the clean render
+# ("page") or the page with its detections drawn on ("annotated"):
+#
+#   GET /jobs/{job_id}/pages/{page}/page.dzi
+#   GET /jobs/{job_id}/pages/{page}/annotated.dzi?run=run_<timestamp>_<n>
+#
+# Viewers fetch tiles from the matching <variant>_files/<level>/<col>_<row>.jpg
+# path. A level is cut the first time one of its tiles is requested and kept
+# in the job's tiles/ folder (the run's, for annotated pages).
+DZI_VARIANTS = ("page", "annotated")
+
+
+def tiles_url(job, run_dir, page):
+    return f"/jobs/{job.job_id}/pages/{page}/annotated.dzi?run={run_dir.name}"
+
+
+def page_image_size(path):
+    with Image.open(path) as img:
+        return img.size
+
+
+async def pyramid_source(job, page, variant, run):
+    """(clean page image, tiles folder, boxes to draw, size the boxes refer to) for a page's pyramid."""
+    page_image = job.pages_dir / f"page_{page}.jpg"
+    if not page_image.exists():
+        raise LookupError(f"Rendered page {page} is not available")
+    if variant == "page":
+        return page_image, job.output_dir / "tiles" / f"page_{page}", None, None
+
+    # Boxes are drawn on each block of tiles as it is cut, not on a full-size copy
+    run_dir, store = await run_store(job, run)
+    if store is None or page not in store.pages():
+        raise LookupError(f"No results for page {page}")
+    boxes, _, _ = store.page(page)
+    return page_image, run_dir / "tiles" / f"page_{page}", boxes, store.page_size(page)
+
+
+@app.get("/jobs/{job_id}/pages/{page}/{variant}.dzi")
+async def job_page_dzi(job_id: str, page: int, variant: str, run: Optional[str] = None):
+    """Deep Zoom descriptor for a page (variant "page") or its annotated copy (variant "annotated")."""
+    job = jobs.get(job_id)
+    if job is None:
+        return unknown_job(job_id)
+    page_image = job.pages_dir / f"page_{page}.jpg"
+    if variant not in DZI_VARIANTS or not page_image.exists():
+        return {"status": "failed", "error": f"No {variant} tiles for page {page}"}
+    width, height = await asyncio.to_thread(page_image_size, page_image)
+    return Response(
+        dzi_descriptor(width, height), media_type="application/xml",
+        headers={"Cache-Control": image_cache_control(run, variant)},
+    )
+
+
+@app.get("/jobs/{job_id}/pages/{page}/{variant}_files/{level}/{col}_{row}.jpg")
+async def job_page_tile(job_id: str, page: int, variant: str, level: int, col: int, row: int, run: Optional[str] = None):
+    """One Deep Zoom tile; the block of tiles around it is cut on first use."""
+    job = jobs.get(job_id)
+    if job is None:
+        return unknown_job(job_id)
+    if variant not in DZI_VARIANTS:
+        return {"status": "failed", "error": f"Unknown tile variant: {variant}"}
+    try:
+        source, tiles_dir, boxes, boxes_size = await pyramid_source(job, page, variant, run)
+        tile = tile_path(tiles_dir, level, col, row)
+        if not tile.exists():
+            width, height = await asyncio.to_thread(page_image_size, source)
+            if not 0 <= level <= max_level(width, height):
+                raise LookupError(f"No level {level} for page {page}")
+            await render_once(
+                job, block_marker(tiles_dir, level, col, row), build_block,
+                source, tiles_dir, level, col, row, boxes, boxes_size,
+            )
+        if not tile.exists():
+            raise LookupError(f"No tile {col}_{row} at level {level}")
+    except LookupError as e:
+        return JSONResponse({"status": "failed", "error": str(e)}, status_code=404)
+    except Exception as e:
+        print(f"❌ Tiling page {page} failed: {e}")
+        return {"status": "failed", "error": str(e)}
+    return FileResponse(tile, media_type="image/jpeg", headers={"Cache-Control": image_cache_control(run, variant)})
+
 
 @app.get("/results")
-async def get_results():
+async def get_results(request: Request, job_id: Optional[str] = None):
     """Return detection results with per-page detection data (async OCR)."""
     try:
+        job = resolve_job(job_id)
+        if job is None:
+            return unknown_job(job_id)
+        current_job.set(job.job_id)
+
         total_detections = 0
         detection_details = []
         preview_url = None
         page_detections = {}
         meta_data_list = {}
 
-        results_dir = OUTPUT_DIR / "run"
-
-        # Get all inference result images sorted by name (not time)
-        all_images = sorted(list(results_dir.rglob("*.jpg")))
-        total_pages = len(all_images)
-
-        if all_images:
-            last_img = all_images[-1]
-            rel_path = last_img.relative_to(OUTPUT_DIR)
-            preview_url = f"/outputs/{rel_path.as_posix()}"
-            page_previews = [
-                {"page": idx + 1, "url": f"/outputs/{img.relative_to(OUTPUT_DIR).as_posix()}"}
-                for idx, img in enumerate(all_images)
-            ]
-        else:
-            page_previews = []
-
-        # Get all label files sorted by name to match images
-        label_files = sorted(list(results_dir.rglob("labels/*.txt")))
+        # Only the job's latest inference run
+        results_dir = job.latest_run_dir()
+        if results_dir is None:
+            return {"status": "failed", "error": "No inference results for this job"}
+
+        # Nothing changed since the last full response: don't rebuild it (or re-run OCR)
+        store = await asyncio.to_thread(open_store, results_dir)
+        etag = results_etag(job, results_dir, store, "results")
+        previous = _results_responses.get(job.job_id)
+        if previous is not None and previous[0] == etag:
+            return conditional_json(request, etag, lambda: previous[1])
+
+        # Pages with results, by page number; previews are annotated on demand
+        pages = store.pages()
+        total_pages = len(pages)
+        page_previews = [
+            {
+                "page": p,
+                "url": page_url(job, results_dir, p),
+                "tiles": tiles_url(job, results_dir, p),
+                "triage": store.triage(p),
+            }
+            for p in pages
+        ]
+        if page_previews:
+            preview_url = page_previews[-1]["url"]
 
         # ============================================================
         # STEP 1: Run OCR extractions asynchronously for all pages
         # ============================================================
-        # print("🚀 Running asynchronous OCR extractions...")
-
-        # ocr_tasks = [extract_drawing_metadata(str(img_file)) for img_file in all_images]
-        # ocr_results = await asyncio.gather(*ocr_tasks, return_exceptions=True)
-
-        # for page_idx, (img_file, ocr_result) in enumerate(zip(all_images, ocr_results), start=1):
-        #     if isinstance(ocr_result, Exception):
-        #         print(f"❌ OCR failed for page {page_idx}: {ocr_result}")
-        #         meta_data_list[page_idx] = {}
-        #     else:
-        #         meta_data_list[page_idx] = ocr_result
-        #     page_detections[page_idx] = []
-        # STEP 1: Run OCR extractions for all pages
-        print("🚀 Running OCR extractions...")
-        meta_data_list = {}
-        
-        for page_idx, img_file in enumerate(all_images, start=1):
-            try:
-                result = extract_drawing_metadata(str(img_file))
-                meta_data_list[page_idx] = result
-            except Exception as e:
-                print(f"❌ OCR failed for page {page_idx}: {e}")
-                meta_data_list[page_idx] = {}
-            page_detections[page_idx] = []
-
-        # ============================================================
-        # STEP 2: Parse label files and count detections
-        # ============================================================
-        for page_idx, (img_file, label_file) in enumerate(zip(all_images, label_files), start=1):
-            img_name = img_file.stem
-            label_name = label_file.stem
-            if img_name != label_name:
-                print(f"⚠️ Mismatch between image {img_name} and label {label_name}")
-
-            with open(label_file, "r") as lf:
-                lines = lf.read().strip().splitlines()
-                for line in lines:
-                    if not line.strip():
-                        continue
-
-                    total_detections += 1
-                    parts = line.split()
-                    if len(parts) >= 5:
-                        cls_id = int(parts[0])
-                        conf = float(parts[-1])
-
-                        detection = {
-                            "class_id": cls_id,
-                            "confidence": round(conf, 2)
-                        }
-
-                        detection_details.append(detection)
-                        page_detections[page_idx].append(detection)
+        page_images = [job.pages_dir / f"page_{p}.jpg" for p in pages]
+        for page, result in zip(pages, await extract_pages_metadata(job, page_images)):
+            meta_data_list[page] = result
+            page_detections[page] = []
 
         # ============================================================
-        # STEP 3: Add class names
+        # STEP 2: Read detections from the run's detection store
         # ============================================================
-        class_names = [
-            "Cove Light", "Door", "Downlight", "Emergency Light Fitting",
-            "Fluorescent Light", "Socket Outlet", "Exit Sign"
-        ]
-
-        for d in detection_details:
-            d["class_name"] = class_names[d["class_id"]] if d["class_id"] < len(class_names) else "Unknown"
-
-        for page_num, detections in page_detections.items():
-            for d in detections:
-                d["class_name"] = class_names[d["class_id"]] if d["class_id"] < len(class_names) else "Unknown"
+        # Pages are matched by page number, not by position, so a page that
+        # failed inference cannot shift the detections of the pages after it.
+        for page in pages:
+            _, classes, confs = store.page(page)
+            detections = [
+                {"class_id": cls_id, "confidence": conf, "class_name": class_name(cls_id)}
+                for cls_id, conf in zip(classes.tolist(), np.round(confs, 2).tolist())
+            ]
+            total_detections += len(detections)
+            detection_details.extend(detections)
+            page_detections[page] = detections
 
         # ============================================================
-        # STEP 4: Build Summary and Response
+        # STEP 3: Build Summary and Response
         # ============================================================
         summary = {
             "total_pages": total_pages,
             "items_found": len(set([d["class_name"] for d in detection_details])),
             "total_detections": total_detections,
+            "skipped_pages": store.skipped_pages(),
             "pages": page_previews,
         }
 
         print(f"📊 Summary: {summary}")
         print(f"🧾 Metadata Extracted for {len(meta_data_list)} pages")
 
-        return {
+        response = {
+            "job_id": job.job_id,
             "summary": summary,
             "detections": detection_details,
             "page_detections": page_detections,
@@ -538,6 +1828,13 @@ async def get_results():
             "pages": page_previews,
             "meta_data": meta_data_list
         }
+        # A page whose OCR failed comes back empty; that response must not be
+        # reused (or validated by ETag), or the page stays empty after the API recovers
+        if any(not meta for meta in meta_data_list.values()):
+            _results_responses.pop(job.job_id, None)
+            return incomplete_json(response)
+        _results_responses[job.job_id] = (etag, response)
+        return JSONResponse(response, headers={"ETag": etag, "Cache-Control": "no-cache"})
 
     except Exception as e:
         print(f"❌ Error during result processing: {e}")
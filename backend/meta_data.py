@@ -4,12 +4,44 @@
 
 from google import genai
 import json
+import hashlib
+import random
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from types import SimpleNamespace
 from pydantic import BaseModel
 from typing import Optional
 from dotenv import load_dotenv
 import os
 import asyncio
 
+from metrics import METADATA_PAGES, OCR_REQUESTS, timed
+
+
+load_dotenv()
+
+# Gemini model used for extraction; part of the cache key so a model change
+# does not serve stale answers.
+METADATA_MODEL = "gemini-2.5-flash"
+
+# Set METADATA_CLIENT=stub to run without network access (tests, benchmarks)
+METADATA_CLIENT = os.getenv("METADATA_CLIENT", "gemini").lower()
+
+METADATA_CACHE_DIR = Path(os.getenv(
+    "METADATA_CACHE_DIR", Path(__file__).resolve().parent / "cache" / "metadata"
+))
+
+# Async extraction: concurrent requests, requests per second (0 = no limit),
+# per-attempt timeout in seconds, retries after the first attempt and the base
+# backoff delay between them.
+METADATA_CONCURRENCY = int(os.getenv("METADATA_CONCURRENCY", "4"))
+METADATA_RPS = float(os.getenv("METADATA_RPS", "0"))
+METADATA_TIMEOUT = float(os.getenv("METADATA_TIMEOUT", "60"))
+METADATA_RETRIES = int(os.getenv("METADATA_RETRIES", "3"))
+METADATA_BACKOFF = float(os.getenv("METADATA_BACKOFF", "1.0"))
+
 
 # Define metadata schema
 class DrawingMetadata(BaseModel):
@@ -27,32 +59,190 @@ class DrawingMetadata(BaseModel):
     site_engineer: Optional[str]
 
 
+# ============================================================
+# Clients
+# ============================================================
 
-def extract_drawing_metadata(image_path: str) -> dict:
+class StubClient:
     """
-    Extracts metadata from a drawing title block image using Gemini API.
+    Offline stand-in for genai.Client.
 
-    Args:
-        image_path (str): Path to the image file (e.g. 'ocr_test.jpg')
+    Mirrors the `files.upload` / `models.generate_content` calls used below
+    (and their `aio` counterparts) and answers with a canned JSON title block,
+    so the whole extraction path can be exercised without network access.
+    """
 
-    Returns:
-        dict: Extracted metadata as a dictionary following DrawingMetadata schema
+    def __init__(self, response=None, delay=0.0):
+        self.response = {field: None for field in DrawingMetadata.model_fields}
+        self.response.update(response or {})
+        self.delay = delay
+        self.calls = 0
+        self.files = SimpleNamespace(upload=self._upload)
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+        self.aio = SimpleNamespace(
+            files=SimpleNamespace(upload=self._upload_async),
+            models=SimpleNamespace(generate_content=self._generate_content_async),
+        )
+
+    def _upload(self, file):
+        return SimpleNamespace(display_name=Path(str(file)).name)
+
+    def _generate_content(self, model, contents):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return SimpleNamespace(text=json.dumps(self.response))
+
+    async def _upload_async(self, file):
+        return self._upload(file)
+
+    async def _generate_content_async(self, model, contents):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return SimpleNamespace(text=json.dumps(self.response))
+
+
+class HttpClient:
     """
-    try:
-        load_dotenv()
-        api_key = os.getenv("gemni_api_key")
-        print(f"🔑 Using api {api_key}")
+    Client for a self-hosted OCR service speaking plain HTTP.
 
-        client = genai.Client(api_key=api_key)
+    `models.generate_content` POSTs the image bytes to `<base_url>/extract`
+    and uses the response body as the model's text; the service is expected to
+    answer with the DrawingMetadata JSON itself, so the prompt is not sent.
+    Used by the benchmarks' fake OCR server; select it with
+    METADATA_CLIENT=http and METADATA_URL.
+    """
 
-        # Upload the image file
-        print(f"📤 Uploading image to Gemini: {image_path}")
-        file = client.files.upload(file=image_path)
-        print(f"✅ Uploaded as: {file.display_name}")
+    def __init__(self, base_url, timeout=METADATA_TIMEOUT):
+        import httpx
+
+        self.base_url = base_url.rstrip("/")
+        self._sync = httpx.Client(timeout=timeout)
+        self._async = httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=None))
+        self.files = SimpleNamespace(upload=self._upload)
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+        self.aio = SimpleNamespace(
+            files=SimpleNamespace(upload=self._upload_async),
+            models=SimpleNamespace(generate_content=self._generate_content_async),
+        )
 
-        # Prepare schema prompt
-        schema = DrawingMetadata.model_json_schema()
-        prompt = f"""
+    def _upload(self, file):
+        path = Path(str(file))
+        return SimpleNamespace(display_name=path.name, data=path.read_bytes())
+
+    async def _upload_async(self, file):
+        return await asyncio.to_thread(self._upload, file)
+
+    def _request(self, contents):
+        file = contents[0]
+        return {
+            "url": f"{self.base_url}/extract",
+            "content": file.data,
+            "headers": {"Content-Type": "application/octet-stream"},
+        }
+
+    def _generate_content(self, model, contents):
+        response = self._sync.post(**self._request(contents))
+        response.raise_for_status()
+        return SimpleNamespace(text=response.text)
+
+    async def _generate_content_async(self, model, contents):
+        response = await self._async.post(**self._request(contents))
+        response.raise_for_status()
+        return SimpleNamespace(text=response.text)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the shared extraction client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            if METADATA_CLIENT == "stub":
+                _client = StubClient()
+            elif METADATA_CLIENT == "http":
+                _client = HttpClient(os.getenv("METADATA_URL", "http://127.0.0.1:8765"))
+            else:
+                _client = genai.Client(api_key=os.getenv("gemni_api_key"))
+        return _client
+
+
+def set_client(client):
+    """Swap the extraction client (e.g. a StubClient in tests)."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+# ============================================================
+# Metadata cache
+# ============================================================
+
+class MetadataCache:
+    """Title-block metadata keyed by image hash, in memory and as JSON files on disk."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return self.root / f"{key}.json"
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        with self._lock:
+            self._memory[key] = data
+        return data
+
+    def put(self, key, data):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self._path(key).with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        tmp.replace(self._path(key))
+        with self._lock:
+            self._memory[key] = data
+
+
+metadata_cache = MetadataCache(METADATA_CACHE_DIR)
+
+# Extractions in progress, so identical images requested at the same time
+# share a single API call.
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def metadata_key(image_path: str) -> str:
+    """Cache key for an image: its content hash plus the extraction model."""
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return f"{METADATA_MODEL}-{digest.hexdigest()}"
+
+
+# ============================================================
+# Extraction
+# ============================================================
+
+def _metadata_prompt() -> str:
+    schema = DrawingMetadata.model_json_schema()
+    return f"""
         Extract drawing metadata from this engineering title block.
         Return the extracted information ONLY as a valid JSON object that strictly conforms to the following JSON schema:
 
@@ -62,26 +252,41 @@ def extract_drawing_metadata(image_path: str) -> dict:
         If a field cannot be extracted, set its value to null in the JSON.
         """
 
+
+def _parse_response(text: str) -> dict:
+    """Strip markdown fences from the model's answer and validate it against the schema."""
+    response_text = text.strip()
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    response_text = response_text.strip()
+
+    data = json.loads(response_text)
+    return DrawingMetadata(**data).model_dump()
+
+
+def _extract_uncached(image_path: str) -> dict:
+    """Send one image to the extraction model and parse its answer."""
+    response = None
+    try:
+        client = get_client()
+
+        # Upload the image file
+        print(f"📤 Uploading image to Gemini: {image_path}")
+        file = client.files.upload(file=image_path)
+        print(f"✅ Uploaded as: {file.display_name}")
+
         # Send request to Gemini
         print("🤖 Processing image with Gemini (this may take a few seconds)...")
         response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[file, prompt],
+            model=METADATA_MODEL,
+            contents=[file, _metadata_prompt()],
         )
 
-        # Clean up response
-        response_text = response.text.strip()
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-
-        # Try parsing JSON
-        data = json.loads(response_text)
-        metadata = DrawingMetadata(**data)
+        metadata = _parse_response(response.text)
         print("✅ Extraction complete!")
-        return metadata.dict()
+        return metadata
 
     except json.JSONDecodeError as e:
         print(f"❌ JSON Decode Error: {e}")
@@ -94,71 +299,219 @@ def extract_drawing_metadata(image_path: str) -> dict:
         return {}
 
 
-# async def extract_drawing_metadata(image_path: str) -> dict:
-#     """
-#     Extracts metadata from a drawing title block image using Gemini API.
-
-#     Args:
-#         image_path (str): Path to the image file (e.g. 'ocr_test.jpg')
-#         api_key (str): Your Google Gemini API key
-
-#     Returns:
-#         dict: Extracted metadata as a dictionary following DrawingMetadata schema
-#     """
-#     try:
-#         load_dotenv()
-#         api_key = os.getenv("gemni_api_key")
-#         print(f"🔑 Using api {api_key}")
-
-#         client = genai.Client(api_key=api_key)
-
-#         # Upload the image file
-#         print(f"📤 Uploading image to Gemini: {image_path}")
-#         file = await client.aio.files.upload(file=image_path)
-#         print(f"✅ Uploaded as: {file.display_name}")
-
-#         # Prepare schema prompt
-#         schema = DrawingMetadata.model_json_schema()
-#         prompt = f"""
-#         Extract drawing metadata from this engineering title block.
-#         Return the extracted information ONLY as a valid JSON object that strictly conforms to the following JSON schema:
-
-#         {schema}
-
-#         Ensure the output is only the JSON object, with no extra text, explanations, or markdown formatting (like ```json```).
-#         If a field cannot be extracted, set its value to null in the JSON.
-#         """
-
-#         # Send request to Gemini
-#         print("🤖 Processing image with Gemini (this may take a few seconds)...")
-#         response = await client.aio.models.generate_content(
-#             model="gemini-2.5-flash",
-#             contents=[file, prompt],
-#         )
-
-#         # Clean up response
-#         response_text = response.text.strip()
-#         if response_text.startswith("```json"):
-#             response_text = response_text[7:]
-#         if response_text.endswith("```"):
-#             response_text = response_text[:-3]
-#         response_text = response_text.strip()
-
-#         # Try parsing JSON
-#         data = json.loads(response_text)
-#         metadata = DrawingMetadata(**data)
-#         print("✅ Extraction complete!")
-#         return metadata.dict()
-
-#     except json.JSONDecodeError as e:
-#         print(f"❌ JSON Decode Error: {e}")
-#         print("Raw response text:")
-#         print(response.text)
-#         return {}
-
-#     except Exception as e:
-#         print(f"❌ Error during extraction: {e}")
-#         return {}
+def extract_drawing_metadata(image_path: str, use_cache: bool = True) -> dict:
+    """
+    Extracts metadata from a drawing title block image using Gemini API.
+
+    Results are cached by image hash, so repeated calls for the same image (or
+    an identical re-upload) never go back to the API. Concurrent calls for the
+    same image wait for a single in-flight request.
+
+    Args:
+        image_path (str): Path to the image file (e.g. 'ocr_test.jpg')
+        use_cache (bool): Read from and write to the metadata cache
+
+    Returns:
+        dict: Extracted metadata as a dictionary following DrawingMetadata schema
+    """
+    return _extract_keyed(image_path, metadata_key(image_path), use_cache)
+
+
+def _extract_keyed(image_path: str, key: str, use_cache: bool) -> dict:
+    """Cached, coalesced extraction for an image whose key is already known."""
+    if use_cache:
+        cached = metadata_cache.get(key)
+        if cached is not None:
+            print(f"⚡ Metadata cache hit: {image_path}")
+            return cached
+
+    with _inflight_lock:
+        pending = _inflight.get(key)
+        if pending is None:
+            pending = _inflight[key] = Future()
+            owner = True
+        else:
+            owner = False
+
+    if not owner:
+        return pending.result()
+
+    result = {}
+    try:
+        result = _extract_uncached(image_path)
+        # Failed extractions come back empty; don't pin those in the cache
+        if result:
+            metadata_cache.put(key, result)
+    finally:
+        pending.set_result(result)
+        with _inflight_lock:
+            _inflight.pop(key, None)
+    return result
+
+
+def extract_metadata_for_pages(image_paths, use_cache: bool = True) -> list:
+    """
+    Extract metadata for a set of pages, one API call per distinct image.
+
+    Returns:
+        list: Metadata dicts in the same order as image_paths
+    """
+    keys = [metadata_key(str(p)) for p in image_paths]
+    by_key = {}
+    for key, path in zip(keys, image_paths):
+        if key not in by_key:
+            by_key[key] = _extract_keyed(str(path), key, use_cache)
+    if len(by_key) < len(keys):
+        print(f"🧩 Coalesced {len(keys)} pages into {len(by_key)} metadata requests")
+    return [by_key[key] for key in keys]
+
+
+# ============================================================
+# Async extraction
+# ============================================================
+# /results runs on the event loop, so title blocks are extracted with the
+# client's async API: pages go out concurrently (bounded by a scheduler slot
+# and an optional requests-per-second limit), each attempt has a timeout and
+# failed attempts are retried with exponential backoff.
+
+class RateLimiter:
+    """Spaces request starts at least 1/rate seconds apart (rate <= 0 disables it)."""
+
+    def __init__(self, rate=METADATA_RPS):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_at = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        # Runs on the event loop thread, so claiming the next start time is atomic
+        now = asyncio.get_running_loop().time()
+        start_at = max(now, self._next_at)
+        self._next_at = start_at + self.interval
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+
+rate_limiter = RateLimiter()
+
+# Extractions in progress on the event loop, keyed like the cache
+_inflight_async = {}
+
+
+async def _request_async(client, image_path: str) -> dict:
+    """One attempt: upload, prompt and parse. Raises on any failure."""
+    aio = getattr(client, "aio", None)
+    if aio is not None:
+        file = await aio.files.upload(file=image_path)
+        response = await aio.models.generate_content(model=METADATA_MODEL, contents=[file, _metadata_prompt()])
+    else:
+        file = await asyncio.to_thread(client.files.upload, file=image_path)
+        response = await asyncio.to_thread(
+            client.models.generate_content, model=METADATA_MODEL, contents=[file, _metadata_prompt()]
+        )
+    return _parse_response(response.text)
+
+
+async def _timed_request(client, image_path, timeout):
+    """One attempt under a timeout, recorded as an OCR call."""
+    with timed("ocr_request"):
+        result = await asyncio.wait_for(_request_async(client, image_path), timeout)
+    OCR_REQUESTS.inc(outcome="ok")
+    return result
+
+
+async def _extract_with_retries(image_path: str, slot=None, timeout=METADATA_TIMEOUT,
+                                retries=METADATA_RETRIES, backoff=METADATA_BACKOFF) -> dict:
+    """Extract one image, retrying failed or timed-out attempts with backoff; {} if all fail."""
+    client = get_client()
+    for attempt in range(retries + 1):
+        try:
+            if slot is None:
+                await rate_limiter.wait()
+                return await _timed_request(client, image_path, timeout)
+            async with slot():
+                await rate_limiter.wait()
+                return await _timed_request(client, image_path, timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            reason = "timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+            OCR_REQUESTS.inc(outcome="timeout" if isinstance(e, asyncio.TimeoutError) else "error")
+            if attempt == retries:
+                print(f"❌ Metadata extraction failed for {image_path} after {attempt + 1} attempts: {reason}")
+                return {}
+            # The slot is released while backing off, so other pages keep going
+            delay = backoff * 2 ** attempt * (1 + random.random() / 2)
+            print(f"🔁 Metadata attempt {attempt + 1} failed for {image_path} ({reason}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def _extract_keyed_async(image_path: str, key: str, use_cache: bool, slot=None) -> dict:
+    """Async counterpart of _extract_keyed: cache, then one shared in-flight task per key."""
+    if use_cache:
+        cached = await asyncio.to_thread(metadata_cache.get, key)
+        if cached is not None:
+            print(f"⚡ Metadata cache hit: {image_path}")
+            METADATA_PAGES.inc(source="cache")
+            return cached
+
+    task = _inflight_async.get(key)
+    if task is None:
+        async def run():
+            try:
+                result = await _extract_with_retries(image_path, slot)
+                if result:
+                    METADATA_PAGES.inc(source="ocr")
+                    await asyncio.to_thread(metadata_cache.put, key, result)
+                return result
+            finally:
+                _inflight_async.pop(key, None)
+
+        task = _inflight_async[key] = asyncio.ensure_future(run())
+    # Shielded so one cancelled request does not cancel the extraction for others
+    return await asyncio.shield(task)
+
+
+async def extract_drawing_metadata_async(image_path: str, use_cache: bool = True, slot=None) -> dict:
+    """
+    Async version of extract_drawing_metadata.
+
+    Args:
+        image_path (str): Path to the image file
+        use_cache (bool): Read from and write to the metadata cache
+        slot: Optional callable returning an async context manager held for
+            each request attempt (e.g. a scheduler slot)
+
+    Returns:
+        dict: Extracted metadata, or {} if every attempt failed
+    """
+    key = await asyncio.to_thread(metadata_key, str(image_path))
+    return await _extract_keyed_async(str(image_path), key, use_cache, slot)
+
+
+async def extract_metadata_for_pages_async(image_paths, use_cache: bool = True, slot=None) -> list:
+    """
+    Extract metadata for a set of pages concurrently, one request per distinct image.
+
+    Concurrency is bounded by `slot` (a scheduler slot shared by every request
+    in the process) and the module rate limiter, not by the number of pages.
+
+    Returns:
+        list: Metadata dicts in the same order as image_paths
+    """
+    paths = [str(p) for p in image_paths]
+    keys = await asyncio.gather(*[asyncio.to_thread(metadata_key, p) for p in paths])
+    first_path = {}
+    for key, path in zip(keys, paths):
+        first_path.setdefault(key, path)
+    if len(first_path) < len(keys):
+        print(f"🧩 Coalesced {len(keys)} pages into {len(first_path)} metadata requests")
+
+    results = await asyncio.gather(*[
+        _extract_keyed_async(path, key, use_cache, slot) for key, path in first_path.items()
+    ])
+    by_key = dict(zip(first_path, results))
+    return [by_key[key] for key in keys]
 
 
 # # ============================================================
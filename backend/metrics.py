@@ -0,0 +1,180 @@
+# ============================================================
+# metrics.py — Stage timings and counters, Prometheus text format
+# ============================================================
+# Every pipeline stage reports how long each unit took (a page render, a
+# page's share of an inference batch, one OCR call, a scheduler queue wait...)
+# into a few histograms and counters, exposed on /metrics in the Prometheus
+# text format. No client library is needed for that format, so none is used.
+#
+# Stage timings are also added up per job, giving /jobs/{job_id}/trace: where
+# one drawing set spent its time. Code that does not know its job (OCR calls,
+# store loads) picks it up from the current_job context variable, which
+# asyncio tasks and to_thread calls inherit from the request that started them.
+
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Job the current request (and the tasks it starts) is working for
+current_job = contextvars.ContextVar("current_job", default=None)
+
+# Jobs whose stage breakdown is kept in memory
+TRACE_JOBS = 256
+
+# Seconds, from a fast cache hit to a slow full-page render
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Upload sizes, 100 KB to 1 GB
+SIZE_BUCKETS = (1e5, 1e6, 5e6, 1e7, 5e7, 1e8, 2.5e8, 5e8, 1e9)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name, self.documentation, self.labels = name, documentation, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=TIME_BUCKETS):
+        self.name, self.documentation, self.labels = name, documentation, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0, 0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_label_text(names, key + (f'{bound:g}',))} {count}")
+                lines.append(f"{self.name}_bucket{_label_text(names, key + ('+Inf',))} {series[-2]}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, key)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {series[-1]:.6f}")
+        return lines
+
+
+REGISTRY = []
+
+STAGE_SECONDS = Histogram(
+    "esd_stage_seconds", "Time per unit of work in each pipeline stage (page render, page inference, OCR call...)",
+    labels=("stage",),
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "esd_queue_wait_seconds", "Time a unit waited for a scheduler slot", labels=("stage",),
+)
+INFERENCE_PAGE_SECONDS = Histogram(
+    "esd_inference_page_seconds", "Inference time per page (a batch or tiled page split over its pages)",
+    labels=("mode", "model"),
+)
+UPLOAD_BYTES = Histogram("esd_upload_size_bytes", "Size of uploaded files", buckets=SIZE_BUCKETS)
+PAGES = Counter("esd_pages_total", "Pages processed, by stage and outcome", labels=("stage", "outcome"))
+DETECTIONS = Counter("esd_detections_total", "Detections found", labels=("model",))
+OCR_REQUESTS = Counter("esd_ocr_requests_total", "Title-block OCR attempts, by outcome", labels=("outcome",))
+METADATA_PAGES = Counter("esd_metadata_pages_total", "Pages given metadata, by source", labels=("source",))
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------
+# Per-job traces
+# ---------------------------
+_traces = OrderedDict()  # job_id -> {stage: [count, total seconds, max seconds]}
+_traces_lock = threading.Lock()
+
+
+def trace(stage, seconds, job_id=None):
+    job_id = job_id or current_job.get()
+    if job_id is None:
+        return
+    with _traces_lock:
+        stages = _traces.get(job_id)
+        if stages is None:
+            stages = _traces[job_id] = {}
+            while len(_traces) > TRACE_JOBS:
+                _traces.popitem(last=False)
+        entry = stages.setdefault(stage, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+
+def observe_stage(stage, seconds, job_id=None):
+    """Record one unit of a stage in the histogram and the job's trace."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace(stage, seconds, job_id)
+
+
+@contextmanager
+def timed(stage, job_id=None):
+    """Time the block as one unit of a stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, job_id)
+
+
+def job_trace(job_id):
+    """Stage breakdown for a job: units, total, mean and max milliseconds; None if nothing was recorded."""
+    with _traces_lock:
+        stages = _traces.get(job_id)
+        if stages is None:
+            return None
+        items = [(stage, list(entry)) for stage, entry in stages.items()]
+    return {
+        stage: {
+            "count": count,
+            "total_ms": round(total * 1000, 1),
+            "mean_ms": round(total / count * 1000, 1),
+            "max_ms": round(peak * 1000, 1),
+        }
+        for stage, (count, total, peak) in sorted(items, key=lambda item: -item[1][1])
+    }
+
+
+def forget_job(job_id):
+    with _traces_lock:
+        _traces.pop(job_id, None)
@@ -0,0 +1,130 @@
+# ============================================================
+# model_export.py — CPU inference backends for the YOLO weights
+# ============================================================
+# On CPU-only nodes PyTorch eager inference is the slowest way to run the
+# model. The same weights can be exported once and served through Ultralytics'
+# other runtimes, which YOLO() loads from the exported file:
+#
+#   torch      PyTorch eager (default)
+#   onnx       ONNX Runtime, CPU
+#   onnx-int8  ONNX Runtime with dynamically quantized INT8 weights
+#   openvino   OpenVINO IR
+#
+# Exports are cached per weights checksum, so a new best.pt is exported again
+# and an unchanged one never is. Every backend, torch included, loads from this
+# snapshot rather than from best.pt itself, so replacing best.pt on disk never
+# changes the weights behind an already loaded model:
+#
+#   model/exports/<sha256[:16]>/best.pt | best.onnx | best_int8.onnx | best_openvino_model/
+
+import importlib.util
+import os
+import shutil
+import threading
+from pathlib import Path
+
+from cache import make_key, model_checksum
+
+# Backend used by /load_model when the request does not name one
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").lower()
+
+BACKENDS = ("torch", "onnx", "onnx-int8", "openvino")
+
+# Packages each backend needs on top of ultralytics
+_REQUIRES = {
+    "onnx": ("onnx", "onnxruntime"),
+    "onnx-int8": ("onnx", "onnxruntime"),
+    "openvino": ("openvino",),
+}
+
+_export_lock = threading.Lock()
+
+
+def export_dir(weights):
+    return Path(weights).parent / "exports" / model_checksum(weights)[:16]
+
+
+def artifact_checksum(path):
+    """Checksum of a loaded model: a weights file, or every file of an exported model folder."""
+    path = Path(path)
+    if path.is_file():
+        return model_checksum(path)
+    return make_key(*(model_checksum(f) for f in sorted(path.rglob("*")) if f.is_file()))
+
+
+def _quantize_onnx(src, dst):
+    """Dynamic INT8 quantization of an ONNX model, keeping the metadata YOLO() reads."""
+    import onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tmp = dst.with_suffix(".tmp.onnx")
+    quantize_dynamic(str(src), str(tmp), weight_type=QuantType.QUInt8)
+    # Class names, stride and image size live in the model's metadata
+    quantized = onnx.load(str(tmp))
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(onnx.load(str(src)).metadata_props)
+    onnx.save(quantized, str(tmp))
+    tmp.replace(dst)
+
+
+def exported_weights(weights, backend=INFERENCE_BACKEND):
+    """
+    The model file to load for a backend, exporting the weights the first time.
+
+    Args:
+        weights (str | Path): PyTorch weights (best.pt)
+        backend (str): One of BACKENDS
+
+    Returns:
+        Path: The cached snapshot of the weights, or of their export for the backend
+    """
+    weights = Path(weights)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    missing = [name for name in _REQUIRES.get(backend, ()) if importlib.util.find_spec(name) is None]
+    if missing:
+        raise RuntimeError(f"Inference backend '{backend}' needs: pip install {' '.join(missing)}")
+
+    out_dir = export_dir(weights)
+    targets = {
+        "torch": out_dir / "best.pt",
+        "onnx": out_dir / "best.onnx",
+        "onnx-int8": out_dir / "best_int8.onnx",
+        "openvino": out_dir / "best_openvino_model",
+    }
+    target = targets[backend]
+    if target.exists():
+        return target
+
+    with _export_lock:
+        if target.exists():
+            return target
+        from ultralytics import YOLO
+
+        # Export from the snapshot: Ultralytics writes next to the weights
+        out_dir.mkdir(parents=True, exist_ok=True)
+        source = targets["torch"]
+        if not source.exists():
+            tmp = out_dir / ".best.pt.tmp"
+            shutil.copy2(weights, tmp)
+            tmp.replace(source)
+        if backend == "torch":
+            return source
+
+        print(f"📦 Exporting {weights.name} for the '{backend}' backend...")
+        if backend == "openvino":
+            exported = Path(YOLO(str(source)).export(format="openvino", dynamic=True))
+        else:
+            onnx_path = targets["onnx"]
+            if not onnx_path.exists():
+                exported = Path(YOLO(str(source)).export(format="onnx", dynamic=True, simplify=True))
+                if exported != onnx_path:
+                    exported.replace(onnx_path)
+            exported = onnx_path
+            if backend == "onnx-int8":
+                _quantize_onnx(onnx_path, targets["onnx-int8"])
+                exported = targets["onnx-int8"]
+        if exported != target:
+            exported.replace(target)
+        print(f"✅ Exported model cached at {target}")
+    return target
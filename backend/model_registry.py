@@ -0,0 +1,164 @@
+# ============================================================
+# model_registry.py — Named model versions, swapped without a restart
+# ============================================================
+# Several model versions can be loaded side by side under a name ("default",
+# "candidate", ...), each with its own weights and inference backend. A job
+# may name the version it wants; otherwise it gets the default.
+#
+# Reloading a name swaps the new version in atomically. Runs take a version
+# with acquire() and give it back with release(), so a run that started on the
+# old weights finishes on them; the old version is retired (its warm worker
+# pool shut down) once its last run is done.
+
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from model_export import INFERENCE_BACKEND, artifact_checksum, exported_weights
+
+DEFAULT_MODEL = "default"
+
+
+@dataclass
+class ModelVersion:
+    """One loaded model: its weights, the backend artifact it runs from, and its users."""
+
+    name: str
+    weights: Path
+    backend: str
+    path: str  # what YOLO() loaded, and what the pool workers load
+    checksum: str
+    model: Any = field(repr=False)
+    loaded_at: float = field(default_factory=time.time)
+    in_flight: int = 0
+    retired: bool = False
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "weights": str(self.weights),
+            "backend": self.backend,
+            "path": self.path,
+            "checksum": self.checksum[:12],
+            "loaded_at": self.loaded_at,
+            "in_flight": self.in_flight,
+            "retired": self.retired,
+        }
+
+
+class ModelRegistry:
+    """Thread-safe set of named model versions with a default."""
+
+    def __init__(self, on_retire: Optional[Callable[[ModelVersion], None]] = None):
+        self._versions = {}
+        self._default = None
+        self._retiring = []
+        self._on_retire = on_retire
+        self._lock = threading.Lock()
+
+    @property
+    def default(self) -> Optional[str]:
+        return self._default
+
+    def get(self, name: Optional[str] = None) -> Optional[ModelVersion]:
+        with self._lock:
+            return self._versions.get(name or self._default)
+
+    def load(self, name, weights, backend=INFERENCE_BACKEND, make_default=False):
+        """
+        Load (or reload) a named version. Blocking: exports and loads the weights.
+
+        Args:
+            name (str): Version name
+            weights (str | Path): PyTorch weights file
+            backend (str): Inference backend (see model_export.BACKENDS)
+            make_default (bool): Also make this the default version
+
+        Returns:
+            tuple: (ModelVersion, loaded) where loaded is False if the same
+                weights and backend were already loaded under this name
+        """
+        from ultralytics import YOLO
+
+        weights = Path(weights)
+        path = exported_weights(weights, backend)
+        checksum = artifact_checksum(path)
+
+        current = self.get(name)
+        if current is not None and current.checksum == checksum and current.backend == backend:
+            if make_default:
+                self.set_default(name)
+            return current, False
+
+        version = ModelVersion(name, weights, backend, str(path), checksum, YOLO(str(path), task="detect"))
+        with self._lock:
+            old = self._versions.get(name)
+            self._versions[name] = version
+            if make_default or self._default is None:
+                self._default = name
+        if old is not None:
+            self._retire(old)
+        return version, True
+
+    def set_default(self, name):
+        with self._lock:
+            if name not in self._versions:
+                raise LookupError(f"Model not loaded: {name}")
+            self._default = name
+
+    def unload(self, name):
+        """Remove a version; runs still using it finish first. The default cannot be unloaded."""
+        with self._lock:
+            if name == self._default:
+                raise ValueError("The default model cannot be unloaded; make another version the default first")
+            version = self._versions.pop(name, None)
+        if version is None:
+            raise LookupError(f"Model not loaded: {name}")
+        self._retire(version)
+
+    def acquire(self, name: Optional[str] = None) -> ModelVersion:
+        """Take the current version of a name (or the default) for one run."""
+        with self._lock:
+            version = self._versions.get(name or self._default)
+            if version is None:
+                raise LookupError(f"Model not loaded: {name or self._default or DEFAULT_MODEL}")
+            version.in_flight += 1
+            return version
+
+    def release(self, version: ModelVersion):
+        with self._lock:
+            version.in_flight -= 1
+            done = version.retired and version.in_flight == 0
+            if done:
+                self._retiring.remove(version)
+        if done:
+            self._finish(version)
+
+    def _retire(self, version):
+        with self._lock:
+            version.retired = True
+            idle = version.in_flight == 0
+            if not idle:
+                self._retiring.append(version)
+        if idle:
+            self._finish(version)
+
+    def _finish(self, version):
+        print(f"♻️ Model '{version.name}' ({version.checksum[:12]}) retired")
+        if self._on_retire is not None:
+            self._on_retire(version)
+
+    def paths(self):
+        """Model paths still in use by a loaded or retiring version."""
+        with self._lock:
+            return {v.path for v in list(self._versions.values()) + self._retiring}
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "default": self._default,
+                "models": [v.to_dict() for v in self._versions.values()],
+                "retiring": [v.to_dict() for v in self._retiring],
+            }
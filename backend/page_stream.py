@@ -0,0 +1,314 @@
+# ============================================================
+# page_stream.py — Render PDF pages straight into memory
+# ============================================================
+# Render workers rasterise pages into shared-memory blocks instead of writing
+# JPEGs to outputs/pdf_pages. The consumer wraps each block in a zero-copy numpy
+# view and hands it to inference while the next pages are still rendering.
+# Pages are only written to disk when the caller asks for artifacts.
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+
+import fitz
+import numpy as np
+from PIL import Image
+
+from metrics import PAGES, observe_stage
+
+RENDER_ZOOM = 6
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "4"))
+
+# How many pages may be rendered ahead of the page being inferred
+STREAM_PREFETCH = int(os.getenv("STREAM_PREFETCH", "2"))
+
+# Consecutive pages one render task takes when pages are written to disk
+RENDER_CHUNK_PAGES = int(os.getenv("RENDER_CHUNK_PAGES", "4"))
+
+# ---------------------------
+# Render planning
+# ---------------------------
+# Pages are rendered at a fixed physical resolution rather than a fixed zoom:
+# the model was trained on sheets rendered at RENDER_ZOOM, i.e. about 17 pixels
+# per millimetre of paper, so every page is planned from its own size to match
+# that scale. Very large sheets are capped at RENDER_MAX_PIXELS (never below
+# RENDER_MIN_ZOOM), which bounds the memory and time one page can take.
+POINTS_PER_MM = 72 / 25.4
+RENDER_PX_PER_MM = float(os.getenv("RENDER_PX_PER_MM", str(RENDER_ZOOM * POINTS_PER_MM)))
+RENDER_MAX_PIXELS = int(float(os.getenv("RENDER_MAX_PIXELS", "300e6")))  # 0 for no cap
+RENDER_MIN_ZOOM = float(os.getenv("RENDER_MIN_ZOOM", "2"))
+
+# Largest image PIL opens without complaint: the render budget plus a margin
+# (pages held at RENDER_MIN_ZOOM can go over it), or 1e9 pixels when renders
+# are uncapped. PIL warns past this and refuses images of more than twice as
+# many pixels, so a decompression bomb uploaded as a .jpg/.png is still
+# rejected. configure_pil() applies it; the server calls it at start-up and
+# each pool calls it in its worker initializer.
+IMAGE_MAX_PIXELS = int((RENDER_MAX_PIXELS or 1e9) * 1.25)
+
+
+def configure_pil():
+    """Set PIL's image size limit for this process."""
+    Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+
+
+def render_plan_key():
+    """The settings that decide page renders, for cache keys."""
+    return (RENDER_PX_PER_MM, RENDER_MAX_PIXELS, RENDER_MIN_ZOOM)
+
+
+def user_unit(page):
+    """A page's /UserUnit (points per PDF unit), used by some very large sheets."""
+    try:
+        kind, value = page.parent.xref_get_key(page.xref, "UserUnit")
+        return float(value) if kind in ("real", "int") else 1.0
+    except Exception:
+        return 1.0
+
+
+def plan_zoom(page, px_per_mm=RENDER_PX_PER_MM, max_pixels=RENDER_MAX_PIXELS, min_zoom=RENDER_MIN_ZOOM):
+    """
+    Zoom to render a page at px_per_mm of paper, within the pixel budget.
+
+    Args:
+        page (fitz.Page): Page to plan
+        px_per_mm (float): Target pixels per millimetre of the physical sheet
+        max_pixels (int): Largest render in pixels (0 for no cap)
+        min_zoom (float): Smallest zoom the budget may push a page down to
+
+    Returns:
+        float: Zoom factor for fitz.Matrix
+    """
+    zoom = px_per_mm / POINTS_PER_MM * user_unit(page)
+    area = page.rect.width * page.rect.height
+    if max_pixels and area * zoom * zoom > max_pixels:
+        zoom = max(min_zoom, math.sqrt(max_pixels / area))
+    return zoom
+
+
+_render_pool = None
+
+
+def get_render_pool():
+    """Return the shared render process pool, creating it on first use."""
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, initializer=configure_pil)
+    return _render_pool
+
+
+def shutdown_render_pool():
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=True, cancel_futures=True)
+    _render_pool = None
+
+
+# ---------------------------
+# Documents open in this worker
+# ---------------------------
+# Parsing a large PDF (xref, page tree, fonts) costs far more than rendering a
+# small page, so each render worker opens a document once and keeps it for
+# every later page it is sent. The last few documents stay open; a file that
+# changed on disk is opened again.
+_WORKER_DOCS = 2
+_worker_docs = OrderedDict()  # path -> (mtime_ns, size, fitz.Document)
+
+
+def worker_document(pdf_path_str):
+    """This process's open copy of a PDF, opened on first use."""
+    stat = os.stat(pdf_path_str)
+    cached = _worker_docs.get(pdf_path_str)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        _worker_docs.move_to_end(pdf_path_str)
+        return cached[2]
+    if cached is not None:
+        cached[2].close()
+    doc = fitz.open(pdf_path_str)
+    _worker_docs[pdf_path_str] = (stat.st_mtime_ns, stat.st_size, doc)
+    _worker_docs.move_to_end(pdf_path_str)
+    while len(_worker_docs) > _WORKER_DOCS:
+        _, (_, _, old) = _worker_docs.popitem(last=False)
+        old.close()
+    return doc
+
+
+def page_chunks(total_pages, chunk=RENDER_CHUNK_PAGES):
+    """Split 0-based page numbers into runs of consecutive pages."""
+    chunk = max(1, chunk)
+    return [list(range(i, min(i + chunk, total_pages))) for i in range(0, total_pages, chunk)]
+
+
+def pixmap_array(pix):
+    """Zero-copy HWC uint8 view of a PyMuPDF pixmap's samples."""
+    rows = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)
+    return rows[:, :pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+
+
+# Worker function for streamed page rendering (must be at module level for pickling)
+def _render_page_to_shm(pdf_path_str, page_num, zoom=None, save_path_str=None):
+    """Render one page into a new shared-memory block as a BGR image (zoom None: planned per page)."""
+    start = time.perf_counter()
+    try:
+        page = worker_document(pdf_path_str).load_page(page_num)
+        zoom = zoom or plan_zoom(page)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        if save_path_str:
+            pix.save(save_path_str)
+
+        src = pixmap_array(pix)
+        shape = (pix.height, pix.width, 3)
+        shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+        # The single copy into shared memory also swaps RGB -> BGR for the model
+        dst = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        dst[:] = src[:, :, 2::-1] if pix.n >= 3 else src[:, :, :1]
+        del dst
+        shm.close()
+        # Ownership passes to the consumer, which unlinks the block; stop
+        # this worker's resource tracker from "cleaning it up" as a leak.
+        resource_tracker.unregister(shm._name, "shared_memory")
+
+        return {
+            "page": page_num + 1, "success": True, "shm": shm.name, "shape": shape, "path": save_path_str, "zoom": zoom,
+            "seconds": time.perf_counter() - start,
+        }
+    except Exception as e:
+        return {"page": page_num + 1, "success": False, "error": str(e)}
+
+
+def _release_shm(name):
+    """Free a shared-memory block produced by a render worker."""
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+        shm.close()
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class RenderedPage:
+    """A page image held in shared memory; valid until release() is called."""
+
+    def __init__(self, page, image=None, path=None, error=None, shm=None):
+        self.page = page
+        self.image = image
+        self.path = path
+        self.error = error
+        self._shm = shm
+
+    @classmethod
+    def from_worker(cls, result):
+        if not result.get("success"):
+            return cls(result["page"], error=result.get("error"))
+        shm = shared_memory.SharedMemory(name=result["shm"])
+        image = np.ndarray(tuple(result["shape"]), dtype=np.uint8, buffer=shm.buf)
+        return cls(result["page"], image=image, path=result.get("path"), shm=shm)
+
+    def detach(self):
+        """Hand this page's memory to a new owner, e.g. a queue consumer."""
+        page = RenderedPage(self.page, self.image, self.path, self.error, self._shm)
+        self.image = None
+        self._shm = None
+        return page
+
+    def release(self):
+        self.image = None
+        if self._shm is not None:
+            self._shm.unlink()
+            try:
+                self._shm.close()
+            except BufferError:
+                # A caller still holds a view; the mapping goes when it does
+                pass
+            self._shm = None
+
+
+def load_image_page(image_path, page=1):
+    """Load a single uploaded image as an in-memory BGR page."""
+    with Image.open(image_path) as img:
+        image = np.ascontiguousarray(np.asarray(img.convert("RGB"))[:, :, ::-1])
+    return RenderedPage(page, image=image, path=str(image_path))
+
+
+def record_render(result, job_id=None):
+    """Metrics for one render worker result (render time is measured inside the worker)."""
+    PAGES.inc(stage="render", outcome="ok" if result.get("success") else "failed")
+    if "seconds" in result:
+        observe_stage("render_page", result["seconds"], job_id)
+
+
+def count_pages(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+
+async def stream_pdf_pages(pdf_path, zoom=None, save_dir=None, prefetch=STREAM_PREFETCH, executor=None,
+                           slot=None):
+    """
+    Render a PDF page by page and yield each page as soon as it is ready.
+
+    Up to `prefetch` pages are rendered ahead of the one being consumed, so
+    page N can be inferred while page N+1 is still rendering. Pages are yielded
+    in order; each page's memory is released once the consumer moves on,
+    unless the consumer takes ownership with page.detach().
+
+    Args:
+        pdf_path (str | Path): PDF to render
+        zoom (float, optional): Render zoom factor (default: planned per page)
+        save_dir (Path, optional): Also write page_<n>.jpg files here
+        prefetch (int): Pages rendered ahead of the consumer (at least 1)
+        executor: Process pool to render in (defaults to the shared render pool)
+        slot: Optional callable returning an async context manager that is held
+            while each page renders (e.g. a scheduler slot)
+
+    Yields:
+        RenderedPage: page number plus a BGR numpy view (or an error)
+    """
+    pdf_path = str(pdf_path)
+    total_pages = await asyncio.to_thread(count_pages, pdf_path)
+    executor = executor or get_render_pool()
+    loop = asyncio.get_running_loop()
+
+    async def render(page_num):
+        save_path = str(Path(save_dir) / f"page_{page_num + 1}.jpg") if save_dir else None
+        if slot is None:
+            return await loop.run_in_executor(executor, _render_page_to_shm, pdf_path, page_num, zoom, save_path)
+        async with slot():
+            return await loop.run_in_executor(executor, _render_page_to_shm, pdf_path, page_num, zoom, save_path)
+
+    def submit(page_num):
+        return asyncio.ensure_future(render(page_num))
+
+    pending = deque()
+    next_page = 0
+    try:
+        while next_page < total_pages and len(pending) < max(prefetch, 1):
+            pending.append(submit(next_page))
+            next_page += 1
+
+        while pending:
+            result = await pending.popleft()
+            if next_page < total_pages:
+                pending.append(submit(next_page))
+                next_page += 1
+
+            record_render(result)
+            page = RenderedPage.from_worker(result)
+            try:
+                yield page
+            finally:
+                page.release()
+    finally:
+        # Consumer stopped early: free anything already rendered ahead
+        for fut in pending:
+            try:
+                result = await fut
+            except Exception:
+                continue
+            if result.get("shm"):
+                _release_shm(result["shm"])
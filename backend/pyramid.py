@@ -0,0 +1,125 @@
+# ============================================================
+# pyramid.py — Deep-zoom (DZI) tile pyramids for page images
+# ============================================================
+# A page rendered at the planned resolution can be 14000 px wide, so the viewer
+# should not download it whole. This module cuts a page into the Deep Zoom
+# layout that OpenSeadragon and similar viewers read:
+#
+#   <tiles_dir>/<level>/<col>_<row>.jpg
+#
+# Level 0 is a single pixel and the top level is the full-size image; every
+# level below halves the one above it. Tiles are cut lazily, a block of
+# DZI_BLOCK_TILES x DZI_BLOCK_TILES tiles around the first tile asked for, so a
+# request at the deepest level costs one decode of the page and a 2048 px
+# resample, not the whole level. Annotated pyramids draw the run's boxes on each
+# block as it is cut, so no full-resolution annotated copy is ever made.
+
+import math
+import os
+import uuid
+from pathlib import Path
+
+from PIL import Image
+
+from annotate import draw_boxes
+
+DZI_TILE_SIZE = int(os.getenv("DZI_TILE_SIZE", "256"))
+DZI_OVERLAP = 1
+DZI_FORMAT = "jpg"
+DZI_QUALITY = 85
+
+# Tiles per side of the block cut in one go
+DZI_BLOCK_TILES = 8
+
+
+def max_level(width, height):
+    return math.ceil(math.log2(max(width, height, 1)))
+
+
+def level_size(width, height, level):
+    """Pixel size of an image at a pyramid level."""
+    scale = 2 ** (max_level(width, height) - level)
+    return max(1, math.ceil(width / scale)), max(1, math.ceil(height / scale))
+
+
+def dzi_descriptor(width, height, tile_size=DZI_TILE_SIZE):
+    """The .dzi XML describing a pyramid of a width x height image."""
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" TileSize="{tile_size}" '
+        f'Overlap="{DZI_OVERLAP}" Format="{DZI_FORMAT}">'
+        f'<Size Width="{width}" Height="{height}"/></Image>'
+    )
+
+
+def tile_path(tiles_dir, level, col, row):
+    return Path(tiles_dir) / str(level) / f"{col}_{row}.{DZI_FORMAT}"
+
+
+def block_of(col, row):
+    """The block (bx, by) holding a tile."""
+    return col // DZI_BLOCK_TILES, row // DZI_BLOCK_TILES
+
+
+def block_marker(tiles_dir, level, col, row):
+    """Marker written once every tile of the block holding (col, row) is on disk."""
+    bx, by = block_of(col, row)
+    return Path(tiles_dir) / str(level) / f".done_{bx}_{by}"
+
+
+def build_block(source, tiles_dir, level, col, row, boxes=None, boxes_size=None, tile_size=DZI_TILE_SIZE):
+    """
+    Cut the block of tiles holding tile (col, row) at one pyramid level.
+
+    Args:
+        source (str | Path): Full-size clean page (the pyramid's top level)
+        tiles_dir (str | Path): Root folder of the pyramid
+        level (int): Pyramid level, 0 .. max_level
+        col, row (int): A tile of the block to cut
+        boxes (np.ndarray): Optional [N, 4] xyxy boxes to draw on the tiles
+        boxes_size (tuple): (width, height) the boxes refer to, if not the source's own
+
+    Returns:
+        Path: The block's marker file, written after the last tile
+    """
+    marker = block_marker(tiles_dir, level, col, row)
+    bx, by = block_of(col, row)
+    span = DZI_BLOCK_TILES * tile_size
+    with Image.open(source) as img:
+        full_w, full_h = img.size
+        width, height = level_size(full_w, full_h, level)
+        if col < 0 or row < 0 or bx * span >= width or by * span >= height:
+            raise LookupError(f"No tile {col}_{row} at level {level}")
+        if width < full_w:
+            img.draft("RGB", (width, height))
+        image = img.convert("RGB")
+
+    # The block's region at this level, plus the tiles' overlap around it
+    x0, y0 = max(0, bx * span - DZI_OVERLAP), max(0, by * span - DZI_OVERLAP)
+    x1, y1 = min(width, (bx + 1) * span + DZI_OVERLAP), min(height, (by + 1) * span + DZI_OVERLAP)
+    if image.size == (width, height):
+        block = image.crop((x0, y0, x1, y1))
+    else:
+        sx, sy = image.size[0] / width, image.size[1] / height
+        block = image.resize((x1 - x0, y1 - y0), Image.LANCZOS, box=(x0 * sx, y0 * sy, x1 * sx, y1 * sy))
+    del image
+    if boxes is not None and len(boxes):
+        bw, bh = boxes_size if boxes_size and boxes_size[0] and boxes_size[1] else (full_w, full_h)
+        draw_boxes(block, boxes, (width / bw, height / bh), offset=(x0, y0))
+
+    level_dir = marker.parent
+    level_dir.mkdir(parents=True, exist_ok=True)
+    rows = range(by * DZI_BLOCK_TILES, min(math.ceil(height / tile_size), (by + 1) * DZI_BLOCK_TILES))
+    cols = range(bx * DZI_BLOCK_TILES, min(math.ceil(width / tile_size), (bx + 1) * DZI_BLOCK_TILES))
+    for r in rows:
+        for c in cols:
+            tx0 = max(0, c * tile_size - DZI_OVERLAP)
+            ty0 = max(0, r * tile_size - DZI_OVERLAP)
+            tx1 = min(width, (c + 1) * tile_size + DZI_OVERLAP)
+            ty1 = min(height, (r + 1) * tile_size + DZI_OVERLAP)
+            tmp = level_dir / f".{uuid.uuid4().hex}.tmp.{DZI_FORMAT}"
+            block.crop((tx0 - x0, ty0 - y0, tx1 - x0, ty1 - y0)).save(tmp, quality=DZI_QUALITY)
+            tmp.replace(tile_path(tiles_dir, level, c, r))
+
+    marker.touch()
+    return marker
@@ -0,0 +1,112 @@
+# ============================================================
+# scheduler.py — Bounded, fair scheduling of CPU-heavy stages
+# ============================================================
+# One FairScheduler per stage (render, inference, ...) caps how many work units
+# of that stage run at once across *all* requests. Waiting units are queued per
+# job and handed out round-robin between jobs, so one 300-page upload cannot
+# starve a 2-page one that arrives after it.
+#
+# Everything here runs on the event loop thread, so no locking is needed.
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from metrics import QUEUE_WAIT_SECONDS, trace
+
+
+class FairScheduler:
+    def __init__(self, name, capacity):
+        self.name = name
+        self.capacity = max(1, int(capacity))
+        self._running = 0
+        self._queues = OrderedDict()  # job_id -> deque of waiting futures
+
+        # Counters for /scheduler
+        self._completed = 0
+        self._wait_count = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @asynccontextmanager
+    async def slot(self, job_id="default"):
+        """Wait for a free slot (fairly across jobs) and hold it for the block."""
+        enqueued_at = time.perf_counter()
+
+        if self._running < self.capacity and not self._queues:
+            self._running += 1
+        else:
+            fut = asyncio.get_running_loop().create_future()
+            self._queues.setdefault(job_id, deque()).append(fut)
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    # The slot was granted just as we were cancelled; hand it on
+                    self._release()
+                else:
+                    self._discard(job_id, fut)
+                raise
+
+        self._record_wait(time.perf_counter() - enqueued_at, job_id)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _discard(self, job_id, fut):
+        queue = self._queues.get(job_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(fut)
+        except ValueError:
+            pass
+        if not queue:
+            del self._queues[job_id]
+
+    def _release(self):
+        self._running -= 1
+        self._completed += 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to waiting jobs in round-robin order."""
+        while self._running < self.capacity and self._queues:
+            job_id, queue = next(iter(self._queues.items()))
+            fut = queue.popleft()
+            if queue:
+                self._queues.move_to_end(job_id)
+            else:
+                del self._queues[job_id]
+
+            if fut.cancelled():
+                continue
+            self._running += 1
+            fut.set_result(None)
+
+    def _record_wait(self, seconds, job_id=None):
+        self._wait_count += 1
+        self._wait_total += seconds
+        self._wait_max = max(self._wait_max, seconds)
+        QUEUE_WAIT_SECONDS.observe(seconds, stage=self.name)
+        trace(f"queue_wait_{self.name}", seconds, job_id if job_id != "default" else None)
+
+    def queued(self, job_id=None):
+        """Number of waiting units, overall or for one job."""
+        if job_id is not None:
+            return len(self._queues.get(job_id, ()))
+        return sum(len(q) for q in self._queues.values())
+
+    def stats(self):
+        return {
+            "stage": self.name,
+            "capacity": self.capacity,
+            "running": self._running,
+            "queued": self.queued(),
+            "queued_jobs": len(self._queues),
+            "completed": self._completed,
+            "wait_avg_ms": round(self._wait_total / self._wait_count * 1000, 1) if self._wait_count else 0.0,
+            "wait_max_ms": round(self._wait_max * 1000, 1),
+        }
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Read at import by meta_data/main: no network client, no retry backoff, and a
+# metadata cache that starts empty
+os.environ.setdefault("METADATA_CLIENT", "stub")
+os.environ.setdefault("METADATA_RETRIES", "0")
+os.environ.setdefault("METADATA_CACHE_DIR", tempfile.mkdtemp(prefix="metadata_cache_"))
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import main
+import meta_data
+from cache import ContentCache
+from detection_store import DetectionStore, remember_store
+from jobs import JobRegistry
+
+
+class FailingClient(meta_data.StubClient):
+    """Stub whose OCR calls all fail, like the API being down."""
+
+    async def _generate_content_async(self, model, contents):
+        self.calls += 1
+        raise RuntimeError("OCR service unavailable")
+
+
+@pytest.fixture
+def job(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "jobs", JobRegistry(tmp_path / "uploads", tmp_path / "outputs"))
+    monkeypatch.setattr(main, "content_cache", ContentCache(tmp_path / "cache"))
+    monkeypatch.setattr(meta_data, "metadata_cache", meta_data.MetadataCache(tmp_path / "metadata"))
+    monkeypatch.setattr(main, "TITLE_BLOCK_CROP", False)
+
+    job = main.jobs.create("set.png")
+    job.pages_dir.mkdir(parents=True)
+    for page in (1, 2):
+        Image.new("RGB", (200, 100), (100 * page, 0, 0)).save(job.pages_dir / f"page_{page}.jpg")
+    store = remember_store(DetectionStore(job.new_run_dir()))
+    for page in (1, 2):
+        store.add(page, np.zeros((0, 4)), [], [], (200, 100))
+    store.save()
+    job.status = "completed"
+    yield job
+    main._results_responses.clear()
+
+
+def test_results_refetch_metadata_after_ocr_recovers(job):
+    client = TestClient(main.app)
+
+    meta_data.set_client(FailingClient())
+    first = client.get("/results", params={"job_id": job.job_id}).json()
+    assert first["meta_data"] == {"1": {}, "2": {}}
+
+    working = meta_data.StubClient(response={"drawing_no": "A-101"})
+    meta_data.set_client(working)
+    second = client.get("/results", params={"job_id": job.job_id})
+    assert working.calls == 2
+    assert {page: meta["drawing_no"] for page, meta in second.json()["meta_data"].items()} == {
+        "1": "A-101", "2": "A-101",
+    }
+
+    # Complete metadata is reused without asking the API again
+    third = client.get("/results", params={"job_id": job.job_id}, headers={"If-None-Match": second.headers["ETag"]})
+    assert third.status_code == 304
+    assert working.calls == 2
+
+
+@pytest.mark.parametrize("path", ["/jobs/{job_id}/pages", "/jobs/{job_id}/pages/1"])
+def test_pages_refetch_metadata_after_ocr_recovers(job, path):
+    client = TestClient(main.app)
+    url = path.format(job_id=job.job_id)
+    params = {"include_metadata": True}
+
+    meta_data.set_client(FailingClient())
+    first = client.get(url, params=params)
+    assert "ETag" not in first.headers
+    assert first.headers["Cache-Control"] == "no-store"
+
+    working = meta_data.StubClient(response={"drawing_no": "A-101"})
+    meta_data.set_client(working)
+    second = client.get(url, params=params)
+    body = second.json()
+    items = body["pages"] if "pages" in body else [body]
+    assert {item["meta_data"]["drawing_no"] for item in items} == {"A-101"}
+
+    third = client.get(url, params=params, headers={"If-None-Match": f'"other", {second.headers["ETag"]}'})
+    assert third.status_code == 304
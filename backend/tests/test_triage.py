@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import main
+from cache import ContentCache
+from jobs import JobRegistry
+
+
+class FakeModels:
+    """Registry stand-in: one version whose weights are never touched."""
+
+    def __init__(self):
+        self.version = SimpleNamespace(name="default", checksum="0" * 64, path="best.pt", model=None)
+
+    def acquire(self, name=None):
+        return self.version
+
+    def release(self, version):
+        pass
+
+
+@pytest.fixture
+def job(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "jobs", JobRegistry(tmp_path / "uploads", tmp_path / "outputs"))
+    monkeypatch.setattr(main, "content_cache", ContentCache(tmp_path / "cache"))
+    monkeypatch.setattr(main, "models", FakeModels())
+
+    detected = []
+
+    def infer_batch(model, batch, pages=None):
+        detected.extend(pages)
+        return [
+            {"page": p, "image": str(img), "success": True, "detections": 0,
+             "boxes": [], "classes": [], "confidences": [], "size": (400, 300)}
+            for p, img in zip(pages, batch)
+        ]
+
+    monkeypatch.setattr(main, "infer_batch", infer_batch)
+
+    job = main.jobs.create("set.png")
+    job.pages_dir.mkdir(parents=True)
+    # A blank sheet: triage decides "skip" for it
+    Image.new("RGB", (400, 300), "white").save(job.pages_dir / "page_1.jpg")
+    job.detected = detected
+    yield job
+    main.shutdown_render_pool()
+
+
+@pytest.mark.parametrize("mode, skipped", [("flag", []), ("skip", [1])])
+def test_only_pages_kept_from_the_detector_count_as_skipped(job, mode, skipped):
+    client = TestClient(main.app)
+    result = client.get("/inference", params={"job_id": job.job_id, "mode": "batch", "triage": mode}).json()
+    assert result["skipped_pages"] == skipped
+    assert job.detected == ([] if skipped else [1])
+
+    summary = client.get(f"/jobs/{job.job_id}/summary").json()
+    assert summary["skipped_pages"] == skipped
+    page = client.get(f"/jobs/{job.job_id}/pages").json()["pages"][0]
+    assert page["triage"]["decision"] == "skip"
+    assert page["triage"]["skipped"] == bool(skipped)
@@ -0,0 +1,174 @@
+# ============================================================
+# text_layer.py — Title-block metadata from a PDF's own text layer
+# ============================================================
+# Most of our PDFs are CAD exports that still carry real text. For those, the
+# title block can be read locally from PyMuPDF's text spans instead of sending
+# a rendered image to the OCR model: find the title block on a small render
+# (title_block.locate_title_block), pull the text lines inside it with
+# page.get_text("dict"), and match field labels ("DRAWING NO", "SCALE", ...)
+# to the text beside or below them.
+#
+# A page with no text layer, or too few recognisable fields, returns None and
+# goes to image OCR as before.
+
+import os
+import re
+
+import fitz
+import numpy as np
+
+from meta_data import DrawingMetadata
+from title_block import locate_title_block
+
+# Set TEXT_LAYER_METADATA=0 to always use image OCR
+TEXT_LAYER_METADATA = os.getenv("TEXT_LAYER_METADATA", "1") != "0"
+
+# Fewest fields that must be found for the text layer to be trusted
+TEXT_LAYER_MIN_FIELDS = int(os.getenv("TEXT_LAYER_MIN_FIELDS", "2"))
+
+# Longest side of the render used to locate the title block
+_LOCATE_SIDE = 1200
+
+# Field labels as they appear on title blocks, upper case without punctuation.
+# Labels are matched longest first, so "PROJECT ENGINEER" wins over "PROJECT".
+FIELD_LABELS = {
+    "project_name": ["PROJECT NAME", "PROJECT TITLE", "PROJECT"],
+    "consultant": ["CONSULTANT", "ARCHITECT", "ENGINEER OF RECORD"],
+    "contractor": ["MAIN CONTRACTOR", "GENERAL CONTRACTOR", "CONTRACTOR"],
+    "sub_contractor": ["SUB CONTRACTOR", "SUBCONTRACTOR", "MEP CONTRACTOR"],
+    "drawing_title": ["DRAWING TITLE", "DRG TITLE", "DWG TITLE", "SHEET TITLE", "TITLE"],
+    "drawing_no": [
+        "DRAWING NUMBER", "DRAWING NO", "DRG NO", "DWG NO", "SHEET NUMBER", "SHEET NO", "DRAWING REF",
+    ],
+    "scale": ["SCALE"],
+    "date": ["DATE"],
+    "rev": ["REVISION", "REV"],
+    "project_engineer": ["PROJECT ENGINEER", "PROJECT MANAGER"],
+    "drawn_by": ["DRAWN BY", "DRAWN", "DRAFTED BY"],
+    "site_engineer": ["SITE ENGINEER"],
+}
+
+_LABELS = sorted(
+    (
+        (re.compile(r"^\s*" + r"[\s\-._/]*".join(map(re.escape, label.split())) + r"(?![A-Z0-9])", re.I), field)
+        for field, labels in FIELD_LABELS.items() for label in labels
+    ),
+    key=lambda item: -len(item[0].pattern),
+)
+
+
+def _match_label(text):
+    """Return (field, value after the label) if a line starts with a known label."""
+    for pattern, field in _LABELS:
+        match = pattern.match(text)
+        if match:
+            # Whatever follows the label on the same line (e.g. "SCALE: 1:100")
+            return field, text[match.end():].lstrip(":#.- ").strip()
+    return None
+
+
+def _text_lines(page, clip):
+    """Text lines inside clip as (text, bbox) pairs, in reading order."""
+    lines = []
+    for block in page.get_text("dict", clip=clip)["blocks"]:
+        for line in block.get("lines", []):
+            text = "".join(span["text"] for span in line["spans"]).strip()
+            if text:
+                lines.append((text, fitz.Rect(line["bbox"])))
+    lines.sort(key=lambda item: (round(item[1].y0, 1), item[1].x0))
+    return lines
+
+
+def _value_near(label_rect, lines, used):
+    """The closest unused line to the right of, or just below, a label."""
+    best, best_dist = None, None
+    height = max(label_rect.height, 1.0)
+    for i, (text, rect) in enumerate(lines):
+        if i in used or _match_label(text):
+            continue
+        same_row = abs(rect.y0 - label_rect.y0) < height * 0.6 and rect.x0 >= label_rect.x1 - 1
+        below = (
+            -height * 0.3 <= rect.y0 - label_rect.y1 < height * 3
+            and rect.x0 < label_rect.x1 and rect.x1 > label_rect.x0
+        )
+        if not (same_row or below):
+            continue
+        dist = (rect.x0 - label_rect.x1) if same_row else (rect.y0 - label_rect.y1) * 2
+        if best_dist is None or dist < best_dist:
+            best, best_dist = i, dist
+    return best
+
+
+def parse_title_block_lines(lines):
+    """
+    Fill DrawingMetadata fields from title-block text lines.
+
+    Args:
+        lines (list): (text, fitz.Rect) pairs in reading order
+
+    Returns:
+        dict: Every DrawingMetadata field, None where nothing was found
+    """
+    metadata = {field: None for field in DrawingMetadata.model_fields}
+    used = set()
+    for i, (text, rect) in enumerate(lines):
+        match = _match_label(text)
+        if match is None:
+            continue
+        used.add(i)
+        field, value = match
+        if metadata[field] is not None:
+            continue
+        if not value:
+            near = _value_near(rect, lines, used)
+            if near is not None:
+                used.add(near)
+                value = lines[near][0]
+        metadata[field] = value or None
+    return metadata
+
+
+def title_block_rect(page):
+    """Title-block area of a page, located on a small greyscale render."""
+    zoom = _LOCATE_SIDE / max(page.rect.width, page.rect.height)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    (x0, y0, x1, y1), _ = locate_title_block(gray)
+    r = page.rect
+    rect = fitz.Rect(r.x0 + x0 * r.width, r.y0 + y0 * r.height, r.x0 + x1 * r.width, r.y0 + y1 * r.height)
+    # Text coordinates are on the unrotated page
+    return rect * page.derotation_matrix
+
+
+def extract_page_text_metadata(page):
+    """Metadata from one page's text layer, or None if it has no usable text."""
+    if not page.get_text("text").strip():
+        return None
+    metadata = parse_title_block_lines(_text_lines(page, title_block_rect(page)))
+    found = sum(1 for v in metadata.values() if v)
+    return metadata if found >= TEXT_LAYER_MIN_FIELDS else None
+
+
+def extract_text_metadata(pdf_path, page_numbers):
+    """
+    Read title-block metadata from a PDF's text layer.
+
+    Args:
+        pdf_path (str | Path): The PDF the pages were rendered from
+        page_numbers (list): 1-based page numbers
+
+    Returns:
+        list: Per page, a metadata dict, or None where image OCR is still needed
+    """
+    results = []
+    with fitz.open(pdf_path) as doc:
+        for page_num in page_numbers:
+            try:
+                if not 1 <= page_num <= len(doc):
+                    results.append(None)
+                    continue
+                results.append(extract_page_text_metadata(doc.load_page(page_num - 1)))
+            except Exception as e:
+                print(f"⚠️ Text-layer extraction failed on page {page_num}: {e}")
+                results.append(None)
+    return results
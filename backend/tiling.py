@@ -0,0 +1,190 @@
+# ============================================================
+# tiling.py — Sliding-window inference for large drawing sheets
+# ============================================================
+# Pages are rendered at a fixed physical resolution (RENDER_PX_PER_MM, about 17
+# px per mm of paper, capped at RENDER_MAX_PIXELS), so a single A0 sheet is far
+# larger than the model's input size and small symbols vanish when Ultralytics
+# downsamples the whole page. Here each page is cut into model-sized, overlapping tiles, the tiles are
+# run in batches, and the boxes are merged back into page coordinates with a
+# cross-tile NMS.
+
+import os
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from batch_inference import (
+    INFERENCE_BATCH_SIZE, PREDICT_IOU, configure_threads, iter_batches, predict_batch, result_arrays,
+)
+
+TILE_SIZE = int(os.getenv("TILE_SIZE", "640"))
+TILE_OVERLAP = int(os.getenv("TILE_OVERLAP", "128"))
+
+# Boxes cut by a tile edge overlap their full counterpart mostly by
+# containment rather than IoU, so they are also merged on
+# intersection-over-smaller-area.
+MERGE_IOS = 0.70
+
+
+def tile_grid(width, height, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """
+    Return (x0, y0, x1, y1) windows covering an image with the given overlap.
+
+    The last row/column is shifted back so it ends exactly on the image edge,
+    which keeps every tile full-sized whenever the image is large enough.
+    """
+    tile_size = int(tile_size)
+    overlap = int(overlap)
+    if overlap >= tile_size:
+        raise ValueError("Tile overlap must be smaller than the tile size")
+    stride = tile_size - overlap
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, stride))
+        positions.append(length - tile_size)
+        return positions
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height)
+        for x in starts(width)
+    ]
+
+
+def nms(boxes, scores, iou_threshold=PREDICT_IOU, ios_threshold=MERGE_IOS):
+    """
+    Greedy NMS over xyxy boxes.
+
+    A box is suppressed when its IoU with a higher-scoring kept box exceeds
+    iou_threshold, or when its intersection over the smaller of the two areas
+    exceeds ios_threshold.
+
+    Returns:
+        np.ndarray: Indices of the kept boxes, highest score first
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    x0, y0, x1, y1 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.maximum(x1 - x0, 0) * np.maximum(y1 - y0, 0)
+    order = np.argsort(-scores)
+
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        iw = np.maximum(np.minimum(x1[i], x1[rest]) - np.maximum(x0[i], x0[rest]), 0)
+        ih = np.maximum(np.minimum(y1[i], y1[rest]) - np.maximum(y0[i], y0[rest]), 0)
+        inter = iw * ih
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        ios = inter / np.maximum(np.minimum(areas[i], areas[rest]), 1e-9)
+
+        order = rest[(iou <= iou_threshold) & (ios <= ios_threshold)]
+
+    return np.asarray(keep, dtype=np.int64)
+
+
+def merge_tile_detections(boxes, classes, confs, iou_threshold=PREDICT_IOU):
+    """Class-aware NMS over detections already shifted into page coordinates."""
+    keep = []
+    for cls_id in np.unique(classes):
+        idx = np.flatnonzero(classes == cls_id)
+        keep.append(idx[nms(boxes[idx], confs[idx], iou_threshold)])
+    if not keep:
+        return boxes, classes, confs
+    keep = np.concatenate(keep)
+    keep = keep[np.argsort(-confs[keep])]
+    return boxes[keep], classes[keep], confs[keep]
+
+
+def predict_tiled(model, page_bgr, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, batch_size=INFERENCE_BATCH_SIZE):
+    """
+    Run tiled inference over one page.
+
+    Args:
+        model: A loaded ultralytics YOLO model
+        page_bgr (np.ndarray): HWC BGR page image
+        tile_size (int): Tile edge in pixels (ideally the model's imgsz)
+        overlap (int): Overlap between neighbouring tiles in pixels
+        batch_size (int): Number of tiles per forward pass
+
+    Returns:
+        tuple: (boxes xyxy float32 [N, 4], classes int32 [N], confidences float32 [N])
+            in page pixel coordinates
+    """
+    height, width = page_bgr.shape[:2]
+    windows = tile_grid(width, height, tile_size, overlap)
+
+    all_boxes, all_classes, all_confs = [], [], []
+    for batch in iter_batches(windows, batch_size):
+        # Only the tiles of the current batch are materialised as contiguous copies
+        tiles = [np.ascontiguousarray(page_bgr[y0:y1, x0:x1]) for x0, y0, x1, y1 in batch]
+        results = predict_batch(model, tiles, imgsz=int(tile_size))
+        for (x0, y0, _, _), res in zip(batch, results):
+            if len(res.boxes) == 0:
+                continue
+            boxes, classes, confs = result_arrays(res, offset=(x0, y0))
+            all_boxes.append(boxes)
+            all_classes.append(classes)
+            all_confs.append(confs)
+
+    if not all_boxes:
+        return (np.zeros((0, 4), np.float32), np.zeros(0, np.int32), np.zeros(0, np.float32))
+
+    return merge_tile_detections(
+        np.concatenate(all_boxes), np.concatenate(all_classes), np.concatenate(all_confs)
+    )
+
+
+def detect_array(model, image_bgr, mode="batch", tile_size=TILE_SIZE, overlap=TILE_OVERLAP,
+                 batch_size=INFERENCE_BATCH_SIZE):
+    """Detect on one in-memory page, either whole-page ("batch") or tiled ("tiled")."""
+    if mode == "tiled":
+        return predict_tiled(model, image_bgr, tile_size, overlap, batch_size)
+    return result_arrays(predict_batch(model, [image_bgr])[0])
+
+
+def infer_tiled_page(model, img_path, page_num, tile_size=TILE_SIZE, overlap=TILE_OVERLAP,
+                     batch_size=INFERENCE_BATCH_SIZE):
+    """
+    Tiled inference over one page image on disk.
+
+    Returns the merged detections as arrays for the run's DetectionStore;
+    annotated previews are rendered later, on demand.
+
+    Returns:
+        dict: Per-page result shaped like the worker-pool results
+    """
+    configure_threads()
+
+    img_path = Path(img_path)
+
+    try:
+        image = Image.open(img_path).convert("RGB")
+        width, height = image.size
+        page_bgr = np.asarray(image)[:, :, ::-1]
+
+        boxes, classes, confs = predict_tiled(model, page_bgr, tile_size, overlap, batch_size)
+
+        return {
+            "page": page_num,
+            "image": str(img_path),
+            "success": True,
+            "detections": int(len(boxes)),
+            "boxes": boxes,
+            "classes": classes,
+            "confidences": confs,
+            "size": (width, height),
+        }
+    except Exception as e:
+        return {
+            "page": page_num,
+            "image": str(img_path),
+            "success": False,
+            "error": str(e),
+        }
@@ -0,0 +1,168 @@
+# ============================================================
+# title_block.py — Find and crop the title block of a drawing page
+# ============================================================
+# Metadata extraction only needs the title block, but the rendered pages are
+# tens to hundreds of megapixels and often tens of megabytes. This module finds the title block with
+# a cheap ruling-line heuristic on a small greyscale copy of the page and
+# crops just that region, downsized, for the OCR call.
+#
+# Two layouts are recognised, both drawn against the sheet's outer frame:
+#   - a strip down the right-hand side (full frame height)
+#   - a box in the bottom-right corner
+# When neither is found, a fixed bottom-right region is used instead.
+
+import os
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# Set TITLE_BLOCK_CROP=0 to send whole pages to metadata extraction again
+TITLE_BLOCK_CROP = os.getenv("TITLE_BLOCK_CROP", "1") != "0"
+
+# Longest side of the saved crop, in pixels
+TITLE_BLOCK_MAX_SIDE = int(os.getenv("TITLE_BLOCK_MAX_SIDE", "1600"))
+
+# Fallback region (x0, y0, x1, y1 as fractions of the page)
+TITLE_BLOCK_FALLBACK = (0.55, 0.65, 1.0, 1.0)
+
+_ANALYSIS_SIDE = 1200   # longest side of the copy the lines are searched on
+_DARK = 160             # grey level below which a pixel counts as ink
+_FRAME_FILL = 0.5       # share of a row/column that must be ink to be the frame
+_PAD = 0.005            # padding added around the detected box
+
+
+def _frame_edge(fill, start, stop, step):
+    """First index from start towards stop whose ink share looks like a frame line."""
+    for i in range(start, stop, step):
+        if fill[i] > _FRAME_FILL:
+            return i
+    return None
+
+
+def _thicken(dark):
+    """Close one-pixel gaps left by antialiasing and JPEG noise."""
+    out = dark.copy()
+    out[1:] |= dark[:-1]
+    out[:-1] |= dark[1:]
+    out[:, 1:] |= dark[:, :-1]
+    out[:, :-1] |= dark[:, 1:]
+    return out
+
+
+def _runs_from_end(mask, axis):
+    """Length of the unbroken run of True values ending at the last index along an axis."""
+    flipped = np.flip(mask, axis=axis)
+    return np.cumprod(flipped, axis=axis, dtype=np.int32).sum(axis=axis)
+
+
+def locate_title_block(gray):
+    """
+    Locate the title block on a greyscale page.
+
+    Args:
+        gray (np.ndarray): HxW uint8 page, ideally no more than ~1200 px a side
+
+    Returns:
+        tuple: ((x0, y0, x1, y1) as fractions of the page, method) where method
+            is "strip", "box" or "fallback"
+    """
+    h, w = gray.shape
+    dark = _thicken(gray < _DARK)
+
+    # Outer frame of the sheet, searched for in the outer tenth of each side
+    right = _frame_edge(dark.mean(axis=0), w - 1, int(w * 0.9), -1)
+    bottom = _frame_edge(dark.mean(axis=1), h - 1, int(h * 0.9), -1)
+    top = _frame_edge(dark.mean(axis=1), 0, int(h * 0.1), 1) or 0
+    if right is None or bottom is None:
+        return TITLE_BLOCK_FALLBACK, "fallback"
+
+    inner = dark[top:bottom + 1, :right + 1]
+    inner_h = bottom + 1 - top
+
+    # Right-hand strip: a vertical line over (nearly) the full frame height
+    col_fill = inner.mean(axis=0)
+    strip_cols = np.nonzero(col_fill[int(w * 0.65):right - int(w * 0.02)] > 0.9)[0]
+    if strip_cols.size:
+        x0 = int(w * 0.65) + int(strip_cols[0])
+        return _padded((x0 / w, top / h, (right + 1) / w, (bottom + 1) / h)), "strip"
+
+    # Bottom-right box: a vertical line rising from the bottom frame line...
+    up_runs = _runs_from_end(inner, axis=0)
+    lo, hi = int(w * 0.4), right - int(w * 0.02)
+    left_cols = np.nonzero(up_runs[lo:hi] > inner_h * 0.08)[0]
+    previous = None
+    for col in left_cols:
+        if previous is not None and col == previous + 1:
+            previous = col
+            continue  # same (thick) line as the last candidate
+        previous = col
+        x0 = lo + int(col)
+        box_w = right + 1 - x0
+
+        # ...closed at its upper end by a horizontal line reaching the right frame line
+        left_runs = _runs_from_end(inner[:, x0:], axis=1)
+        y_lo = max(int(inner_h * 0.35), inner_h - int(up_runs[x0]) - 2)
+        y_hi = inner_h - int(h * 0.02)
+        top_rows = np.nonzero(left_runs[y_lo:y_hi] > box_w * 0.9)[0]
+        if top_rows.size:
+            y0 = top + y_lo + int(top_rows[0])
+            return _padded((x0 / w, y0 / h, (right + 1) / w, (bottom + 1) / h)), "box"
+
+    return TITLE_BLOCK_FALLBACK, "fallback"
+
+
+def _padded(box):
+    x0, y0, x1, y1 = box
+    return (max(0.0, x0 - _PAD), max(0.0, y0 - _PAD), min(1.0, x1 + _PAD), min(1.0, y1 + _PAD))
+
+
+def _analysis_copy(image_path):
+    """Small greyscale copy of a page, decoded at reduced size where the format allows."""
+    with Image.open(image_path) as img:
+        img.draft("L", (_ANALYSIS_SIDE, _ANALYSIS_SIDE))
+        small = img.convert("L")
+    small.thumbnail((_ANALYSIS_SIDE, _ANALYSIS_SIDE))
+    return np.asarray(small)
+
+
+def crop_title_block(image_path, out_path, max_side=TITLE_BLOCK_MAX_SIDE):
+    """
+    Crop a page's title block, downsized to at most max_side, and save it as JPEG.
+
+    Args:
+        image_path (str | Path): Rendered page image
+        out_path (str | Path): Where to write the crop
+        max_side (int): Longest side of the saved crop
+
+    Returns:
+        dict: {"path", "box" (fractions of the page), "method", "source_bytes", "crop_bytes"}
+    """
+    image_path, out_path = Path(image_path), Path(out_path)
+    box, method = locate_title_block(_analysis_copy(image_path))
+
+    with Image.open(image_path) as img:
+        full_w, full_h = img.size
+        crop_w = (box[2] - box[0]) * full_w
+        crop_h = (box[3] - box[1]) * full_h
+
+        # Decode JPEGs at the smallest scale that still covers max_side for the crop
+        scale = max(crop_w, crop_h) / max_side
+        if scale > 1:
+            img.draft("RGB", (int(full_w / scale), int(full_h / scale)))
+        w, h = img.size
+        crop = img.convert("RGB").crop((
+            int(box[0] * w), int(box[1] * h), int(box[2] * w), int(box[3] * h)
+        ))
+
+    crop.thumbnail((max_side, max_side))
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    crop.save(out_path, quality=90)
+
+    return {
+        "path": str(out_path),
+        "box": [round(v, 4) for v in box],
+        "method": method,
+        "source_bytes": image_path.stat().st_size,
+        "crop_bytes": out_path.stat().st_size,
+    }
@@ -0,0 +1,155 @@
+# ============================================================
+# triage.py — Cheap page triage before detection
+# ============================================================
+# Drawing sets come with cover sheets, legends, schedules, notes and blank
+# sheets that hold nothing to detect, yet each one goes through full-size
+# YOLO inference. Triage scores every page on a small greyscale copy first:
+#
+#   - the sheet border and the title block are masked out
+#   - long horizontal/vertical runs (frames, table rulings, walls) are removed
+#   - for PDFs, ink inside the text layer's words is removed
+#
+# What is left, as a share of the sheet interior, is the page's "plan ink":
+# symbols, arcs, short segments. Blank sheets and pages of text and tables
+# score near zero; plans do not. By default pages under TRIAGE_MIN_PLAN_INK are
+# only flagged (TRIAGE=flag) and still detected on; skipping them is opt-in
+# (TRIAGE=skip), since a sparse real plan scores not far above the threshold.
+# TRIAGE=off turns triage off. Every decision, with its numbers, is kept with
+# the run's detections.
+
+import os
+
+import fitz
+import numpy as np
+from PIL import Image
+
+from page_stream import worker_document
+from title_block import locate_title_block
+
+TRIAGE_MODES = ("off", "flag", "skip")
+TRIAGE = os.getenv("TRIAGE", "flag").lower()
+
+# Share of the sheet interior that must be plan ink for a page to be detected on
+# (conservative: a sparse plan with a dozen symbols scores about 0.001, a
+# ruled schedule under 0.0005)
+TRIAGE_MIN_PLAN_INK = float(os.getenv("TRIAGE_MIN_PLAN_INK", "0.0007"))
+
+# Below this much ink of any kind, a page is blank
+TRIAGE_BLANK_INK = float(os.getenv("TRIAGE_BLANK_INK", "0.0005"))
+
+_SIDE = 1600        # longest side of the copy pages are scored on
+_INK = 200          # grey level below which a pixel counts as ink
+_BORDER = 0.04      # share of each side treated as sheet border
+_RULE = 0.03        # runs at least this share of the side long count as rulings
+_TEXT_PAD = 2       # pixels added around each word
+
+
+def _thumbnail(image_path):
+    """Small greyscale copy of a page; JPEG pages are decoded at reduced scale."""
+    with Image.open(image_path) as img:
+        size = img.size
+        scale = _SIDE / max(size)
+        if scale < 1:
+            img.draft("L", (int(size[0] * scale), int(size[1] * scale)))
+        gray = img.convert("L")
+        if max(gray.size) > _SIDE:
+            gray.thumbnail((_SIDE, _SIDE), Image.BILINEAR)
+        return np.asarray(gray), size
+
+
+def _long_runs(ink, length, axis):
+    """Pixels on an unbroken run of at least `length` ink pixels along an axis."""
+    ink = np.moveaxis(ink, axis, 1)
+    h, w = ink.shape
+    if length > w:
+        return np.moveaxis(np.zeros_like(ink), 1, axis)
+    cum = np.zeros((h, w + 1), dtype=np.int32)
+    np.cumsum(ink, axis=1, out=cum[:, 1:])
+    starts = (cum[:, length:] - cum[:, :-length]) == length  # a full run begins here
+    n = starts.shape[1]
+    begun = np.zeros((h, n + 1), dtype=np.int32)
+    np.cumsum(starts, axis=1, out=begun[:, 1:])
+    # A pixel is covered if a run began within the `length` pixels up to it
+    x = np.arange(w)
+    covered = (begun[:, np.minimum(x + 1, n)] - begun[:, np.maximum(x - length + 1, 0)]) > 0
+    return np.moveaxis(covered, 1, axis)
+
+
+def _text_mask(pdf_path, page_num, shape):
+    """Thumbnail pixels covered by words of the PDF's text layer; None without a text layer."""
+    page = worker_document(str(pdf_path)).load_page(page_num - 1)
+    words = page.get_text("words")
+    if not words:
+        return None
+    h, w = shape
+    sx, sy = w / page.rect.width, h / page.rect.height
+    mask = np.zeros(shape, dtype=bool)
+    for word in words:
+        # Text comes in unrotated page coordinates; the render is rotated
+        r = fitz.Rect(word[:4]) * page.rotation_matrix
+        x0, y0 = max(int(r.x0 * sx) - _TEXT_PAD, 0), max(int(r.y0 * sy) - _TEXT_PAD, 0)
+        x1, y1 = min(int(r.x1 * sx) + _TEXT_PAD + 1, w), min(int(r.y1 * sy) + _TEXT_PAD + 1, h)
+        mask[y0:y1, x0:x1] = True
+    return mask
+
+
+def score_page(gray, text=None):
+    """
+    Plan-content score of a greyscale page.
+
+    Args:
+        gray (np.ndarray): HxW uint8 page, about _SIDE px on its long side
+        text (np.ndarray): Optional HxW mask of text-layer words
+
+    Returns:
+        dict: ink, plan_ink and text_ink shares of the sheet interior
+    """
+    h, w = gray.shape
+    interior = np.zeros((h, w), dtype=bool)
+    interior[int(h * _BORDER):h - int(h * _BORDER), int(w * _BORDER):w - int(w * _BORDER)] = True
+    (x0, y0, x1, y1), _ = locate_title_block(gray)
+    interior[int(y0 * h):int(np.ceil(y1 * h)), int(x0 * w):int(np.ceil(x1 * w))] = False
+
+    ink = (gray < _INK) & interior
+    area = max(int(interior.sum()), 1)
+    rules = _long_runs(ink, max(int(w * _RULE), 2), 1) | _long_runs(ink, max(int(h * _RULE), 2), 0)
+    free = ink & ~rules
+    text_ink = 0
+    if text is not None:
+        text_ink = int((free & text).sum())
+        free &= ~text
+    return {
+        "ink": round(int(ink.sum()) / area, 5),
+        "plan_ink": round(int(free.sum()) / area, 5),
+        "text_ink": round(text_ink / area, 5),
+    }
+
+
+def triage_page(image_path, page_num, pdf_path=None):
+    """
+    Triage one rendered page (runs in a render worker).
+
+    Returns:
+        dict: page, decision ("detect" or "skip"), reason, scores and the
+            page image size
+    """
+    try:
+        gray, size = _thumbnail(image_path)
+        text = _text_mask(pdf_path, page_num, gray.shape) if pdf_path else None
+        scores = score_page(gray, text)
+    except Exception as e:
+        # A page that cannot be scored is always detected on
+        return {"page": page_num, "decision": "detect", "reason": f"triage failed: {e}"}
+
+    if scores["ink"] < TRIAGE_BLANK_INK:
+        decision, reason = "skip", "blank"
+    elif scores["plan_ink"] < TRIAGE_MIN_PLAN_INK:
+        decision, reason = "skip", "text" if scores["text_ink"] > scores["plan_ink"] else "no plan content"
+    else:
+        decision, reason = "detect", "plan content"
+    return {"page": page_num, "decision": decision, "reason": reason, **scores, "size": list(size)}
+
+
+def triage_key(mode):
+    """Triage settings for the detections cache key (cached runs carry their triage decisions)."""
+    return () if mode == "off" else (mode, TRIAGE_MIN_PLAN_INK, TRIAGE_BLANK_INK)
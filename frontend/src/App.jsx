@@ -72,6 +72,7 @@ export default function App() {
       }
 
       console.log("✅ Step 1: Upload complete.");
+      const jobParams = { params: { job_id: fileInfo.job_id } };
       
       // 🔒 Disable upload section after successful upload
       setIsUploadDisabled(true);
@@ -82,7 +83,7 @@ export default function App() {
       // Step 2: Preprocessing
       setActiveStep(1);
       setStatus("🧠 Preprocessing...");
-      await axios.get(`${BACKEND}/preprocess`);
+      await axios.get(`${BACKEND}/preprocess`, jobParams);
       console.log("✅ Step 2: Preprocessing complete.");
 
       // Step 3: Load YOLO model
@@ -94,13 +95,13 @@ export default function App() {
       // Step 4: Run inference
       setActiveStep(3);
       setStatus("🚀 Running inference...");
-      await axios.get(`${BACKEND}/inference`);
+      await axios.get(`${BACKEND}/inference`, jobParams);
       console.log("✅ Step 4: Inference complete.");
 
       // Step 5: Fetch results
       setActiveStep(4);
       setStatus("📊 Fetching results...");
-      const resultsRes = await axios.get(`${BACKEND}/results`);
+      const resultsRes = await axios.get(`${BACKEND}/results`, jobParams);
       const data = resultsRes.data;
       console.log("✅ Step 5: Results fetched.");
 
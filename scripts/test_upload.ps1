@@ -21,9 +21,10 @@ $content.Add($b, 'file', [System.IO.Path]::GetFileName($FilePath))
 $resp = $client.PostAsync('http://localhost:8000/upload', $content).Result
 $body = $resp.Content.ReadAsStringAsync().Result
 Write-Output "Upload response: $body"
+$jobId = ($body | ConvertFrom-Json).job_id
 
 Write-Output "Calling /preprocess..."
-$pre = Invoke-RestMethod -Uri http://localhost:8000/preprocess
+$pre = Invoke-RestMethod -Uri "http://localhost:8000/preprocess?job_id=$jobId"
 Write-Output "Preprocess response: $(ConvertTo-Json $pre -Depth 5)"
 
 Write-Output "Calling /load_model..."
@@ -31,9 +32,9 @@ $lm = Invoke-RestMethod -Uri http://localhost:8000/load_model
 Write-Output "Load model response: $(ConvertTo-Json $lm -Depth 5)"
 
 Write-Output "Calling /inference... (this may take a while)"
-$inf = Invoke-RestMethod -Uri http://localhost:8000/inference
+$inf = Invoke-RestMethod -Uri "http://localhost:8000/inference?job_id=$jobId"
 Write-Output "Inference response: $(ConvertTo-Json $inf -Depth 5)"
 
 Write-Output "Fetching /results..."
-$res = Invoke-RestMethod -Uri http://localhost:8000/results
+$res = Invoke-RestMethod -Uri "http://localhost:8000/results?job_id=$jobId"
 Write-Output "Results: $(ConvertTo-Json $res -Depth 6)"